@@ -56,37 +56,49 @@ from bs4 import BeautifulSoup
 # In[2]:
 
 
-scotus = "https://www.supremecourt.gov/oral_arguments/argument_transcript/2019"
-raw_html = requests.get(scotus).content
-doc = BeautifulSoup(raw_html, "html.parser")
-# print(doc.prettify())
+# Pages are cached on disk (http_cache/), so re-running steps 1 and 2 for a
+# finished term doesn't touch the network. ResponseCache(..., offline=True)
+# serves only what is already saved.
+# Set SCOTUS_METRICS=metrics.json (and SCOTUS_PROFILE=cprofile) to record
+# time, memory and item counts for each stage; otherwise metrics.stage()
+# does nothing.
+# Transcripts are read from $SCOTUS_TRANSCRIPTS_DIR (see scotus/config.py);
+# the same steps run from the shell as python -m scotus scrape / enrich /
+# parse / analyze / export, and python -m scotus run rebuilds only the files
+# whose inputs, settings or code changed (see scotus/pipeline.py).
+from scotus.cache import ResponseCache
+from scotus.config import Config
+from scotus.crawl import ARGUMENT_LIST_URL, term_ttl_rules
+from scotus.fetch import Fetcher
+from scotus.metrics import Instrumentation
+
+metrics = Instrumentation.from_env()
+config = Config.from_env()
+fetcher = Fetcher(workers=8, per_host=4,
+                  cache=ResponseCache('http_cache', ttl_rules=term_ttl_rules()))
+
+term = 2019
+scotus = ARGUMENT_LIST_URL.format(term=term)
 
 
 
 # In[3]:
 
 
-cases_2019 = doc.find_all('tr')[2:]
+# Only the case table is parsed (see scotus/extract.py); each row comes
+# back as a CaseRow(docket, name, date, pdf)
+from scotus.extract import parse_case_rows
+
+with metrics.stage('scrape list') as stage:
+    raw_html = fetcher.get(scotus)
+    cases_2019 = parse_case_rows(raw_html)
+    stage.count(items=len(cases_2019))
 
 
 # In[4]:
 
 
-all_2019 = []
-for case in cases_2019:
-    cases_dict = {}
-    try:
-        #print("-----------")
-        elements = case.find_all('td')
-        elementA = elements[0].find('a')     
-        cases_dict['docket'] = elementA.text
-        cases_dict['name'] = elements[0].find_all('span')[1].text
-        cases_dict['date'] = elements[1].text
-        cases_dict['pdf'] = elementA['href']
-    except:
-        pass
-    #print(cases_dict)
-    all_2019.append(cases_dict)
+all_2019 = [case._asdict() for case in cases_2019]
 
 # all_2019
 
@@ -143,17 +155,15 @@ df.head()
 
 #Code away!
 lower_courts = "https://www.supremecourt.gov/search.aspx?filename=/docket/docketfiles/html/public/19-177.html"
-raw_html = requests.get(lower_courts).content
-doc2 = BeautifulSoup(raw_html, "html.parser")
-# print(doc2.prettify())
+raw_html = fetcher.get(lower_courts)
 
 
 # In[9]:
 
 
-items = doc2.find_all('table')
-circuits = items[2].find_all('span')
-print(circuits[9].text.strip())
+from scotus.extract import parse_lower_court
+
+print(parse_lower_court(raw_html))
 
 
 # In[10]:
@@ -171,26 +181,41 @@ print(len(docks))
 # In[11]:
 
 
-other_source = []
-for dock in docks:
-    try:
-        more_courts = {}
-        lowers =f'https://www.supremecourt.gov/search.aspx?filename=/docket/docketfiles/html/public/{dock}.html'
-        raw_html = requests.get(lowers).content
-        doc1 = BeautifulSoup(raw_html, "html.parser")
-        items = doc1.find_all('table')
-        circuits = items[2].find_all('span')
-        more_courts['docket'] = dock
-        more_courts['lower_court'] = circuits[9].text.strip()
-    except:
-        pass
-    
-    #print(more_courts)
-    other_source.append(more_courts)
+# One request per docket adds up, so the pages are fetched a few at a time
+# over a shared session (rate limited and retried), still in docket order.
+# A docket whose page failed still comes back as an empty dict (and is
+# dropped by merged.dropna() below), but it is also kept in
+# quarantine/enrich.json with its error, so the next cell can fetch it again
+# without the rest.
+from scotus.fetch import fetch_lower_courts
+from scotus.quarantine import Quarantine
+
+quarantine = Quarantine('quarantine', 'enrich')
+with metrics.stage('enrich dockets') as stage:
+    failures = []
+    other_source = fetch_lower_courts(docks, fetcher, failures=failures)
+    quarantine.update(failures, done=docks)
+    stage.count(items=len(other_source), failures=len(failures))
 
 # print(other_source)
 
 
+# In[ ]:
+
+
+# Replay: only the quarantined dockets are looked up again (one request
+# each), and those that go through take their place in other_source.
+# Re-run this cell until quarantine.keys() is empty, or look at why not:
+# list(quarantine)
+replay = [dock for dock in quarantine.keys() if dock in docks]
+failures = []
+for dock, found in zip(replay, fetch_lower_courts(replay, fetcher, failures=failures)):
+    if found:
+        other_source[docks.index(dock)] = found
+quarantine.update(failures, done=replay)
+print(len(replay) - len(failures), 'recovered,', len(quarantine), 'still quarantined')
+
+
 # In[12]:
 
 
@@ -221,6 +246,20 @@ merged.head()
 merged.to_csv("merged.csv", index=False, header=True)
 
 
+# ### Every term since 2000
+# The same scrape for all terms, done incrementally: scotus_manifest.json remembers each docket already scraped (its term, PDF name and when it was scraped), so only new or changed rows are fetched and merged_all_terms.csv is updated rather than rebuilt. Re-run this daily to pick up the current term.
+
+# In[ ]:
+
+
+from scotus.crawl import Manifest, all_terms, crawl, update_merged_csv
+
+manifest = Manifest('scotus_manifest.json')
+changed = crawl(all_terms(), fetcher, manifest)
+merged_all = update_merged_csv('merged_all_terms.csv', changed)
+print(len(changed), 'dockets scraped,', len(merged_all), 'in total')
+
+
 # ### STEP 3
 # Here we go: the text files that were extracted from the PDFs are quite messy, you do not need to get them perfect, but you need to clean them up enough so that you can zone in on the arguments themselves. Below I take you step-by-step through what you need to do. In the end you want to have a separate list for each case that contains the speaker and the dialogue attached to that speaker.
 
@@ -236,6 +275,7 @@ merged.to_csv("merged.csv", index=False, header=True)
 
 
 #Import the regular expression library
+import os
 import re
 
 
@@ -244,9 +284,7 @@ import re
 
 #Open a text file from your computer
 
-f = open('/Users/sheridanwall/Documents/Data/2019pdfs_official/17-834_5h25.txt', 'r')
-
-#f = open('/Users/YOU/Documents/columbia_syllabus/pdf/15-777_1b82.txt', 'r')
+f = open(os.path.join(config.transcripts_dir, '17-834_5h25.txt'), 'r')
 sample_transcript = f.read()
 
 
@@ -382,31 +420,69 @@ joined_dialogue = [[dialogue[x],dialogue[x+1]] for x in range(1,len(dialogue),2)
 # you could try here--Or email me with questions...
 
 
+# In[ ]:
+
+
+# The transcripts above were converted from their PDFs by hand. convert_pdfs
+# downloads the PDF of each case in all_2019 into pdfs/ and writes its text
+# to name_pdf.split('.')[0] + ".txt" in transcripts_dir, page by page and
+# over every core (pip install pypdf). Text already extracted is kept in
+# pdf_cache/ by the PDF's hash; .txt files that are already there are left
+# alone.
+from scotus.pdftext import PdfTextCache, convert_pdfs
+
+converted = convert_pdfs(all_2019, 'pdfs', config.transcripts_dir, fetcher=fetcher,
+                         cache=PdfTextCache('pdf_cache'))
+for failure in converted.failures:
+    print('could not convert', failure.docket, failure.error)
+print(len(converted.written), 'converted,', len(converted.skipped), 'already there')
+
+
 # In[28]:
 
 
-all_cases = []
-for file in all_2019:
-    try:
-        name_pdf = file['pdf'].split('/')[-1]
-        name_txt = name_pdf.split('.')[0] + ".txt"
-        #print(name_txt)
-        f = open('/Users/sheridanwall/Documents/Data/2019pdfs_official/'+name_txt, 'r')
-        each_transcript = f.read()
-        find_her = r"Heritage Reporting Corporation[\s\n\d-]+Official"
-        clean_transcript = re.sub(find_her,"",each_transcript)
-        clean_transcripts1=re.split(r"(\nCHIEF JUSTICE ROBERTS:)",clean_transcript,1)
-        split_transcripts = clean_transcripts1[1]+clean_transcripts1[2]
-        split_transcript1 = re.split(r"(The case is submitted.)", split_transcripts,1)
-        split_transcripts2 = split_transcript1[0]+split_transcript1[1]
-        find_speakers = r"(\n[A-Z\s\n]+:)"
-        speaker_transcripts = re.split(find_speakers,split_transcripts2)
-        joined_dialogue1 = [[speaker_transcripts[x],speaker_transcripts[x+1],file['docket']] for x in range(1,len(speaker_transcripts),2)]
-        all_cases+=joined_dialogue1
-    except:
-        pass
+# The same cleaning as above, done by scotus.transcripts.TranscriptParser:
+# footers dropped, then the speaker labels walked between the opening and
+# "The case is submitted." one turn at a time instead of splitting copies.
+# parse_corpus spreads the files over every core and keeps them in case
+# order; transcripts that couldn't be parsed are listed rather than skipped
+# silently (workers=1 parses in this process). Parsed files are cached in
+# parse_cache/ by content, so a re-run only parses new or corrected ones.
+# FormatParser tells Heritage transcripts from the older Alderson ones by
+# their first page and parses each with its own footer pattern, so earlier
+# terms (and other Chief Justices) go through the same cell.
+from scotus.formats import FormatParser
+from scotus.ingest import parse_corpus
+from scotus.parsecache import ParseCache
+
+transcripts_dir = config.transcripts_dir
+parser = FormatParser()
+parse_cache = ParseCache('parse_cache', parser)
+with metrics.stage('parse transcripts') as stage:
+    corpus = parse_corpus(all_2019, transcripts_dir, workers=os.cpu_count(), parser=parser,
+                          cache=parse_cache)
+    stage.count(items=len(all_2019) - len(corpus.failures), failures=len(corpus.failures))
+for failure in corpus.failures:
+    print('could not parse', failure.docket, failure.error)
+print(parse_cache.stats)
+all_cases = corpus.turns
+
+
+# In[ ]:
 
-print(all_cases[1])
+
+# Where each turn is in the official transcript: page, line and byte
+# offsets, recorded while the footers are dropped. Turn i here is row i of
+# the dialogue frame, so any row can be cited or shown in its page context
+# without searching the transcript again.
+from scotus.ingest import corpus_jobs
+from scotus.positions import PositionIndex, write_positions
+
+write_positions('positions', corpus_jobs(all_2019, transcripts_dir)[0], parser,
+                failures=corpus.failures)
+positions = PositionIndex('positions')
+print(positions.cite(0))
+print(positions.raw(0))
 
 
 # In[29]:
@@ -414,7 +490,22 @@ print(all_cases[1])
 
 import pandas as pd
 col_names = ['speaker','words', 'docket']
-dialogue = pd.DataFrame(all_cases, columns=col_names)
+with metrics.stage('build dialogue') as stage:
+    dialogue = pd.DataFrame.from_records(all_cases, columns=['docket', 'speaker', 'words'])[col_names]
+    stage.count(items=len(dialogue))
+print(dialogue.iloc[1].tolist())
+
+
+# In[ ]:
+
+
+# The same turns with one id per speaker: '\nJUSTICE\nGINSBURG:' and
+# 'JUSTICE GINSBURG:' are both JUSTICE GINSBURG (a justice), and the words
+# share one text buffer (see benchmarks/bench_turns.py for the memory saved)
+from scotus.speakers import TurnTable
+
+turn_table = TurnTable.from_turns(all_cases)
+turn_table.speakers.frame()
 
 
 # In[30]:
@@ -434,6 +525,58 @@ dialogue['words'] = dialogue.words.str.replace(r'\n','',regex=True)
 dialogue.head()
 
 
+# In[ ]:
+
+
+# Saved as Parquet partitioned by term (store/), so later analysis can load
+# only what it needs, e.g. load_turns('store', speakers='JUSTICE GINSBURG:')
+from scotus.store import save_cases, save_turns
+
+save_cases(merged, 'store', term=term)
+save_turns(dialogue, 'store', dict.fromkeys(merged.docket, term))
+
+
+# In[ ]:
+
+
+# A full-text index of the dialogue (search.sqlite): phrase search with
+# filters on speaker, term and lower court, best matches first
+from scotus.search import index_dialogue
+
+index = index_dialogue('search.sqlite', merged, dialogue, term=term)
+for hit in index.search('abortion', speaker='GINSBURG', limit=5):
+    print(hit.docket, hit.speaker, hit.snippet)
+
+
+# In[ ]:
+
+
+# A positional index (concordance/) for exact phrases, 'word NEAR/5 word'
+# and keyword-in-context lines
+from scotus.concordance import ConcordanceIndex
+
+concordance = ConcordanceIndex.build(all_cases, 'concordance')
+for line in concordance.kwic('equal protection', width=6, speakers='GINSBURG'):
+    print(line.docket, line.speaker, '...', line.left, '[%s]' % line.match, line.right, '...')
+
+
+# In[ ]:
+
+
+# Where the same line of questioning comes back in another case: each turn
+# is reduced to a MinHash signature of its five-word shingles, and turns
+# that share an LSH bucket are compared, instead of every turn with every
+# other. Signatures are kept in minhash/, so re-running after another term
+# is parsed only hashes the new dockets' turns.
+from scotus.similarity import SignatureIndex
+
+signatures = SignatureIndex('minhash')
+signatures.update(all_cases)
+signatures.save()
+for pair in signatures.pairs(threshold=0.6)[:10]:
+    print('%.2f' % pair.jaccard, signatures.cite(pair.first), '~', signatures.cite(pair.second))
+
+
 # # Analysis of speakers
 
 # Most common speaker per case: 
@@ -471,7 +614,16 @@ justice_speakers
 # In[36]:
 
 
-speaker_wordcount = justice_speakers.groupby(['speaker']).sum().applymap(lambda words: Counter(re.findall(r"\b\w{10,}\b",words.lower())).most_common())
+# Every turn is tokenized once into sparse word counts (scotus/wordfreq.py);
+# the top words of any grouping come back as speaker / rank / word / count
+# columns instead of one long list of tuples per speaker
+from scotus.wordfreq import TermCounts
+
+with metrics.stage('analytics') as stage:
+    term_counts = TermCounts.build(dialogue, min_length=7)
+    speaker_wordcount = term_counts.top_k('speaker', k=None, min_length=10,
+                                          mask=dialogue.speaker.str.contains('JUSTICE'))
+    stage.count(items=len(dialogue))
 
 
 # In[334]:
@@ -480,17 +632,12 @@ speaker_wordcount = justice_speakers.groupby(['speaker']).sum().applymap(lambda
 speaker_wordcount.head()
 
 
-# In[332]:
-
-
-def apply_to_words(word):
-    return word[:5]
-
-
 # In[333]:
 
 
-justice_common_words = speaker_wordcount.words.apply(apply_to_words).reset_index()
+justice_common_words = term_counts.top_k('speaker', k=5, min_length=10,
+                                         mask=dialogue.speaker.str.contains('JUSTICE'))
+justice_common_words
 
 
 # At this point, I would have liked to have done an aggregation of the five most common words used by each justice. I attempted to do that by grouping by speaker, and then re-formatting the tuples (seen below), but because the words are in this format, that kind of analysis isn't possible through the methods I attempted.
@@ -533,7 +680,8 @@ rbg_num_quotes.head()
 # In[43]:
 
 
-rbg_wordcount = rbg.groupby(['docket']).sum().applymap(lambda words: Counter(re.findall(r"\b\w{7,}\b",words.lower())).most_common())
+rbg_wordcount = term_counts.most_common('docket', min_length=7,
+                                        mask=dialogue.speaker == 'JUSTICE GINSBURG:').to_frame('words')
 
 
 # In[44]:
@@ -583,6 +731,20 @@ ginsburg.head()
 ginsburg.to_csv('ginsburg.csv', index=False, header=True)
 
 
+# In[ ]:
+
+
+# The same table for every justice, from one aggregation of the dialogue by
+# speaker, docket, term and lower court (turns, words, questions and word
+# counts per cell) instead of filtering and re-counting for each of them
+from scotus.cube import ProfileCube
+
+cube = ProfileCube.build(dialogue, merged, term=term, counts=term_counts)
+justice_tables = {speaker: cube.justice_table(speaker, merged, min_length=7)
+                  for speaker in cube.cells.speaker.unique() if 'JUSTICE' in speaker}
+cube.rollup(['speaker', 'lower_court'])
+
+
 # # Cleaning Ginsburg Table
 
 # In[197]:
@@ -741,87 +903,39 @@ output3
 # In[310]:
 
 
-cities = ["San Franscisco, CA","Atlanta, GA","New York, NY",
-    "Richmond, VA","Washington D.C.","Denver, CO","Cincinnati, OH",
-          "Philadelphia, PA","Topeka, KS","New Orleans, LA","Washington D.C.",
-          "Helena, MT","Olympia, WA","Phoenix, AZ", "St. Louis, MO","Oklahoma City, OK","New Orleans, LA"]
-
-
-# # Merging with json 
-
-# In[311]:
+# Where each lower court sits, from the court gazetteer bundled with scotus
+# (federal circuits, district courts and state high courts). Each
+# lower_court string is matched once and remembered in courts.sqlite, so
+# later terms only look up the new ones.
+from scotus.courts import CourtLookup
 
-
-geo_points = [{"place": "San Franscisco, CA", "geometry.type": "Point", "geometry.coordinates": [-122.4194155, 37.7749295]}, {"place": "Atlanta, GA", "geometry.type": "Point", "geometry.coordinates": [-84.3879824, 33.7489954]}, {"place": "New York, NY", "geometry.type": "Point", "geometry.coordinates": [-74.0059728, 40.7127753]}, {"place": "Richmond, VA", "geometry.type": "Point", "geometry.coordinates": [-77.4360481, 37.5407246]}, {"place": "Washington, DC", "geometry.type": "Point", "geometry.coordinates": [-77.0368707, 38.9071923]}, {"place": "Denver, CO", "geometry.type": "Point", "geometry.coordinates": [-104.990251, 39.7392358]}, {"place": "Cincinnati, OH", "geometry.type": "Point", "geometry.coordinates": [-84.5120196, 39.1031182]}, {"place": "Philadelphia, PA", "geometry.type": "Point", "geometry.coordinates": [-75.1652215, 39.9525839]}, {"place": "Topeka, KS", "geometry.type": "Point", "geometry.coordinates": [-95.67515759999999, 39.0473451]}, {"place": "New Orleans, LA", "geometry.type": "Point", "geometry.coordinates": [-90.0715323, 29.95106579999999]}, {"place": "Washington, DC", "geometry.type": "Point", "geometry.coordinates": [-77.0368707, 38.9071923]}, {"place": "Helena, MT", "geometry.type": "Point", "geometry.coordinates": [-112.0391057, 46.5891452]}, {"place": "Olympia, WA", "geometry.type": "Point", "geometry.coordinates": [-122.9006951, 47.0378741]}, {"place": "Phoenix, AZ", "geometry.type": "Point", "geometry.coordinates": [-112.0740373, 33.4483771]}, {"place": "St. Louis, MO", "geometry.type": "Point", "geometry.coordinates": [-90.19940419999999, 38.6270025]}, {"place": "Oklahoma City, OK", "geometry.type": "Point", "geometry.coordinates": [-97.5164276, 35.4675602]}, {"place": "New Orleans, LA", "geometry.type": "Point", "geometry.coordinates": [-90.0715323, 29.95106579999999]}]
+court_lookup = CourtLookup('courts.sqlite')
+court_lookup.locate(output3.lower_court)
 
 
 # In[312]:
 
 
-final_df = pd.DataFrame(geo_points)
+court_points = court_lookup.points(output3.lower_court)
 
 
 # In[313]:
 
 
-final_df.head()
-
-
-# In[314]:
-
-
-final_output = output3.join(final_df, how="outer")
-final_output
-
-
-# In[315]:
-
-
-final_json = json.loads(final_output.to_json(orient='records'))
-
-
-# In[316]:
-
-
-final_json
-
-
-# In[317]:
-
-
-def process_to_geojson(file):
-    geo_data = {"type": "FeatureCollection", "features":[]}
-    for row in file:
-        this_dict = {"type": "Feature", "properties":{}, "geometry": {}}
-        for key, value in row.items():
-            key_names = key.split('.')
-            if key_names[0] == 'geometry':
-                this_dict['geometry'][key_names[1]] = value
-            if str(key_names[0]) == 'properties':
-                this_dict['properties'][key_names[1]] = value
-        geo_data['features'].append(this_dict)
-    return geo_data
-
-
-# In[318]:
-
-
-geo_format = process_to_geojson(final_json)
-
-
-# In[319]:
-
-
-geo_format
+# Courts on the map without coordinates (written with a null geometry)
+output3[~output3.lower_court.isin(court_points)]
 
 
 # In[320]:
 
 
-with open('geo-data12-11.js', 'w') as outfile:
-    outfile.write("var infoData = ")
-with open('geo-data12-11.js', 'a') as outfile:
-    json.dump(geo_format, outfile)
+# Each row of output3 is written as a feature as it's read, with its
+# 'properties.' columns as properties: 'var infoData = ...' for a .js file,
+# a FeatureCollection for .geojson, or one feature per line for .ndjson
+from scotus.geojson import write_geojson
+
+with metrics.stage('export') as stage:
+    stage.count(items=write_geojson(output3, 'geo-data12-11.js', court_points))
 
 
 # In[ ]:
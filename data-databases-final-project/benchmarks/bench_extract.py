@@ -0,0 +1,127 @@
+"""Compares scotus.extract against the original BeautifulSoup extraction.
+
+Runs both over saved pages and checks they agree before timing them:
+
+    python benchmarks/bench_extract.py --fixtures fixtures/
+    python benchmarks/bench_extract.py --cache http_cache
+
+A fixtures directory holds argument_list/*.html and dockets/*.html; a
+cache directory is a ResponseCache filled by an earlier scrape.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from scotus.extract import parse_case_rows, parse_lower_court  # noqa: E402
+
+
+def original_case_rows(raw_html):
+    doc = BeautifulSoup(raw_html, "html.parser")
+    rows = []
+    for case in doc.find_all('tr')[2:]:
+        try:
+            elements = case.find_all('td')
+            elementA = elements[0].find('a')
+            rows.append((elementA.text, elements[0].find_all('span')[1].text,
+                         elements[1].text, elementA['href']))
+        except Exception:
+            pass
+    return rows
+
+
+def original_lower_court(raw_html):
+    doc1 = BeautifulSoup(raw_html, "html.parser")
+    items = doc1.find_all('table')
+    circuits = items[2].find_all('span')
+    return circuits[9].text.strip()
+
+
+def load_fixtures(directory):
+    pages = {}
+    for kind in ('argument_list', 'dockets'):
+        pages[kind] = []
+        for path in sorted(glob.glob(os.path.join(directory, kind, '*.html'))):
+            with open(path, 'rb') as f:
+                pages[kind].append(f.read())
+    return pages
+
+
+def load_cache(directory):
+    from scotus.cache import ResponseCache
+
+    cache = ResponseCache(directory, offline=True)
+    with cache._lock:
+        urls = [url for url, in cache._db.execute("SELECT url FROM entries")]
+    pages = {'argument_list': [], 'dockets': []}
+    for url in urls:
+        if re.search(r'/argument_transcript/\d+$', url):
+            pages['argument_list'].append(cache.get(url))
+        elif '/docketfiles/' in url:
+            pages['dockets'].append(cache.get(url))
+    cache.close()
+    return pages
+
+
+def best_of(repeat, func, pages):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for page in pages:
+            try:
+                func(page)
+            except Exception:
+                pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def results(func, pages):
+    out = []
+    for page in pages:
+        try:
+            out.append(func(page))
+        except Exception as exc:
+            out.append(type(exc).__name__)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--fixtures', help='directory of saved pages')
+    source.add_argument('--cache', help='ResponseCache directory')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    pages = load_fixtures(args.fixtures) if args.fixtures else load_cache(args.cache)
+
+    new_rows = lambda page: [tuple(row) for row in parse_case_rows(page)]  # noqa: E731
+    stages = [
+        ('argument_list', original_case_rows, new_rows),
+        ('dockets', original_lower_court, parse_lower_court),
+    ]
+    for kind, before, after in stages:
+        found = pages[kind]
+        if not found:
+            print('%-14s no pages' % kind)
+            continue
+        if results(before, found) != results(after, found):
+            print('%-14s MISMATCH between the original and scotus.extract' % kind)
+            return 1
+        old = best_of(args.repeat, before, found)
+        new = best_of(args.repeat, after, found)
+        print('%-14s %5d pages  original %8.2f ms/page  extract %8.2f ms/page  %5.1fx'
+              % (kind, len(found), 1000 * old / len(found), 1000 * new / len(found),
+                 old / new if new else float('inf')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
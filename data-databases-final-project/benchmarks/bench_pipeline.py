@@ -0,0 +1,205 @@
+"""Times every stage of the pipeline on synthetic corpora of growing size.
+
+A corpus of --cases arguments (synthetic.py) is generated at each scale,
+1x, 10x and 100x by default, and each stage is timed on it:
+
+    html        case rows from the argument list, lower court from each docket page
+    cleaning    reading each transcript, dropping footers, finding the argument
+    speakers    splitting the argument into speaker turns
+    dataframe   the dialogue DataFrame, with the notebook's newline clean-up
+    wordcount   per-turn word counts and every justice's top words
+    geojson     one justice's table grouped by lower court, written as map features
+
+Results go to a JSON file. Two kinds of gate make the exit status non-zero:
+each stage's time per item at the largest scale may be at most
+max_scaling times its time per item at the smallest (which catches
+accidentally quadratic code on any machine), and with --baseline each
+stage may be at most 1 + tolerance times slower than a saved run. Both
+limits are in thresholds.json:
+
+    python benchmarks/bench_pipeline.py --workdir /tmp/scotus-bench --out results.json
+    python benchmarks/bench_pipeline.py --workdir /tmp/scotus-bench --baseline results.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd  # noqa: E402
+
+import synthetic  # noqa: E402
+from scotus.extract import parse_case_rows, parse_lower_court  # noqa: E402
+from scotus.geojson import map_frame, write_geojson  # noqa: E402
+from scotus.transcripts import TranscriptParser, transcript_name  # noqa: E402
+from scotus.wordfreq import TermCounts  # noqa: E402
+
+THRESHOLDS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+RESULTS_VERSION = 1
+
+
+def stage_html(corpus, state):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(corpus, 'argument_list', '*.html'))):
+        with open(path, 'rb') as f:
+            rows.extend(parse_case_rows(f.read()))
+    courts = {}
+    for path in sorted(glob.glob(os.path.join(corpus, 'dockets', '*.html'))):
+        with open(path, 'rb') as f:
+            courts[os.path.basename(path)[:-5]] = parse_lower_court(f.read())
+    state['cases'] = [dict(row._asdict(), lower_court=courts.get(row.docket)) for row in rows]
+    return len(rows) + len(courts)
+
+
+def stage_cleaning(corpus, state):
+    parser = state['parser'] = TranscriptParser()
+    texts = state['texts'] = []
+    for case in state['cases']:
+        text = parser.read(os.path.join(corpus, 'transcripts', transcript_name(case['pdf'])))
+        texts.append((case['docket'], text, parser.bounds(text)))
+    return len(texts)
+
+
+def stage_speakers(corpus, state):
+    parser = state['parser']
+    turns = state['turns'] = []
+    for docket, text, (begin, end) in state['texts']:
+        turns.extend(parser._turns(text, begin, end, docket))
+    return len(turns)
+
+
+def stage_dataframe(corpus, state):
+    dialogue = pd.DataFrame.from_records(state['turns'], columns=['docket', 'speaker', 'words'])
+    dialogue = dialogue[['speaker', 'words', 'docket']]
+    dialogue['speaker'] = dialogue.speaker.str.replace(r'\n', '', regex=True)
+    dialogue['words'] = dialogue.words.str.replace(r'\n', '', regex=True)
+    state['dialogue'] = dialogue
+    return len(dialogue)
+
+
+def stage_wordcount(corpus, state):
+    dialogue = state['dialogue']
+    counts = state['counts'] = TermCounts.build(dialogue, min_length=7)
+    counts.top_k('speaker', k=5, min_length=10, mask=dialogue.speaker.str.contains('JUSTICE'))
+    return len(counts)
+
+
+def stage_geojson(corpus, state):
+    dialogue = state['dialogue']
+    mask = dialogue.speaker == 'JUSTICE GINSBURG:'
+    words = state['counts'].most_common('docket', k=5, min_length=7, mask=mask)
+    spoke = dialogue[mask].docket.value_counts()
+    cases = pd.DataFrame(state['cases'])
+    table = pd.DataFrame({'docket': cases['docket'],
+                          'most_used_words': cases['docket'].map(words),
+                          'speech_count': cases['docket'].map(spoke).fillna(0),
+                          'case_name': cases['name'], 'date': cases['date'],
+                          'lower_court': cases['lower_court']})
+    points = {court: (-90.0 - n, 30.0 + n) for n, court in enumerate(synthetic.LOWER_COURTS)}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_geojson(map_frame(table), os.path.join(tmp, 'geo-data.js'), points)
+    return len(cases)
+
+
+STAGES = [('html', stage_html), ('cleaning', stage_cleaning), ('speakers', stage_speakers),
+          ('dataframe', stage_dataframe), ('wordcount', stage_wordcount),
+          ('geojson', stage_geojson)]
+
+
+def run_scale(corpus, repeat):
+    """Best-of-repeat seconds and item counts for every stage."""
+    results = {}
+    for _ in range(repeat):
+        state = {}
+        for name, stage in STAGES:
+            start = time.perf_counter()
+            items = stage(corpus, state)
+            seconds = time.perf_counter() - start
+            if name not in results or seconds < results[name]['seconds']:
+                results[name] = {'seconds': seconds, 'items': items}
+    return results
+
+
+def check(results, thresholds, baseline=None):
+    """Threshold violations, as readable strings."""
+    failures = []
+    by_stage = {}
+    for result in results:
+        by_stage.setdefault(result['stage'], []).append(result)
+    for stage, runs in by_stage.items():
+        runs.sort(key=lambda r: r['scale'])
+        smallest, largest = runs[0], runs[-1]
+        limit = thresholds.get('max_scaling', {}).get(stage, thresholds['default_max_scaling'])
+        if largest['scale'] > smallest['scale'] and smallest['per_item'] > 0:
+            ratio = largest['per_item'] / smallest['per_item']
+            if ratio > limit:
+                failures.append('%s: %.2fx slower per item at %dx than at %dx (limit %.2fx)'
+                                % (stage, ratio, largest['scale'], smallest['scale'], limit))
+    if baseline is not None:
+        before = {(r['stage'], r['scale']): r for r in baseline['results']}
+        for result in results:
+            old = before.get((result['stage'], result['scale']))
+            if old is None or old['seconds'] <= 0:
+                continue
+            tolerance = thresholds.get('tolerance', {}).get(result['stage'],
+                                                            thresholds['default_tolerance'])
+            ratio = result['seconds'] / old['seconds']
+            if ratio > 1 + tolerance:
+                failures.append('%s at %dx: %.3f s vs %.3f s in the baseline (+%.0f%%, limit +%.0f%%)'
+                                % (result['stage'], result['scale'], result['seconds'],
+                                   old['seconds'], 100 * (ratio - 1), 100 * tolerance))
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'scotus-bench'),
+                        help='where the synthetic corpora are generated (and reused)')
+    parser.add_argument('--cases', type=int, default=20, help='arguments in the 1x corpus')
+    parser.add_argument('--turns', type=int, default=180, help='turns per argument')
+    parser.add_argument('--scales', default='1,10,100')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='results JSON of an earlier run to compare with')
+    parser.add_argument('--thresholds', default=THRESHOLDS)
+    args = parser.parse_args(argv)
+
+    with open(args.thresholds) as f:
+        thresholds = json.load(f)
+    results = []
+    for scale in [int(s) for s in args.scales.split(',')]:
+        corpus = os.path.join(args.workdir, '%dx%d' % (args.cases, scale))
+        synthetic.write_corpus(corpus, args.cases * scale, turns=args.turns)
+        size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(corpus, '*', '*')))
+        print('%4dx  %d cases, %.1f MB' % (scale, args.cases * scale, size / 1e6))
+        for stage, timing in run_scale(corpus, args.repeat).items():
+            per_item = timing['seconds'] / max(timing['items'], 1)
+            results.append({'stage': stage, 'scale': scale, 'cases': args.cases * scale,
+                            'seconds': timing['seconds'], 'items': timing['items'],
+                            'per_item': per_item})
+            print('       %-10s %9.3f s  %9d items  %8.2f us/item'
+                  % (stage, timing['seconds'], timing['items'], per_item * 1e6))
+
+    report = {'version': RESULTS_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'python': platform.python_version(), 'platform': platform.platform(),
+              'cases': args.cases, 'turns': args.turns, 'results': results}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=1)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    failures = check(results, thresholds, baseline)
+    for failure in failures:
+        print('REGRESSION', failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
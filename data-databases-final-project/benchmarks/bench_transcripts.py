@@ -0,0 +1,87 @@
+"""Compares str-based and memory-mapped transcript parsing.
+
+Each parser runs in its own process over every .txt file in a directory,
+so peak RSS is measured separately for each. Their turns are hashed to
+check they agree:
+
+    python benchmarks/bench_transcripts.py --dir ~/Documents/Data/2019pdfs_official
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scotus.transcripts import MmapTranscriptParser, TranscriptParser  # noqa: E402
+
+PARSERS = {'str': TranscriptParser, 'mmap': MmapTranscriptParser}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run(mode, paths, repeat):
+    parser = PARSERS[mode]()
+    best = float('inf')
+    for _ in range(repeat):
+        digest = hashlib.sha256()
+        turns = failures = 0
+        start = time.perf_counter()
+        for path in paths:
+            try:
+                for docket, speaker, words in parser.turns(path, os.path.basename(path)):
+                    digest.update(speaker.encode('utf-8'))
+                    digest.update(words.encode('utf-8'))
+                    turns += 1
+            except (OSError, ValueError, UnicodeDecodeError):
+                failures += 1
+        best = min(best, time.perf_counter() - start)
+    return {'mode': mode, 'seconds': best, 'turns': turns, 'failures': failures,
+            'digest': digest.hexdigest(), 'peak_rss_mb': peak_rss_mb()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', required=True, help='directory of transcript .txt files')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', choices=sorted(PARSERS), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.txt')))
+    if args.child:
+        print(json.dumps(run(args.child, paths, args.repeat)))
+        return 0
+    if not paths:
+        print('no .txt files in', args.dir)
+        return 1
+
+    megabytes = sum(os.path.getsize(path) for path in paths) / (1024 * 1024)
+    results = []
+    for mode in ('str', 'mmap'):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--dir', args.dir,
+                              '--repeat', str(args.repeat), '--child', mode],
+                             check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out))
+
+    print('%d files, %.1f MB' % (len(paths), megabytes))
+    for result in results:
+        print('%-5s %8.3f s  %7.1f MB/s  peak RSS %7.1f MB  %d turns, %d failed'
+              % (result['mode'], result['seconds'], megabytes / result['seconds'],
+                 result['peak_rss_mb'], result['turns'], result['failures']))
+    if len({result['digest'] for result in results}) != 1:
+        print('MISMATCH: the parsers produced different turns')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Compares the memory held by the parsed turns in each representation.
+
+Every transcript .txt file in a directory is parsed, and the turns are
+kept as the notebook's list of [speaker, words, docket] lists, as the
+dialogue DataFrame, and as a TurnTable. Each representation is built in
+its own process from a fresh parse; what it keeps is the growth in resident
+memory once it is built, so pandas' Arrow-backed strings count as well
+(but not the libraries behind them, which a small build loads first):
+
+    python benchmarks/bench_turns.py --dir ~/Documents/Data/2019pdfs_official
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd  # noqa: E402
+
+from scotus.speakers import TurnTable  # noqa: E402
+from scotus.transcripts import TranscriptParser  # noqa: E402
+
+
+def parse(paths):
+    parser = TranscriptParser()
+    for path in paths:
+        docket = os.path.basename(path).split('_')[0]
+        try:
+            yield from parser.turns(path, docket)
+        except (OSError, ValueError, UnicodeDecodeError):
+            pass
+
+
+def as_lists(turns):
+    return [[speaker, words, docket] for docket, speaker, words in turns]
+
+
+def as_dataframe(turns):
+    dialogue = pd.DataFrame.from_records(list(turns), columns=['docket', 'speaker', 'words'])
+    return dialogue[['speaker', 'words', 'docket']]
+
+
+def as_dataframe_categorical(turns):
+    dialogue = as_dataframe(turns)
+    return dialogue.astype({'speaker': 'category', 'docket': 'category'})
+
+
+def as_turntable(turns):
+    return TurnTable.from_turns(turns)
+
+
+LAYOUTS = {
+    'lists': as_lists,
+    'dataframe': as_dataframe,
+    'categorical': as_dataframe_categorical,
+    'turntable': as_turntable,
+}
+
+
+def rss_mb():
+    """Current resident memory (Linux), or the peak where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run(name, paths):
+    # Build the layout once from a few dummy turns first, so the libraries
+    # it loads on first use (pandas imports pyarrow for its strings lazily)
+    # are resident before the snapshot and only the data is measured
+    LAYOUTS[name]([('0-0', 'JUSTICE:', 'warm up')] * 100)
+    gc.collect()
+    before = rss_mb()
+    start = time.perf_counter()
+    kept = LAYOUTS[name](parse(paths))
+    seconds = time.perf_counter() - start
+    gc.collect()
+    result = {'layout': name, 'kept_mb': rss_mb() - before, 'peak_mb': peak_rss_mb() - before,
+              'seconds': seconds, 'turns': len(kept)}
+    if isinstance(kept, TurnTable):
+        result.update(speakers=len(kept.speakers), labels=len(kept.speakers.variants()),
+                      dockets=len(kept.dockets), nbytes_mb=kept.nbytes() / (1024 * 1024))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', required=True, help='directory of transcript .txt files')
+    parser.add_argument('--child', choices=sorted(LAYOUTS), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.txt')))
+    if args.child:
+        print(json.dumps(run(args.child, paths)))
+        return 0
+    if not paths:
+        print('no .txt files in', args.dir)
+        return 1
+
+    results = {}
+    for name in LAYOUTS:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--dir', args.dir,
+                              '--child', name], check=True, capture_output=True, text=True).stdout
+        result = results[name] = json.loads(out)
+        print('%-12s %9.1f MB kept  %9.1f MB peak  %6.2f s  %d turns'
+              % (name, result['kept_mb'], result['peak_mb'], result['seconds'], result['turns']))
+    table = results['turntable']
+    print('turntable: %d speakers from %d labels, %d dockets, %.1f MB of arrays and text'
+          % (table['speakers'], table['labels'], table['dockets'], table['nbytes_mb']))
+    print('turntable / dataframe: %.2f' % (table['kept_mb'] / results['dataframe']['kept_mb']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Synthetic oral-argument corpora for the benchmarks.
+
+Transcripts follow the Heritage Reporting layout the parser expects: a
+cover page, then the argument opened by "CHIEF JUSTICE ROBERTS:", speaker
+labels at the start of a line (some wrapped onto two), a footer block with
+the page number and the column of line numbers after every page, and
+"The case is submitted." at the end, followed by the word index. The
+argument list and docket pages mimic supremecourt.gov's tables closely
+enough for scotus.extract. Everything is derived from a seed, so the same
+arguments give the same corpus:
+
+    python benchmarks/synthetic.py --out /tmp/corpus --cases 60
+"""
+import argparse
+import json
+import os
+import random
+import sys
+
+JUSTICES = ['CHIEF JUSTICE ROBERTS', 'JUSTICE THOMAS', 'JUSTICE GINSBURG', 'JUSTICE BREYER',
+            'JUSTICE ALITO', 'JUSTICE SOTOMAYOR', 'JUSTICE KAGAN', 'JUSTICE GORSUCH',
+            'JUSTICE KAVANAUGH']
+COUNSEL = ['MR. FRANCIS', 'MS. ALVAREZ', 'MR. OKAFOR', 'MS. LINDQVIST', 'GENERAL WALLACE']
+
+LOWER_COURTS = [
+    'United States Court of Appeals for the Ninth Circuit',
+    'United States Court of Appeals for the Fifth Circuit',
+    'United States Court of Appeals for the Second Circuit',
+    'United States Court of Appeals for the District of Columbia Circuit',
+    'United States Court of Appeals for the Federal Circuit',
+    'United States Court of Appeals for the Eleventh Circuit',
+    'United States Court of Appeals for the Sixth Circuit',
+    'Supreme Court of Kansas',
+    'Supreme Court of Montana',
+    'Court of Criminal Appeals of Oklahoma',
+    'Supreme Court of Louisiana',
+]
+
+VOCABULARY = """
+the court that and of to a is in it you what your but this not be would if
+statute congress question argument petitioner respondent jurisdiction
+constitutional interpretation however because government federal state
+district circuit amendment clause provision reasonable evidence standard
+precedent decision plaintiff defendant liability remedy injunction damages
+discrimination protection process procedure sentence conviction criminal
+agency regulation authority discretion review deference text history purpose
+contract property privilege immunity sovereign commerce taxation employment
+arbitration jury trial counsel record appeal remand petition certiorari
+honor justice mean think well right understand position exactly whether
+""".split()
+
+LINES_PER_PAGE = 25
+LINE_WIDTH = 62
+
+
+def _zipf_words(rng, count):
+    # Earlier words are much more common, roughly as in speech
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    return rng.choices(VOCABULARY, weights=weights, k=count)
+
+
+def _utterance(rng):
+    sentences = []
+    for _ in range(rng.randint(1, 5)):
+        words = _zipf_words(rng, rng.randint(4, 28))
+        words[0] = words[0].capitalize()
+        sentences.append(' '.join(words) + rng.choice('..?'))
+    return ' '.join(sentences)
+
+
+def _wrap(text):
+    lines, line = [], []
+    for word in text.split(' '):
+        if line and len(' '.join(line + [word])) > LINE_WIDTH:
+            lines.append(' '.join(line))
+            line = []
+        line.append(word)
+    lines.append(' '.join(line))
+    return lines
+
+
+def _footer(page):
+    numbers = '\n'.join(str(n) for n in range(1, LINES_PER_PAGE + 1))
+    return ['', 'Heritage Reporting Corporation', '', str(page), '', numbers, '', 'Official']
+
+
+def transcript(seed, turns=180):
+    """The text of one synthetic transcript."""
+    rng = random.Random(seed)
+    counsel = rng.sample(COUNSEL, 2)
+    lines = ['Official - Subject to Final Review', '',
+             'IN THE SUPREME COURT OF THE UNITED STATES', '',
+             'ORAL ARGUMENT OF:', counsel[0], 'On behalf of the Petitioner', counsel[1],
+             'On behalf of the Respondent', '', 'PROCEEDINGS', '(10:%02d a.m.)' % rng.randint(0, 59),
+             'CHIEF JUSTICE ROBERTS: We will hear argument first this morning in Case %d.' % seed]
+    page, on_page = 1, len(lines)
+    speakers = JUSTICES + counsel * 4
+    for _ in range(turns):
+        speaker = rng.choice(speakers)
+        if ' ' in speaker and rng.random() < 0.05:
+            # A label the reporter wrapped onto two lines
+            speaker = speaker.replace(' ', '\n', 1)
+        body = _wrap('%s: %s' % (speaker, _utterance(rng)))
+        for line in body:
+            lines.append(line)
+            on_page += 1
+            if on_page >= LINES_PER_PAGE:
+                lines += _footer(page)
+                page += 1
+                on_page = 0
+    lines.append('CHIEF JUSTICE ROBERTS: Thank you, counsel. The case is submitted.')
+    lines.append('(Whereupon, at 11:%02d a.m., the case was submitted.)' % rng.randint(0, 59))
+    lines += _footer(page)
+    lines += ['', 'INDEX'] + ['%s %d:%d' % (word, rng.randint(1, page), rng.randint(1, 25))
+                              for word in rng.sample(VOCABULARY, 20)]
+    return '\n'.join(lines) + '\n'
+
+
+def cases(count, seed=0, term=2019):
+    """Case records like all_2019 plus the lower court: docket, name, date,
+    pdf and lower_court."""
+    rng = random.Random(seed)
+    out = []
+    for number in range(count):
+        docket = '%d-%d' % (term % 100 - rng.randint(0, 1), 1 + number)
+        out.append({'docket': docket,
+                    'name': 'Petitioner %d v. Respondent %d' % (number, number),
+                    'date': '%02d/%02d/%02d' % (rng.randint(10, 12), rng.randint(1, 28), term % 100),
+                    'pdf': 'https://www.supremecourt.gov/oral_arguments/argument_transcripts/'
+                           '%d/%s_%04x.pdf' % (term, docket, rng.getrandbits(16)),
+                    'lower_court': rng.choice(LOWER_COURTS)})
+    return out
+
+
+def argument_list_html(records):
+    """An argument-transcript list page for the records."""
+    rows = ['<tr><th>Argued</th><th>Date</th></tr>', '<tr><th colspan="2">October</th></tr>']
+    for record in records:
+        rows.append('<tr><td><a href="%s">%s</a><span>&nbsp;</span><span>%s</span></td>'
+                    '<td>%s</td></tr>' % (record['pdf'], record['docket'], record['name'],
+                                          record['date']))
+    menu = ''.join('<li><a href="/link%d">Link %d</a></li>' % (n, n) for n in range(200))
+    return ('<html><head><title>Argument Transcripts</title></head><body><ul>%s</ul>'
+            '<table class="table datatables">%s</table></body></html>' % (menu, ''.join(rows)))
+
+
+def docket_html(record):
+    """A docket page whose third table names the lower court in its tenth span."""
+    fields = [('Docket No.', record['docket']), ('Title:', record['name']),
+              ('Docketed:', 'January 1, 2019'), ('Linked with:', ''),
+              ('Lower Ct:', record['lower_court'])]
+    info = ''.join('<tr><td><span>%s</span></td><td><span>%s</span></td></tr>' % field
+                   for field in fields)
+    entries = ''.join('<tr><td><span>Jan %d 2019</span></td><td>%s</td></tr>'
+                      % (n + 1, 'Brief of respondent filed. ' * 8) for n in range(60))
+    return ('<html><body><table><tr><td><span>Search</span></td></tr></table>'
+            '<table><tr><td><span>Docket</span></td></tr></table>'
+            '<table>%s</table><table>%s</table></body></html>' % (info, entries))
+
+
+def write_corpus(directory, count, seed=0, turns=180, term=2019):
+    """Writes transcripts/, dockets/ and argument_list/<term>.html under
+    directory, the layout bench_extract.py --fixtures reads, plus
+    cases.json; returns the case records. An existing corpus with the same
+    parameters is reused."""
+    manifest = os.path.join(directory, 'cases.json')
+    params = {'count': count, 'seed': seed, 'turns': turns, 'term': term}
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            saved = json.load(f)
+        if saved.get('params') == params:
+            return saved['cases']
+    records = cases(count, seed, term)
+    for kind in ('transcripts', 'dockets', 'argument_list'):
+        os.makedirs(os.path.join(directory, kind), exist_ok=True)
+    for number, record in enumerate(records):
+        name = record['pdf'].split('/')[-1].split('.')[0] + '.txt'
+        with open(os.path.join(directory, 'transcripts', name), 'w') as f:
+            f.write(transcript(seed * 1000003 + number, turns))
+        with open(os.path.join(directory, 'dockets', record['docket'] + '.html'), 'w') as f:
+            f.write(docket_html(record))
+    with open(os.path.join(directory, 'argument_list', '%d.html' % term), 'w') as f:
+        f.write(argument_list_html(records))
+    with open(manifest, 'w') as f:
+        json.dump({'params': params, 'cases': records}, f)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--cases', type=int, default=60)
+    parser.add_argument('--turns', type=int, default=180)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    records = write_corpus(args.out, args.cases, args.seed, args.turns)
+    print('%d cases in %s' % (len(records), args.out))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Helpers for scraping and parsing Supreme Court oral arguments.
+
+The notebook (Supreme_Court_Project_Wall.py) walks through the project step
+by step; the pieces that need to scale past one term live here, and
+`python -m scotus` runs the whole pipeline from the shell (scotus/cli.py).
+"""
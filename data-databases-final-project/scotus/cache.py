@@ -0,0 +1,180 @@
+"""On-disk cache of pages downloaded from supremecourt.gov.
+
+Bodies are stored once per content hash under blobs/, and a small SQLite
+index maps each URL to its blob along with the validators (ETag and
+Last-Modified) needed to ask the server whether the page changed. Least
+recently used pages are dropped once the cache grows past max_bytes.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+class OfflineMiss(LookupError):
+    """Raised in offline mode when a URL has never been cached."""
+
+
+class CacheEntry:
+    __slots__ = ('url', 'digest', 'etag', 'last_modified', 'fetched_at', 'size')
+
+    def __init__(self, url, digest, etag, last_modified, fetched_at, size):
+        self.url = url
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.size = size
+
+
+class ResponseCache:
+    """Content-addressed page cache.
+
+    ttl       -- seconds a page stays fresh; None keeps it fresh forever
+    ttl_rules -- (regex, seconds) pairs checked in order before `ttl`, so
+                 e.g. a past term's argument list can live forever while the
+                 current term is re-checked daily
+    max_bytes -- once the stored bodies exceed this, the least recently
+                 used pages are evicted
+    offline   -- never touch the network: serve whatever is cached and
+                 raise OfflineMiss for anything else
+    """
+
+    def __init__(self, root, ttl=None, ttl_rules=(), max_bytes=512 * 1024 * 1024,
+                 offline=False):
+        self.root = root
+        self.ttl = ttl
+        self.ttl_rules = [(re.compile(pattern), seconds) for pattern, seconds in ttl_rules]
+        self.max_bytes = max_bytes
+        self.offline = offline
+        os.makedirs(os.path.join(root, 'blobs'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, 'index.sqlite'),
+                                   check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (accessed_at)")
+        self._db.commit()
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, 'blobs', digest[:2], digest)
+
+    def ttl_for(self, url):
+        for pattern, seconds in self.ttl_rules:
+            if pattern.search(url):
+                return seconds
+        return self.ttl
+
+    def lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, digest, etag, last_modified, fetched_at, size"
+                " FROM entries WHERE url = ?", (url,)).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def is_fresh(self, entry):
+        ttl = self.ttl_for(entry.url)
+        return ttl is None or time.time() - entry.fetched_at < ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read(self, entry):
+        """Returns the cached body for `entry` and marks it recently used."""
+        with open(self._blob_path(entry.digest), 'rb') as f:
+            body = f.read()
+        with self._lock:
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE url = ?",
+                             (time.time(), entry.url))
+            self._db.commit()
+        return body
+
+    def get(self, url):
+        """Returns the cached body of `url`, or None if it is not cached."""
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        try:
+            return self.read(entry)
+        except FileNotFoundError:
+            return None
+
+    def revalidated(self, entry):
+        """Records a 304 answer: the cached body is fresh again."""
+        with self._lock:
+            now = time.time()
+            self._db.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                             (now, now, entry.url))
+            self._db.commit()
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Stores `body` for `url`. Also how saved HTML fixtures are replayed."""
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+            with open(tmp, 'wb') as f:
+                f.write(body)
+            os.replace(tmp, path)
+        with self._lock:
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, now, now, len(body)))
+            self._db.commit()
+            self._evict()
+
+    def store_response(self, url, response):
+        self.put(url, response.content, response.headers.get('ETag'),
+                 response.headers.get('Last-Modified'))
+
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def _total_bytes(self):
+        row = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM"
+            " (SELECT digest, MAX(size) AS size FROM entries GROUP BY digest)").fetchone()
+        return row[0]
+
+    def _evict(self):
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        lru = self._db.execute(
+            "SELECT url, digest, size FROM entries ORDER BY accessed_at").fetchall()
+        for url, digest, size in lru:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            shared = self._db.execute(
+                "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone()
+            if not shared:
+                total -= size
+                try:
+                    os.remove(self._blob_path(digest))
+                except FileNotFoundError:
+                    pass
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,700 @@
+"""The pipeline from the command line, one step per subcommand.
+
+    python -m scotus scrape --term 2019      argument lists -> cases.csv
+    python -m scotus enrich                  lower court of each docket -> merged.csv
+    python -m scotus convert                 transcript PDFs -> transcripts/*.txt
+    python -m scotus parse                   transcripts -> dialogue.csv, positions/
+    python -m scotus analyze                 justices' top words and tables -> analysis/
+    python -m scotus export --speaker 'JUSTICE GINSBURG:'    the map -> geo-data.js
+    python -m scotus similar                 near-duplicate turns across cases -> similar/
+    python -m scotus run                     all of the above, only what is out of date
+    python -m scotus replay                  only the items that failed last time
+
+Files go under --data-dir (see scotus.config). Each step reads what the one
+before wrote, so any of them can be re-run on its own. Terms, dockets and
+files that fail are kept in quarantine/ (see scotus.quarantine) with their
+error; replay processes just those and merges them into the step's output
+when they go through. Only argparse is imported up front: requests, pandas
+and numpy are imported by the commands that use them, so --help and parse
+don't pay for the rest.
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+
+from .config import Config
+
+CASE_COLUMNS = ['docket', 'name', 'date', 'pdf', 'term']
+
+DIALOGUE_COLUMNS = ['speaker', 'words', 'docket']
+
+# The metrics stage each command is recorded under
+STAGE_NAMES = {'scrape': 'scrape list', 'enrich': 'enrich dockets',
+               'convert': 'convert pdfs', 'parse': 'parse transcripts', 'analyze': 'analytics',
+               'export': 'export', 'similar': 'similar turns', 'replay': 'replay'}
+
+# The stages that quarantine what fails, in the order they are replayed
+REPLAY_STAGES = ('scrape', 'enrich', 'convert', 'parse')
+
+
+def _slug(speaker):
+    return re.sub(r"[^a-z0-9]+", '_', speaker.lower()).strip('_')
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def write_csv(path, columns, rows):
+    """Writes dict rows under a temporary name and moves it into place."""
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def _fetcher(config, args):
+    from .cache import ResponseCache
+    from .crawl import term_ttl_rules
+    from .fetch import Fetcher
+
+    cache = ResponseCache(config.http_cache, ttl_rules=term_ttl_rules(), offline=config.offline)
+    return Fetcher(workers=args.workers, per_host=args.per_host, cache=cache)
+
+
+def _quarantine(config, stage):
+    from .quarantine import Quarantine
+
+    return Quarantine(config.quarantine_dir, stage)
+
+
+def _report(verb, failures):
+    for failure in failures:
+        print('could not %s' % verb, failure.docket, failure.error, file=sys.stderr)
+
+
+def _cases(config):
+    """The cases to parse: cases.csv, or merged.csv if only that exists (it
+    is written by enrich, which can run at the same time)."""
+    for path in (config.cases_csv, config.merged_csv):
+        if os.path.exists(path):
+            return read_csv(path)
+    raise SystemExit('no cases in %s yet; run scrape (and enrich) first' % config.data_dir)
+
+
+def _scrape_terms(config, args, terms):
+    """The argument-list rows of each term; returns (rows, failures), with
+    a FileFailure(term, url, error) for each list that failed."""
+    from .crawl import ARGUMENT_LIST_URL
+    from .extract import parse_case_rows
+    from .quarantine import FileFailure
+
+    rows, failures = [], []
+    with _fetcher(config, args) as fetcher:
+        for term in terms:
+            url = ARGUMENT_LIST_URL.format(term=term)
+            try:
+                found = parse_case_rows(fetcher.get(url))
+            except Exception as exc:
+                failures.append(FileFailure(str(term), url, '%s: %s' % (type(exc).__name__, exc)))
+                continue
+            rows += [dict(row._asdict(), term=term) for row in found]
+            print('%d: %d cases' % (term, len(found)))
+    return rows, failures
+
+
+def _merge_terms(cases, rows):
+    """`cases` with the rows of each term in `rows` replacing its own, in
+    term order."""
+    found = {str(row['term']) for row in rows}
+    kept = [case for case in cases if case.get('term') not in found]
+    return sorted(kept + rows, key=lambda case: int(case['term']) if case.get('term') else 0)
+
+
+def cmd_scrape(config, args, stage):
+    from .crawl import all_terms
+
+    terms = all_terms() if args.all_terms else args.term
+    rows, failures = _scrape_terms(config, args, terms)
+    _report('scrape', failures)
+    _quarantine(config, 'scrape').update(failures, done=[str(term) for term in terms])
+    stage.count(items=len(rows), failures=len(failures))
+    if failures and not rows:
+        raise SystemExit('no argument list could be scraped')
+    # Only the terms scraped now are replaced: terms scraped before, and a
+    # term that failed until it is replayed, keep the rows they had
+    cases = read_csv(config.cases_csv) if os.path.exists(config.cases_csv) else []
+    cases = _merge_terms(cases, rows)
+    write_csv(config.cases_csv, CASE_COLUMNS, cases)
+    print('%d cases written to %s, %d of them scraped now'
+          % (len(cases), config.cases_csv, len(rows)))
+
+
+def _look_up(config, args, rows, manifest):
+    """Looks up the lower court of each row into the manifest and
+    quarantines the dockets that failed; returns their FileFailures."""
+    from .crawl import row_hash
+    from .fetch import fetch_lower_courts
+
+    failures = []
+    if rows:
+        with _fetcher(config, args) as fetcher:
+            found = fetch_lower_courts([row['docket'] for row in rows], fetcher,
+                                       failures=failures)
+        for row, more_courts in zip(rows, found):
+            manifest.record(row, int(row['term']) if row.get('term') else None,
+                            more_courts.get('lower_court'))
+        manifest.save()
+    _report('look up', failures)
+    _quarantine(config, 'enrich').update(
+        failures, done=[row['docket'] for row in rows],
+        fingerprints={row['docket']: row_hash(row) for row in rows})
+    return failures
+
+
+def _update_merged(config, rows, looked_up, manifest):
+    """Upserts into merged.csv the manifest records that have a lower court,
+    of the rows just looked up and of rows merged.csv doesn't have yet; a
+    docket whose lookup failed keeps the row it had, and terms not in
+    `rows` are left alone. Returns (rows without a lower court, rows in
+    merged.csv)."""
+    from .crawl import update_merged_csv
+
+    merged = set()
+    if os.path.exists(config.merged_csv):
+        merged = {row['docket'] for row in read_csv(config.merged_csv)}
+    looked_up = {row['docket'] for row in looked_up}
+    records = []
+    missing = 0
+    for row in rows:
+        record = manifest.get(row['docket'])
+        if not record or not record.get('lower_court'):
+            missing += 1
+        elif row['docket'] in looked_up or row['docket'] not in merged:
+            records.append(record)
+    return missing, len(update_merged_csv(config.merged_csv, records))
+
+
+def cmd_enrich(config, args, stage):
+    from .crawl import Manifest
+
+    if not os.path.exists(config.cases_csv):
+        raise SystemExit('%s not found; run scrape first' % config.cases_csv)
+    rows = read_csv(config.cases_csv)
+    manifest = Manifest(config.manifest)
+    stale = [row for row in rows if args.force or manifest.needs_scrape(row)]
+    _look_up(config, args, stale, manifest)
+    missing, written = _update_merged(config, rows, stale, manifest)
+    stage.count(items=len(stale), failures=missing)
+    print('%d dockets looked up, %d without a lower court; %d cases in %s'
+          % (len(stale), missing, written, config.merged_csv))
+
+
+def _convert(config, args, cases, overwrite):
+    """convert_pdfs() for `cases`, quarantining the PDFs that failed."""
+    from .fetch import Fetcher
+    from .pdftext import PdfTextCache, convert_pdfs
+
+    # PDFs are kept in pdf_dir rather than the HTTP cache; offline, only
+    # those already there are converted
+    fetcher = None if config.offline else Fetcher(workers=args.fetch_workers,
+                                                  per_host=args.per_host)
+    cache = None if args.no_cache else PdfTextCache(config.pdf_cache)
+    try:
+        done = convert_pdfs(cases, config.pdf_dir, config.transcripts_dir, fetcher=fetcher,
+                            workers=args.workers, cache=cache, overwrite=overwrite)
+    finally:
+        if fetcher is not None:
+            fetcher.close()
+    _report('convert', done.failures)
+    _quarantine(config, 'convert').update(done.failures,
+                                          done=[case.get('docket') for case in cases])
+    if cache is not None:
+        print(cache)
+    return done
+
+
+def cmd_convert(config, args, stage):
+    done = _convert(config, args, _cases(config), args.overwrite)
+    stage.count(items=len(done.written), failures=len(done.failures))
+    print('%d transcripts written to %s, %d already there'
+          % (len(done.written), config.transcripts_dir, len(done.skipped)))
+
+
+def _speaker_label(label):
+    """A label as dialogue.csv spells it: the canonical name and its colon,
+    so 'JUSTICE\nALITO:' and 'JUSTICE ALITO:' are one speaker."""
+    from .speakers import canonical_name
+
+    return canonical_name(label) + ':'
+
+
+def _dialogue_rows(turns):
+    """The notebook's final dialogue frame: one label per speaker and words
+    without newlines."""
+    labels = {}
+    rows = []
+    for docket, speaker, words in turns:
+        label = labels.get(speaker)
+        if label is None:
+            label = labels[speaker] = _speaker_label(speaker)
+        rows.append({'speaker': label, 'words': words.replace('\n', ''), 'docket': docket})
+    return rows
+
+
+def cmd_parse(config, args, stage):
+    from .formats import FormatParser
+    from .ingest import corpus_jobs, parse_corpus
+    from .parsecache import ParseCache
+    from .positions import write_positions
+
+    cases = _cases(config)
+    # Each file parsed with its reporter's layout, whatever the term
+    parser = FormatParser(mmap=args.mmap)
+    cache = None if args.no_cache else ParseCache(config.parse_cache, parser)
+    corpus = parse_corpus(cases, config.transcripts_dir, workers=args.workers, parser=parser,
+                          cache=cache)
+    _report('parse', corpus.failures)
+    _quarantine(config, 'parse').update(corpus.failures,
+                                        done=[case.get('docket') for case in cases])
+    stage.count(items=len(cases) - len(corpus.failures), failures=len(corpus.failures))
+    write_csv(config.dialogue_csv, DIALOGUE_COLUMNS, _dialogue_rows(corpus.turns))
+    # Page, line and byte offsets of each turn, numbered like dialogue.csv's rows
+    located = write_positions(config.positions, corpus_jobs(cases, config.transcripts_dir)[0],
+                              parser, failures=corpus.failures)
+    if located != len(corpus.turns):
+        raise RuntimeError('located %d turns but parsed %d' % (located, len(corpus.turns)))
+    print('%d turns from %d transcripts written to %s'
+          % (len(corpus.turns), len(cases) - len(corpus.failures), config.dialogue_csv))
+    if cache is not None:
+        print(cache.stats)
+
+
+def _load_frames(config):
+    import pandas as pd
+
+    if not os.path.exists(config.dialogue_csv):
+        raise SystemExit('%s not found; run parse first' % config.dialogue_csv)
+    dialogue = pd.read_csv(config.dialogue_csv, dtype=str, keep_default_na=False)
+    merged = pd.read_csv(config.merged_csv, dtype=object)
+    return dialogue, merged
+
+
+def _cube(dialogue, merged, min_length):
+    from .cube import ProfileCube
+    from .wordfreq import TermCounts
+
+    counts = TermCounts.build(dialogue, min_length=min_length)
+    return counts, ProfileCube.build(dialogue, merged, counts=counts)
+
+
+def _justices(cube, speakers):
+    if speakers:
+        return [_speaker_label(speaker) for speaker in speakers]
+    return sorted(s for s in cube.cells.speaker.unique() if 'JUSTICE' in s)
+
+
+def cmd_analyze(config, args, stage):
+    dialogue, merged = _load_frames(config)
+    counts, cube = _cube(dialogue, merged, args.min_length)
+    os.makedirs(config.analysis_dir, exist_ok=True)
+    words = counts.top_k('speaker', k=args.top, min_length=args.words_min_length,
+                         mask=dialogue.speaker.str.contains('JUSTICE'))
+    words.to_csv(os.path.join(config.analysis_dir, 'justice_words.csv'), index=False)
+    cube.rollup(['speaker', 'lower_court']).to_csv(
+        os.path.join(config.analysis_dir, 'speaker_lower_court.csv'), index=False)
+    speakers = _justices(cube, args.speaker)
+    for speaker in speakers:
+        table = cube.justice_table(speaker, merged, k=args.top, min_length=args.min_length)
+        table.to_csv(os.path.join(config.analysis_dir, _slug(speaker) + '.csv'), index=False)
+    stage.count(items=len(dialogue))
+    print('%d justice tables written to %s' % (len(speakers), config.analysis_dir))
+
+
+def cmd_export(config, args, stage):
+    from .courts import CourtLookup
+    from .geojson import map_frame, write_geojson
+
+    dialogue, merged = _load_frames(config)
+    _, cube = _cube(dialogue, merged, args.min_length)
+    table = cube.justice_table(_speaker_label(args.speaker), merged, min_length=args.min_length)
+    frame = map_frame(table, color=args.color)
+    with CourtLookup(config.courts_db) as lookup:
+        points = lookup.points(frame.lower_court)
+    out = args.out or config.path('geo-data.js')
+    count = write_geojson(frame, out, points, format=args.format)
+    stage.count(items=count, failures=int((~frame.lower_court.isin(points)).sum()))
+    print('%d features written to %s (%d without coordinates)'
+          % (count, out, (~frame.lower_court.isin(points)).sum()))
+
+
+def _release_gone(config, name, wanted, rows):
+    """Releases the quarantined dockets that no case has any more."""
+    gone = wanted - {row['docket'] for row in rows}
+    if gone:
+        _quarantine(config, name).update([], done=gone)
+
+
+def _replay_scrape(config, args, terms):
+    rows, failures = _scrape_terms(config, args, [int(term) for term in terms])
+    _quarantine(config, 'scrape').update(failures, done=terms)
+    if rows:
+        cases = read_csv(config.cases_csv) if os.path.exists(config.cases_csv) else []
+        write_csv(config.cases_csv, CASE_COLUMNS, _merge_terms(cases, rows))
+    return len(terms) - len(failures), failures
+
+
+def _replay_enrich(config, args, dockets):
+    from .crawl import Manifest
+
+    rows = read_csv(config.cases_csv)
+    wanted = set(dockets)
+    replay = [row for row in rows if row['docket'] in wanted]
+    _release_gone(config, 'enrich', wanted, replay)
+    manifest = Manifest(config.manifest)
+    failures = _look_up(config, args, replay, manifest)
+    _update_merged(config, rows, replay, manifest)
+    return len(replay) - len(failures), failures
+
+
+def _replay_convert(config, args, dockets):
+    wanted = set(dockets)
+    cases = [case for case in _cases(config) if case['docket'] in wanted]
+    _release_gone(config, 'convert', wanted, cases)
+    done = _convert(config, args, cases, overwrite=True)
+    return len(done.written), done.failures
+
+
+def _replay_parse(config, args, dockets):
+    from .formats import FormatParser
+    from .ingest import corpus_jobs, parse_jobs
+    from .parsecache import ParseCache
+    from .positions import write_positions
+
+    cases = _cases(config)
+    jobs = corpus_jobs(cases, config.transcripts_dir)[0]
+    wanted = set(dockets)
+    replay = [job for job in jobs if job[0] in wanted]
+    parser = FormatParser(mmap=args.mmap)
+    cache = None if args.no_cache else ParseCache(config.parse_cache, parser)
+    parsed = parse_jobs(replay, workers=args.workers, parser=parser, cache=cache)
+    quarantine = _quarantine(config, 'parse').update(parsed.failures, done=dockets)
+    _report('parse', parsed.failures)
+    # The replayed transcripts' turns go where their cases are; every
+    # other case keeps the rows it has
+    turns = {}
+    for row in _dialogue_rows(parsed.turns):
+        turns.setdefault(row['docket'], []).append(row)
+    if os.path.exists(config.dialogue_csv):
+        for row in read_csv(config.dialogue_csv):
+            if row['docket'] not in wanted:
+                turns.setdefault(row['docket'], []).append(row)
+    rows = []
+    for docket in dict.fromkeys(docket for docket, _ in jobs):
+        rows += turns.get(docket, [])
+    write_csv(config.dialogue_csv, DIALOGUE_COLUMNS, rows)
+    # Only the replayed transcripts are located again
+    failed = [(item.key, item.path) for item in quarantine]
+    located = write_positions(config.positions, jobs, parser, failures=failed)
+    if located != len(rows):
+        raise RuntimeError('located %d turns but %s has %d' % (located, config.dialogue_csv,
+                                                               len(rows)))
+    return len(replay) - len(parsed.failures), parsed.failures
+
+
+REPLAY = {'scrape': _replay_scrape, 'enrich': _replay_enrich, 'convert': _replay_convert,
+          'parse': _replay_parse}
+
+
+def cmd_replay(config, args, stage):
+    unknown = sorted(set(args.stage) - set(REPLAY_STAGES))
+    if unknown:
+        raise SystemExit('no stage named %s (stages: %s)'
+                         % (', '.join(unknown), ', '.join(REPLAY_STAGES)))
+    replayed = failed = 0
+    for name in args.stage or REPLAY_STAGES:
+        quarantine = _quarantine(config, name)
+        if args.list:
+            for item in quarantine:
+                print('%-8s %-10s %d attempt%s  %s' % (name, item.key, item.attempts,
+                                                     's' if item.attempts > 1 else '',
+                                                     item.error))
+            continue
+        if not len(quarantine):
+            continue
+        keys = quarantine.keys()
+        options = argparse.Namespace(**vars(args))
+        if name in ('scrape', 'enrich'):
+            options.workers = args.fetch_workers
+        went, failures = REPLAY[name](config, options, keys)
+        replayed += len(keys)
+        failed += len(failures)
+        print('%-8s %d replayed, %d went through, %d still quarantined'
+              % (name, len(keys), went, len(_quarantine(config, name))))
+    stage.count(items=replayed - failed, failures=failed)
+
+
+SIMILAR_COLUMNS = ['jaccard', 'first_docket', 'first_turn', 'first_speaker', 'first_words',
+                   'second_docket', 'second_turn', 'second_speaker', 'second_words']
+
+
+def cmd_similar(config, args, stage):
+    from .similarity import SignatureIndex
+
+    if not os.path.exists(config.dialogue_csv):
+        raise SystemExit('%s not found; run parse first' % config.dialogue_csv)
+    if args.rebuild and os.path.exists(config.minhash):
+        import shutil
+
+        shutil.rmtree(config.minhash)
+    rows = read_csv(config.dialogue_csv)
+    index = SignatureIndex(config.minhash, num_perm=args.num_perm, shingle=args.shingle)
+    # Only the turns of dockets new since the last run are hashed
+    before = len(index)
+    added = index.update((row['docket'], row['speaker'], row['words']) for row in rows)
+    index.save()
+    pairs = index.pairs(threshold=args.threshold, since=before if args.new_only else None,
+                        same_docket=args.same_docket, min_shingles=args.min_shingles)
+    # The index numbers turns within their docket, as dialogue.csv lists them
+    words = {}
+    for row in rows:
+        words.setdefault(row['docket'], []).append(row['words'])
+
+    def turn(prefix, number):
+        docket, seq = index.docket(number), int(index.turn_number[number])
+        found = words.get(docket, [])
+        return {prefix + 'docket': docket, prefix + 'turn': seq,
+                prefix + 'speaker': index.speaker(number),
+                prefix + 'words': found[seq] if seq < len(found) else ''}
+
+    # Not under analysis/, which is analyze's output as a whole
+    out = args.out or os.path.join(config.similar_dir, 'near_duplicates.csv')
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    write_csv(out, SIMILAR_COLUMNS,
+              [dict(turn('first_', pair.first), **turn('second_', pair.second),
+                    jaccard='%.3f' % pair.jaccard) for pair in pairs])
+    stage.count(items=added)
+    print('%d turns hashed (%d in the index); %d near-duplicate pairs written to %s'
+          % (added, len(index), len(pairs), out))
+
+
+def pipeline_steps(config, args, metrics):
+    """The commands as pipeline Steps, with their files and settings."""
+    from .pipeline import Step
+
+    def action(name, command, **options):
+        def run():
+            with metrics.stage(STAGE_NAMES[name]) as stage:
+                try:
+                    command(config, argparse.Namespace(**options), stage)
+                except SystemExit as stop:
+                    # A missing input: fail this step, not the whole run
+                    raise RuntimeError(str(stop)) from None
+        return run
+
+    network = {'workers': args.fetch_workers, 'per_host': args.per_host}
+    gazetteer = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'courts.json')
+    terms = [] if args.all_terms else (args.term or [2019])
+    analysis = {'speaker': None, 'top': 5, 'min_length': 7, 'words_min_length': 10}
+    export = {'speaker': args.speaker, 'out': args.out or config.path('geo-data.js'),
+              'format': args.format, 'color': args.color, 'min_length': 7}
+    return [
+        Step('scrape', action('scrape', cmd_scrape, term=terms, all_terms=args.all_terms,
+                              **network),
+             outputs=[config.cases_csv], params={'terms': terms, 'all_terms': args.all_terms},
+             code=[cmd_scrape, 'scotus.extract']),
+        Step('enrich', action('enrich', cmd_enrich, force=False, **network),
+             inputs=[config.cases_csv], outputs=[config.merged_csv],
+             code=[cmd_enrich, 'scotus.extract']),
+        Step('parse', action('parse', cmd_parse, workers=args.workers, no_cache=False,
+                             mmap=False),
+             inputs=[config.cases_csv, config.transcripts_dir],
+             outputs=[config.dialogue_csv, config.positions],
+             code=[cmd_parse, _cases, 'scotus.ingest', 'scotus.transcripts', 'scotus.formats',
+                   'scotus.positions']),
+        Step('analyze', action('analyze', cmd_analyze, **analysis),
+             inputs=[config.dialogue_csv, config.merged_csv], outputs=[config.analysis_dir],
+             params=analysis, code=[cmd_analyze, _load_frames, _cube, _justices,
+                                    'scotus.cube', 'scotus.wordfreq']),
+        Step('export', action('export', cmd_export, **export),
+             inputs=[config.dialogue_csv, config.merged_csv, gazetteer],
+             outputs=[export['out']], params=export,
+             code=[cmd_export, _load_frames, _cube, 'scotus.cube', 'scotus.wordfreq',
+                   'scotus.geojson', 'scotus.courts']),
+    ]
+
+
+def cmd_run(config, args, metrics):
+    from .pipeline import BLOCKED, FAILED, Pipeline
+
+    def report(result):
+        line = '%-8s %-10s' % (result.step, result.status)
+        if result.reason:
+            line += ' (%s)' % result.reason
+        if result.seconds:
+            line += ' %.1f s' % result.seconds
+        if result.error:
+            line += ': ' + result.error
+        print(line)
+
+    unknown = sorted(set(args.target) - set(STEPS))
+    if unknown:
+        raise SystemExit('no step named %s (steps: %s)' % (', '.join(unknown), ', '.join(STEPS)))
+    pipeline = Pipeline(pipeline_steps(config, args, metrics), config.path('pipeline.json'))
+    results = pipeline.run(args.target or None, force=args.force or (), jobs=args.jobs,
+                           dry_run=args.dry_run, report=report)
+    return 1 if any(result.status in (FAILED, BLOCKED) for result in results) else 0
+
+
+COMMANDS = {'scrape': cmd_scrape, 'enrich': cmd_enrich, 'convert': cmd_convert,
+            'parse': cmd_parse, 'analyze': cmd_analyze, 'export': cmd_export,
+            'similar': cmd_similar, 'replay': cmd_replay}
+
+STEPS = ('scrape', 'enrich', 'parse', 'analyze', 'export')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='scotus', description=__doc__.splitlines()[0])
+    parser.add_argument('--data-dir', help='default: $SCOTUS_DATA_DIR or ./data')
+    parser.add_argument('--transcripts-dir',
+                        help='default: $SCOTUS_TRANSCRIPTS_DIR or DATA_DIR/transcripts')
+    parser.add_argument('--cache-dir', help='default: $SCOTUS_CACHE_DIR or DATA_DIR/cache')
+    parser.add_argument('--offline', action='store_true',
+                        help='serve pages only from the HTTP cache')
+    parser.add_argument('--metrics', help='record stage metrics to this JSON file '
+                                          '(default: $SCOTUS_METRICS)')
+    parser.add_argument('--profile', choices=('cprofile', 'pyinstrument'),
+                        help='profile each stage (with --metrics)')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND', required=True)
+
+    def network(sub):
+        sub.add_argument('--workers', type=int, default=8, help='requests in flight at once')
+        sub.add_argument('--per-host', type=float, default=4.0, help='requests per second')
+
+    sub = commands.add_parser('scrape', help='argument lists -> cases.csv')
+    terms = sub.add_mutually_exclusive_group()
+    terms.add_argument('--term', type=int, action='append',
+                       help='term to scrape (repeatable; default 2019)')
+    terms.add_argument('--all-terms', action='store_true', help='every term since 2000')
+    network(sub)
+
+    sub = commands.add_parser('enrich', help='lower courts from the dockets -> merged.csv')
+    sub.add_argument('--force', action='store_true',
+                     help='look up every docket, not just new or changed ones')
+    network(sub)
+
+    sub = commands.add_parser('convert', help='transcript PDFs -> transcripts/*.txt '
+                                              '(needs pypdf)')
+    sub.add_argument('--workers', type=int, default=None,
+                     help='processes (default: every core; 1 extracts in this process)')
+    sub.add_argument('--fetch-workers', type=int, default=8, help='downloads in flight at once')
+    sub.add_argument('--per-host', type=float, default=4.0, help='requests per second')
+    sub.add_argument('--overwrite', action='store_true',
+                     help='replace .txt files that already exist')
+    sub.add_argument('--no-cache', action='store_true', help="don't use the extracted text cache")
+
+    sub = commands.add_parser('parse', help='transcripts -> dialogue.csv and positions/')
+    sub.add_argument('--workers', type=int, default=None,
+                     help='processes (default: every core; 1 parses in this process)')
+    sub.add_argument('--no-cache', action='store_true', help="don't use the parse cache")
+    sub.add_argument('--mmap', action='store_true',
+                     help='map transcripts into memory instead of reading them (same turns)')
+
+    sub = commands.add_parser('analyze', help='top words and justice tables -> analysis/')
+    sub.add_argument('--speaker', action='append',
+                     help="e.g. 'JUSTICE GINSBURG:' (repeatable; default every justice)")
+    sub.add_argument('--top', type=int, default=5, help='top words per justice and case')
+    sub.add_argument('--min-length', type=int, default=7, help='shortest word counted per case')
+    sub.add_argument('--words-min-length', type=int, default=10,
+                     help='shortest word counted per justice')
+
+    sub = commands.add_parser('export', help="one justice's cases on the map -> geo-data.js")
+    sub.add_argument('--speaker', default='JUSTICE GINSBURG:')
+    sub.add_argument('--out', help='default: DATA_DIR/geo-data.js')
+    sub.add_argument('--format', choices=('js', 'geojson', 'ndjson'),
+                     help='default: from the file name')
+    sub.add_argument('--color', default='#251FE0')
+    sub.add_argument('--min-length', type=int, default=7)
+
+    sub = commands.add_parser('run', help='every step whose inputs, settings or code changed')
+    sub.add_argument('target', nargs='*',
+                     help='steps to bring up to date, with what they need (default: all '
+                          'of %s)' % ', '.join(STEPS))
+    sub.add_argument('--force', action='append', choices=STEPS,
+                     help='rebuild this step anyway, e.g. scrape to re-read the '
+                          'argument lists (repeatable)')
+    sub.add_argument('--jobs', type=int, help='steps run at once (default: all that are ready)')
+    sub.add_argument('--dry-run', action='store_true', help='only show what is out of date')
+    terms = sub.add_mutually_exclusive_group()
+    terms.add_argument('--term', type=int, action='append')
+    terms.add_argument('--all-terms', action='store_true')
+    sub.add_argument('--fetch-workers', type=int, default=8, help='requests in flight at once')
+    sub.add_argument('--per-host', type=float, default=4.0, help='requests per second')
+    sub.add_argument('--workers', type=int, default=None, help='parse processes')
+    sub.add_argument('--speaker', default='JUSTICE GINSBURG:', help='whose cases are mapped')
+    sub.add_argument('--out', help='the map (default: DATA_DIR/geo-data.js)')
+    sub.add_argument('--format', choices=('js', 'geojson', 'ndjson'))
+    sub.add_argument('--color', default='#251FE0')
+
+    sub = commands.add_parser('similar', help='near-duplicate turns across cases '
+                                              '-> similar/near_duplicates.csv')
+    sub.add_argument('--threshold', type=float, default=0.5,
+                     help='lowest estimated Jaccard similarity of word shingles')
+    sub.add_argument('--same-docket', action='store_true',
+                     help='include pairs within one argument')
+    sub.add_argument('--new-only', action='store_true',
+                     help='only pairs with a turn added by this run')
+    sub.add_argument('--min-shingles', type=int, default=8,
+                     help='leave out turns with fewer shingles than this')
+    sub.add_argument('--num-perm', type=int, help='MinHash functions (default 128; new index)')
+    sub.add_argument('--shingle', type=int, help='words per shingle (default 5; new index)')
+    sub.add_argument('--rebuild', action='store_true',
+                     help='hash every turn again, e.g. after the transcripts were re-parsed')
+    sub.add_argument('--out', help='default: DATA_DIR/similar/near_duplicates.csv')
+
+    sub = commands.add_parser('replay', help='only the terms, dockets and files that failed, '
+                                             'merged into what was written')
+    sub.add_argument('stage', nargs='*',
+                     help='stages to replay (default: all of %s)' % ', '.join(REPLAY_STAGES))
+    sub.add_argument('--list', action='store_true', help="only show what is quarantined")
+    sub.add_argument('--workers', type=int, default=None, help='convert and parse processes')
+    sub.add_argument('--fetch-workers', type=int, default=8, help='requests in flight at once')
+    sub.add_argument('--per-host', type=float, default=4.0, help='requests per second')
+    sub.add_argument('--no-cache', action='store_true',
+                     help="don't use the parse and extracted text caches")
+    sub.add_argument('--mmap', action='store_true',
+                     help='map transcripts into memory instead of reading them')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'scrape' and not args.all_terms and not args.term:
+        args.term = [2019]
+    config = Config.from_env(data_dir=args.data_dir, transcripts_dir=args.transcripts_dir,
+                             cache_dir=args.cache_dir, offline=args.offline)
+    config.ensure()
+
+    from .metrics import Instrumentation
+
+    if args.metrics:
+        metrics = Instrumentation(args.metrics, profile=args.profile)
+    else:
+        metrics = Instrumentation.from_env()
+    if args.command == 'run':
+        # Steps run side by side: tracemalloc and the profilers are
+        # process-wide, so memory isn't traced and profiling runs one step
+        # at a time
+        metrics.trace_memory = False
+        if metrics.profile:
+            args.jobs = 1
+        return cmd_run(config, args, metrics)
+    with metrics.stage(STAGE_NAMES[args.command]) as stage:
+        COMMANDS[args.command](config, args, stage)
+    return 0
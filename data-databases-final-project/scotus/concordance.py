@@ -0,0 +1,307 @@
+"""Positional inverted index and keyword-in-context lines.
+
+"Where did a justice say X, and in which cases" used to be a regex scan of
+the whole words column. ConcordanceIndex maps every word to the turns it
+occurs in and its positions there, so phrases and words near each other are
+found by intersecting sorted arrays, and KWIC lines only touch the turns
+that matched.
+
+On disk an index is a directory:
+
+    lexicon.json    word -> where its postings are, and how many turns
+    postings.bin    per word, three varint streams: turn id deltas, the
+                    number of positions in each turn, and position deltas
+                    (restarting in every turn)
+    text.bin        every turn's words, UTF-8, back to back
+    turns.npz       per turn: docket id, speaker id, offset into text.bin
+    meta.json       the docket and speaker names
+
+postings.bin and text.bin are memory-mapped when an index is opened, so
+only the postings a query needs are read.
+"""
+import json
+import mmap
+import os
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from .speakers import canonical_name
+
+WORD = re.compile(r"\w+")
+
+FORMAT_VERSION = 2
+
+Hit = namedtuple('Hit', ['turn', 'position'])
+Concordance = namedtuple('Concordance', ['docket', 'speaker', 'turn', 'left', 'match', 'right'])
+
+
+def tokenize(text):
+    return [word.lower() for word in WORD.findall(text)]
+
+
+def encode_varints(values):
+    """LEB128: seven bits per byte, high bit set on all but the last byte."""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return b''
+    sizes = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        sizes += rest > 0
+        rest >>= np.uint64(7)
+    starts = np.cumsum(sizes) - sizes
+    out = np.empty(int(sizes.sum()), dtype=np.uint8)
+    rest = values.copy()
+    for byte in range(int(sizes.max())):
+        active = sizes > byte
+        more = (sizes[active] > byte + 1).astype(np.uint8) << 7
+        out[starts[active] + byte] = (rest[active] & np.uint64(0x7f)).astype(np.uint8) | more
+        rest[active] >>= np.uint64(7)
+    return out.tobytes()
+
+
+def decode_varints(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group_start = np.repeat(starts, ends - starts + 1)
+    shifts = (7 * (np.arange(len(data)) - group_start)).astype(np.uint64)
+    pieces = (data & 0x7f).astype(np.uint64) << shifts
+    return np.add.reduceat(pieces, starts).astype(np.int64)
+
+
+class IndexBuilder:
+    """Collects turns in order and writes a ConcordanceIndex directory."""
+
+    def __init__(self):
+        self.dockets = []
+        self.speakers = []
+        self._docket_ids = {}
+        self._speaker_ids = {}
+        self.turn_docket = []
+        self.turn_speaker = []
+        self.texts = []
+        # word -> [last turn, turn deltas, positions per turn, position deltas]
+        self.postings = {}
+
+    def _id(self, names, ids, name):
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    def add(self, docket, speaker, words):
+        turn = len(self.texts)
+        self.turn_docket.append(self._id(self.dockets, self._docket_ids, docket))
+        self.turn_speaker.append(self._id(self.speakers, self._speaker_ids,
+                                          canonical_name(speaker)))
+        self.texts.append(words)
+        positions = {}
+        for position, word in enumerate(tokenize(words)):
+            positions.setdefault(word, []).append(position)
+        for word, found in positions.items():
+            entry = self.postings.get(word)
+            if entry is None:
+                entry = self.postings[word] = [0, [], [], []]
+            entry[1].append(turn - entry[0])
+            entry[0] = turn
+            entry[2].append(len(found))
+            previous = 0
+            for position in found:
+                entry[3].append(position - previous)
+                previous = position
+
+    def add_turns(self, turns):
+        for docket, speaker, words in turns:
+            self.add(docket, speaker, words)
+        return self
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        lexicon = {}
+        with open(os.path.join(directory, 'postings.bin'), 'wb') as f:
+            offset = 0
+            for word in sorted(self.postings):
+                _, turns, counts, positions = self.postings[word]
+                entry = [len(turns)]
+                for stream in (turns, counts, positions):
+                    data = encode_varints(stream)
+                    f.write(data)
+                    entry += [offset, len(data)]
+                    offset += len(data)
+                lexicon[word] = entry
+        with open(os.path.join(directory, 'lexicon.json'), 'w') as f:
+            json.dump(lexicon, f)
+
+        encoded = [text.encode('utf-8') for text in self.texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+        with open(os.path.join(directory, 'text.bin'), 'wb') as f:
+            f.writelines(encoded)
+        np.savez(os.path.join(directory, 'turns.npz'),
+                 docket=np.asarray(self.turn_docket, dtype=np.int32),
+                 speaker=np.asarray(self.turn_speaker, dtype=np.int32),
+                 offsets=offsets)
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'dockets': self.dockets,
+                       'speakers': self.speakers}, f)
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ConcordanceIndex:
+    """A saved index opened for queries."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError('index format %s, expected %s' % (meta['version'], FORMAT_VERSION))
+        self.dockets = meta['dockets']
+        self.speakers = meta['speakers']
+        with open(os.path.join(directory, 'lexicon.json')) as f:
+            self.lexicon = json.load(f)
+        with np.load(os.path.join(directory, 'turns.npz')) as turns:
+            self.turn_docket = turns['docket']
+            self.turn_speaker = turns['speaker']
+            self.offsets = turns['offsets']
+        self._postings = _map(os.path.join(directory, 'postings.bin'))
+        self._text = _map(os.path.join(directory, 'text.bin'))
+
+    @classmethod
+    def build(cls, turns, directory):
+        IndexBuilder().add_turns(turns).save(directory)
+        return cls(directory)
+
+    def __len__(self):
+        return len(self.turn_docket)
+
+    def close(self):
+        for buffer in (self._postings, self._text):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def text(self, turn):
+        return self._text[self.offsets[turn]:self.offsets[turn + 1]].decode('utf-8')
+
+    def turn_frequency(self, word):
+        entry = self.lexicon.get(word.lower())
+        return entry[0] if entry else 0
+
+    def occurrences(self, word):
+        """Every occurrence of `word`: (turn ids, positions), sorted."""
+        entry = self.lexicon.get(word.lower())
+        if entry is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        _, turns_at, turns_len, counts_at, counts_len, positions_at, positions_len = entry
+        turns = np.cumsum(decode_varints(self._postings[turns_at:turns_at + turns_len]))
+        counts = decode_varints(self._postings[counts_at:counts_at + counts_len])
+        deltas = decode_varints(self._postings[positions_at:positions_at + positions_len])
+        running = np.cumsum(deltas)
+        firsts = np.cumsum(counts) - counts
+        restart = np.repeat(running[firsts] - deltas[firsts], counts)
+        return np.repeat(turns, counts), running - restart
+
+    def _keys(self, word, shift=0):
+        """Occurrences as sorted turn << 32 | (position - shift) keys."""
+        turns, positions = self.occurrences(word)
+        if shift:
+            keep = positions >= shift
+            turns, positions = turns[keep], positions[keep] - shift
+        return (turns << 32) | positions
+
+    def _filter_turns(self, turns, dockets, speakers):
+        keep = np.ones(len(turns), dtype=bool)
+        if dockets is not None:
+            ids = [self.dockets.index(d) for d in ([dockets] if isinstance(dockets, str) else dockets)
+                   if d in self.dockets]
+            keep &= np.isin(self.turn_docket[turns], ids)
+        if speakers is not None:
+            wanted = [speakers] if isinstance(speakers, str) else speakers
+            ids = [i for i, name in enumerate(self.speakers)
+                   if any(canonical_name(w) in name for w in wanted)]
+            keep &= np.isin(self.turn_speaker[turns], ids)
+        return keep
+
+    def _hits(self, keys, dockets, speakers):
+        turns = keys >> 32
+        positions = keys & 0xffffffff
+        keep = self._filter_turns(turns, dockets, speakers)
+        return [Hit(int(t), int(p)) for t, p in zip(turns[keep], positions[keep])]
+
+    def phrase(self, text, dockets=None, speakers=None):
+        """Where the words of `text` occur next to each other, in order."""
+        words = tokenize(text)
+        if not words:
+            return []
+        keys = self._keys(words[0])
+        for shift, word in enumerate(words[1:], 1):
+            if not len(keys):
+                break
+            keys = np.intersect1d(keys, self._keys(word, shift), assume_unique=True)
+        return self._hits(keys, dockets, speakers)
+
+    def near(self, first, second, distance=5, dockets=None, speakers=None):
+        """Where `first` occurs within `distance` words of `second` (either
+        side) in the same turn. Positions are those of `first`."""
+        a = self._keys(first)
+        b = self._keys(second)
+        if not len(a) or not len(b):
+            return []
+        positions = a & 0xffffffff
+        low = a - np.minimum(positions, distance)
+        high = a + distance
+        found = np.searchsorted(b, high, side='right') - np.searchsorted(b, low, side='left')
+        if tokenize(first) == tokenize(second):
+            found -= 1
+        return self._hits(a[found > 0], dockets, speakers)
+
+    def search(self, query, dockets=None, speakers=None):
+        """A phrase, or 'word NEAR/5 word' for a proximity query."""
+        near = re.fullmatch(r"\s*(\w+)\s+NEAR(?:/(\d+))?\s+(\w+)\s*", query)
+        if near:
+            return self.near(near.group(1), near.group(3), int(near.group(2) or 5),
+                             dockets, speakers)
+        return self.phrase(query, dockets, speakers)
+
+    def kwic(self, query, width=5, dockets=None, speakers=None, limit=None):
+        """Keyword-in-context lines for `query`, `width` words either side."""
+        hits = self.search(query, dockets, speakers)
+        if limit is not None:
+            hits = hits[:limit]
+        length = len(tokenize(query)) if 'NEAR' not in query else 1
+        lines = []
+        spans = {}
+        for turn, position in hits:
+            if turn not in spans:
+                text = self.text(turn)
+                spans[turn] = (text, [match.span() for match in WORD.finditer(text)])
+            text, words = spans[turn]
+            last = min(position + length, len(words)) - 1
+            left_start = words[max(0, position - width)][0]
+            right_end = words[min(len(words), last + 1 + width) - 1][1]
+            lines.append(Concordance(
+                self.dockets[self.turn_docket[turn]],
+                self.speakers[self.turn_speaker[turn]],
+                turn,
+                ' '.join(text[left_start:words[position][0]].split()),
+                ' '.join(text[words[position][0]:words[last][1]].split()),
+                ' '.join(text[words[last][1]:right_end].split()),
+            ))
+        return lines
@@ -0,0 +1,120 @@
+"""Where a run keeps its data.
+
+The notebook read transcripts from /Users/sheridanwall/Documents/... and
+wrote merged.csv, http_cache/ and the rest into whatever directory it was
+started from. A Config names three directories and every file lives under
+one of them:
+
+    data_dir        -- cases.csv, merged.csv, dialogue.csv, positions/, the
+                       manifest, courts.sqlite, analysis/, similar/, pdfs/,
+                       quarantine/, minhash/ and the map
+    transcripts_dir -- the transcript .txt files (default: data_dir/transcripts)
+    cache_dir       -- http/, parse/ and pdf/ caches (default: data_dir/cache)
+
+Each comes from, in order: an argument, SCOTUS_DATA_DIR /
+SCOTUS_TRANSCRIPTS_DIR / SCOTUS_CACHE_DIR, or the default:
+
+    config = Config.from_env(transcripts_dir='~/Documents/Data/2019pdfs_official')
+    config.merged_csv      # 'data/merged.csv'
+"""
+import os
+
+DEFAULT_DATA_DIR = 'data'
+
+ENVIRONMENT = {'data_dir': 'SCOTUS_DATA_DIR', 'transcripts_dir': 'SCOTUS_TRANSCRIPTS_DIR',
+               'cache_dir': 'SCOTUS_CACHE_DIR'}
+
+
+class Config:
+    """The directories of a run and the files in them.
+
+    offline -- serve pages only from the HTTP cache, never the network
+    """
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR, transcripts_dir=None, cache_dir=None,
+                 offline=False):
+        self.data_dir = os.path.expanduser(data_dir)
+        self.transcripts_dir = os.path.expanduser(
+            transcripts_dir or os.path.join(self.data_dir, 'transcripts'))
+        self.cache_dir = os.path.expanduser(cache_dir or os.path.join(self.data_dir, 'cache'))
+        self.offline = offline
+
+    @classmethod
+    def from_env(cls, environ=None, **overrides):
+        """A Config from the arguments given (None counts as not given),
+        falling back on the SCOTUS_* variables, then the defaults."""
+        environ = os.environ if environ is None else environ
+        values = {}
+        for name, variable in ENVIRONMENT.items():
+            value = overrides.pop(name, None) or environ.get(variable) or None
+            if value is not None:
+                values[name] = value
+        return cls(**values, **overrides)
+
+    def __repr__(self):
+        return 'Config(data_dir=%r, transcripts_dir=%r, cache_dir=%r, offline=%r)' % (
+            self.data_dir, self.transcripts_dir, self.cache_dir, self.offline)
+
+    def path(self, *parts):
+        return os.path.join(self.data_dir, *parts)
+
+    def ensure(self):
+        """Creates data_dir and cache_dir if they don't exist."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def cases_csv(self):
+        return self.path('cases.csv')
+
+    @property
+    def merged_csv(self):
+        return self.path('merged.csv')
+
+    @property
+    def manifest(self):
+        return self.path('scotus_manifest.json')
+
+    @property
+    def dialogue_csv(self):
+        return self.path('dialogue.csv')
+
+    @property
+    def positions(self):
+        return self.path('positions')
+
+    @property
+    def minhash(self):
+        return self.path('minhash')
+
+    @property
+    def courts_db(self):
+        return self.path('courts.sqlite')
+
+    @property
+    def analysis_dir(self):
+        return self.path('analysis')
+
+    @property
+    def similar_dir(self):
+        return self.path('similar')
+
+    @property
+    def pdf_dir(self):
+        return self.path('pdfs')
+
+    @property
+    def quarantine_dir(self):
+        return self.path('quarantine')
+
+    @property
+    def http_cache(self):
+        return os.path.join(self.cache_dir, 'http')
+
+    @property
+    def parse_cache(self):
+        return os.path.join(self.cache_dir, 'parse')
+
+    @property
+    def pdf_cache(self):
+        return os.path.join(self.cache_dir, 'pdf')
@@ -0,0 +1,264 @@
+"""Placing lower courts on the map without geocoding.
+
+The map's coordinates were a hand-written list of cities lined up with the
+courts by row position, so a court that wasn't on the list (a state
+supreme court, a district court) was dropped or put in the wrong place. The
+gazetteer bundled in data/courts.json lists the federal courts of appeals,
+the district courts and the state courts of last resort, each with the
+city it sits in. Gazetteer.match() normalizes a scraped lower_court string
+('U.S. Court of Appeals for the 9th Cir.', 'Supreme Court of Kansas') and
+finds the entry it names; CourtLookup remembers every answer in SQLite, so
+placing thousands of cases is a dictionary lookup:
+
+    lookup = CourtLookup('courts.sqlite')
+    lookup.locate(merged.lower_court)    # court, city, longitude, latitude
+    lookup.points(output3.lower_court)   # {lower_court: (longitude, latitude)}
+
+The gazetteer has a version; answers remembered under an older version are
+worked out again.
+"""
+import json
+import math
+import os
+import re
+import sqlite3
+from collections import namedtuple
+
+import pandas as pd
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'courts.json')
+
+Court = namedtuple('Court', ['id', 'name', 'kind', 'circuit', 'state', 'city', 'longitude',
+                             'latitude', 'aliases'])
+CourtMatch = namedtuple('CourtMatch', ['court', 'score'])
+
+ORDINALS = {'1st': 'first', '2d': 'second', '2nd': 'second', '3d': 'third', '3rd': 'third',
+            '4th': 'fourth', '5th': 'fifth', '6th': 'sixth', '7th': 'seventh', '8th': 'eighth',
+            '9th': 'ninth', '10th': 'tenth', '11th': 'eleventh'}
+
+DIRECTIONS = {'n': 'northern', 's': 'southern', 'e': 'eastern', 'w': 'western',
+              'c': 'central', 'm': 'middle'}
+
+# Abbreviations as they appear in docket entries and citations, applied to
+# the lower-cased string in this order
+ABBREVIATIONS = [
+    (re.compile(r"\bu\.\s?s\.?(?=\s|$|,)"), 'united states'),
+    (re.compile(r"\bd\.\s?c\.?(?=\s|$|,)"), 'district of columbia'),
+    (re.compile(r"\b([nsewcm])\.\s?d\.?\s"), lambda m: DIRECTIONS[m.group(1)] + ' district of '),
+    (re.compile(r"\bd\.\s(?=[a-z])"), 'district of '),
+    (re.compile(r"\bct\b\.?"), 'court'),
+    (re.compile(r"\bapp\b\.?"), 'appeals'),
+    (re.compile(r"\bcir\b\.?"), 'circuit'),
+    (re.compile(r"\bdist\b\.?"), 'district'),
+    (re.compile(r"\bsup\b\.?"), 'supreme'),
+    (re.compile(r"\bcrim\b\.?"), 'criminal'),
+    (re.compile(r"\bjud\b\.?"), 'judicial'),
+    (re.compile(r"&"), ' and '),
+]
+
+# Words that don't tell one court from another
+STOPWORDS = frozenset(['the', 'of', 'for', 'in', 'and', 'court', 'courts'])
+
+
+def court_tokens(text):
+    """The words that identify a court, normalized: 'U.S. Ct. App., 9th Cir.'
+    -> ['united', 'states', 'appeals', 'ninth', 'circuit']"""
+    text = ' '.join(str(text).lower().split())
+    for pattern, replacement in ABBREVIATIONS:
+        text = pattern.sub(replacement, text)
+    words = re.findall(r"[a-z0-9]+", text)
+    return [ORDINALS.get(word, word) for word in words if word not in STOPWORDS]
+
+
+def normalize_court(text):
+    return ' '.join(court_tokens(text))
+
+
+class Gazetteer:
+    """The courts of a gazetteer file and an index of their names.
+
+    courts  -- Court records
+    version -- the gazetteer's version, stored with remembered matches
+    states  -- postal code -> state name, for telling which state a string
+               is about
+    """
+
+    def __init__(self, courts, version, states=None):
+        self.version = version
+        self.courts = {court.id: court for court in courts}
+        self.states = dict(states or {})
+        self._exact = {}
+        self._names = []
+        for court in courts:
+            for name in [court.name] + list(court.aliases):
+                tokens = court_tokens(name)
+                self._exact.setdefault(frozenset(tokens), court.id)
+                self._names.append((court.id, frozenset(tokens)))
+        documents = {}
+        for court_id, tokens in self._names:
+            for token in tokens:
+                documents.setdefault(token, set()).add(court_id)
+        self._weight = {token: math.log(1 + len(self.courts) / len(ids))
+                        for token, ids in documents.items()}
+        self._state_names = sorted(
+            ((normalize_court(name), code) for code, name in (states or {}).items()),
+            key=lambda pair: -len(pair[0]))
+
+    @classmethod
+    def load(cls, path=GAZETTEER_PATH):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        courts = [Court(**{**entry, 'aliases': tuple(entry.get('aliases', ()))})
+                  for entry in data['courts']]
+        return cls(courts, data['version'], data.get('states'))
+
+    def __len__(self):
+        return len(self.courts)
+
+    def __getitem__(self, court_id):
+        return self.courts[court_id]
+
+    def state_of(self, tokens):
+        """The postal code of the state named in normalized tokens, if any."""
+        text = ' %s ' % ' '.join(tokens)
+        for name, code in self._state_names:
+            if ' %s ' % name in text:
+                return code
+        return None
+
+    def _candidates(self, tokens, raw):
+        """Which courts a string can name, from the words it uses: courts of
+        appeals mention a circuit, federal trial courts are district courts
+        of the United States, and anything else naming a state is one of
+        that state's courts."""
+        words = set(tokens)
+        state = self.state_of(tokens)
+        if 'circuit' in words or 'armed' in words:
+            kinds = {'circuit', 'military'}
+        elif 'district court' in ' '.join(raw.lower().split()) or (
+                'district' in words and {'united', 'states'} <= words):
+            kinds = {'district'}
+        elif state is not None:
+            kinds = {'state'}
+        else:
+            kinds = None
+        return [(court_id, names) for court_id, names in self._names
+                if (kinds is None or self.courts[court_id].kind in kinds)
+                and (state is None or kinds == {'circuit', 'military'}
+                     or self.courts[court_id].state == state)]
+
+    def match(self, raw, threshold=0.6):
+        """The court a lower_court string names, as CourtMatch(court, score)
+        with score 1.0 for an exact name; None when nothing scores at least
+        `threshold`."""
+        if raw is None or (isinstance(raw, float) and math.isnan(raw)) or not str(raw).strip():
+            return None
+        raw = str(raw)
+        tokens = court_tokens(raw)
+        if not tokens:
+            return None
+        court_id = self._exact.get(frozenset(tokens))
+        if court_id is not None:
+            return CourtMatch(self.courts[court_id], 1.0)
+
+        query = set(tokens)
+        query_weight = sum(self._weight.get(token, 1.0) for token in query)
+        best = None
+        for court_id, names in self._candidates(tokens, raw):
+            shared = sum(self._weight[token] for token in names & query)
+            if not shared:
+                continue
+            covered = shared / sum(self._weight[token] for token in names)
+            # Mostly: how much of the court's name is in the string; then how
+            # much of the string is the court's name, to break ties
+            score = 0.75 * covered + 0.25 * shared / query_weight
+            if best is None or score > best[1]:
+                best = (court_id, score)
+        if best is None or best[1] < threshold:
+            return None
+        return CourtMatch(self.courts[best[0]], round(best[1], 4))
+
+
+class CourtLookup:
+    """Gazetteer matches remembered in a SQLite table, keyed by the raw
+    lower_court string. Strings that match nothing are remembered too."""
+
+    def __init__(self, path, gazetteer=None, threshold=0.6):
+        self.gazetteer = gazetteer or Gazetteer.load()
+        self.threshold = threshold
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS matches ("
+                        " raw TEXT PRIMARY KEY, court_id TEXT, score REAL, version TEXT)")
+        self._memo = {}
+        rows = self.db.execute("SELECT raw, court_id, score FROM matches WHERE version = ?",
+                               (self.gazetteer.version,))
+        for raw, court_id, score in rows:
+            court = self.gazetteer.courts.get(court_id)
+            self._memo[raw] = CourtMatch(court, score) if court is not None else None
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _remember(self, rows):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO matches VALUES (?, ?, ?, ?)", rows)
+
+    def match(self, raw):
+        return self.match_many([raw])[raw]
+
+    def match_many(self, values):
+        """{raw string: CourtMatch or None} for every distinct value."""
+        out = {}
+        new = []
+        for raw in dict.fromkeys(values):
+            if raw is None or (isinstance(raw, float) and math.isnan(raw)):
+                out[raw] = None
+                continue
+            if raw not in self._memo:
+                found = self.gazetteer.match(raw, self.threshold)
+                self._memo[raw] = found
+                new.append((raw, found.court.id if found else None,
+                            found.score if found else 0.0, self.gazetteer.version))
+            out[raw] = self._memo[raw]
+        if new:
+            self._remember(new)
+        return out
+
+    def set(self, raw, court_id):
+        """Pins a string to a court by hand, e.g. for one matching wrongly."""
+        court = self.gazetteer[court_id]
+        self._memo[raw] = CourtMatch(court, 1.0)
+        self._remember([(raw, court_id, 1.0, self.gazetteer.version)])
+
+    def locate(self, values):
+        """One row per value: lower_court, court_id, court, kind, circuit,
+        state, city, longitude, latitude and score (empty where unmatched)."""
+        values = list(values)
+        found = self.match_many(values)
+        rows = []
+        for raw in values:
+            match = found[raw]
+            court = match.court if match else None
+            rows.append({'lower_court': raw,
+                         'court_id': court.id if court else None,
+                         'court': court.name if court else None,
+                         'kind': court.kind if court else None,
+                         'circuit': court.circuit if court else None,
+                         'state': court.state if court else None,
+                         'city': court.city if court else None,
+                         'longitude': court.longitude if court else None,
+                         'latitude': court.latitude if court else None,
+                         'score': match.score if match else None})
+        return pd.DataFrame(rows)
+
+    def points(self, values):
+        """{lower_court: (longitude, latitude)} for the values that matched,
+        as scotus.geojson.write_geojson takes them."""
+        return {raw: (match.court.longitude, match.court.latitude)
+                for raw, match in self.match_many(values).items() if match is not None}
@@ -0,0 +1,173 @@
+"""Crawling argument lists term by term.
+
+A Manifest remembers every docket already scraped: the term it was argued
+in, its row on the argument list, the PDF name and when it was scraped. A
+crawl of a term fetches the argument list, compares each row against the
+manifest and only looks up the docket page for rows that are new, changed,
+or never got a lower court. Past terms never change, so with a
+ResponseCache using term_ttl_rules() re-crawling them is free, and the
+current term can be refreshed daily.
+"""
+import datetime
+import hashlib
+import json
+import os
+import time
+
+from .extract import parse_case_rows
+from .fetch import DOCKET_URL, fetch_lower_courts
+
+ARGUMENT_LIST_URL = 'https://www.supremecourt.gov/oral_arguments/argument_transcript/{term}'
+
+FIRST_TERM = 2000
+
+MERGED_COLUMNS = ['docket', 'name', 'date', 'pdf', 'lower_court', 'term']
+
+
+def current_term(today=None):
+    """A term opens in October, so January-September belong to last year's."""
+    today = today or datetime.date.today()
+    return today.year if today.month >= 10 else today.year - 1
+
+
+def all_terms(first=FIRST_TERM, last=None):
+    return list(range(first, (last or current_term()) + 1))
+
+
+def term_ttl_rules(term=None, refresh_every=24 * 60 * 60):
+    """TTL rules for a ResponseCache: the open term's list page goes stale
+    after `refresh_every` seconds, everything else is kept for good."""
+    term = term or current_term()
+    return [(r'/argument_transcript/%d$' % term, refresh_every)]
+
+
+def pdf_name(pdf):
+    return pdf.split('/')[-1]
+
+
+def row_hash(row):
+    key = '\x1f'.join(row.get(field, '') for field in ('docket', 'name', 'date', 'pdf'))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """Dockets already seen, saved as JSON at `path`."""
+
+    def __init__(self, path):
+        self.path = path
+        self.dockets = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.dockets = json.load(f)
+
+    def __contains__(self, docket):
+        return docket in self.dockets
+
+    def __len__(self):
+        return len(self.dockets)
+
+    def get(self, docket):
+        return self.dockets.get(docket)
+
+    def needs_scrape(self, row):
+        seen = self.dockets.get(row['docket'])
+        return (seen is None
+                or seen['row_hash'] != row_hash(row)
+                or not seen.get('lower_court'))
+
+    def record(self, row, term, lower_court):
+        now = time.time()
+        seen = self.dockets.get(row['docket'], {})
+        self.dockets[row['docket']] = {
+            'docket': row['docket'],
+            'term': term,
+            'name': row.get('name'),
+            'date': row.get('date'),
+            'pdf': row.get('pdf'),
+            'pdf_name': pdf_name(row.get('pdf', '')),
+            'lower_court': lower_court,
+            'row_hash': row_hash(row),
+            'first_seen': seen.get('first_seen', now),
+            'scraped_at': now,
+        }
+        return self.dockets[row['docket']]
+
+    def term_records(self, term):
+        return [record for record in self.dockets.values() if record['term'] == term]
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.dockets, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def crawl_term(term, fetcher, manifest, docket_url=DOCKET_URL,
+               list_url=ARGUMENT_LIST_URL):
+    """Brings the manifest up to date for one term.
+
+    Returns the manifest records of the dockets that were (re)scraped;
+    dockets whose argument-list row hasn't changed are left alone.
+    """
+    raw_html = fetcher.get(list_url.format(term=term))
+    rows = [row._asdict() for row in parse_case_rows(raw_html)]
+    stale = [row for row in rows if manifest.needs_scrape(row)]
+    if not stale:
+        return []
+
+    other_source = fetch_lower_courts([row['docket'] for row in stale], fetcher,
+                                      url=docket_url)
+    changed = []
+    for row, more_courts in zip(stale, other_source):
+        changed.append(manifest.record(row, term, more_courts.get('lower_court')))
+    manifest.save()
+    return changed
+
+
+def crawl(terms, fetcher, manifest, **kwargs):
+    changed = []
+    for term in terms:
+        changed += crawl_term(term, fetcher, manifest, **kwargs)
+    return changed
+
+
+def update_merged(merged, records):
+    """Upserts manifest records into the `merged` table, keyed by docket.
+
+    Rows for known dockets are overwritten where they stand; new dockets
+    are appended at the end. Returns the (possibly longer) table.
+    """
+    import pandas as pd
+
+    for column in MERGED_COLUMNS:
+        if column not in merged.columns:
+            merged[column] = None
+    position = dict(zip(merged['docket'], merged.index))
+    new = []
+    for record in records:
+        values = [record.get(column) for column in MERGED_COLUMNS]
+        index = position.get(record['docket'])
+        if index is None:
+            new.append(values)
+        else:
+            merged.loc[index, MERGED_COLUMNS] = values
+    if new:
+        merged = pd.concat([merged, pd.DataFrame(new, columns=MERGED_COLUMNS)],
+                           ignore_index=True)
+    return merged
+
+
+def update_merged_csv(path, records):
+    """update_merged() against merged.csv on disk."""
+    import pandas as pd
+
+    if os.path.exists(path):
+        merged = pd.read_csv(path, dtype=object)
+    else:
+        merged = pd.DataFrame(columns=MERGED_COLUMNS)
+    merged = update_merged(merged, records)
+    # Written aside and moved into place, so a reader never sees half a file
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    merged.to_csv(tmp, index=False, header=True)
+    os.replace(tmp, path)
+    return merged
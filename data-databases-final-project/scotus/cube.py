@@ -0,0 +1,167 @@
+"""Speaker profiles aggregated once over the whole dialogue.
+
+The Ginsburg table filtered dialogue to one justice and then ran its own
+value_counts, word counts and merges; doing the same for every justice or
+term meant scanning the dialogue again each time. ProfileCube aggregates
+the dialogue in one pass into cells keyed by (speaker, docket, term,
+lower_court), each holding the number of turns, words and questions, and
+keeps the word counts of every cell as a sparse cell x term table. Slices
+and roll-ups only touch those cells:
+
+    cube = ProfileCube.build(dialogue, merged, term=2019, counts=term_counts)
+    cube.rollup('speaker')                        # turns, words, questions
+    cube.slice(speaker='JUSTICE KAGAN:').top_terms('docket', k=5)
+    cube.justice_table('JUSTICE GINSBURG:', merged)   # as ginsburg.csv
+"""
+import numpy as np
+import pandas as pd
+
+from .wordfreq import TermCounts
+
+DIMENSIONS = ['speaker', 'docket', 'term', 'lower_court']
+MEASURES = ['turns', 'words', 'questions']
+
+# The columns of ginsburg.csv
+JUSTICE_TABLE_COLUMNS = ['docket', 'most_used_words', 'speech_count', 'case_name', 'date',
+                         'transcript_pdf', 'lower_court']
+
+
+class ProfileCube:
+    """Aggregates of the dialogue by speaker, docket, term and lower court.
+
+    cells -- one row per combination that occurs: the DIMENSIONS, then
+             the MEASURES
+    terms -- the non-zero word counts: cell row, term id, count, and the
+             order in which the cell first used the word
+    vocab -- the words, indexed by term id
+    """
+
+    def __init__(self, cells, terms, vocab):
+        self.cells = cells
+        self.terms = terms
+        self.vocab = np.asarray(vocab, dtype=object)
+        self.lengths = np.fromiter((len(word) for word in self.vocab), dtype=np.int32,
+                                   count=len(self.vocab))
+
+    @classmethod
+    def build(cls, dialogue, cases=None, term=None, counts=None, min_length=1):
+        """Aggregates `dialogue` (speaker, words and docket columns).
+
+        cases      -- frame with docket and lower_court (and term) columns,
+                      e.g. merged
+        term       -- the term of every case, when neither frame has a term
+                      column
+        counts     -- a TermCounts already built over the same dialogue
+                      rows, e.g. term_counts; otherwise one is built with
+                      `min_length`
+        """
+        if counts is None:
+            counts = TermCounts.build(dialogue, min_length=min_length)
+        if len(counts.turns) != len(dialogue):
+            raise ValueError('counts were built over %d turns, dialogue has %d'
+                             % (len(counts.turns), len(dialogue)))
+
+        turns = pd.DataFrame({'speaker': dialogue['speaker'].to_numpy(),
+                              'docket': dialogue['docket'].to_numpy()})
+        by_docket = None
+        if cases is not None:
+            by_docket = cases.drop_duplicates('docket').set_index('docket')
+        if 'term' in dialogue:
+            turns['term'] = dialogue['term'].to_numpy()
+        elif by_docket is not None and 'term' in by_docket:
+            turns['term'] = turns['docket'].map(by_docket['term'])
+        else:
+            turns['term'] = term
+        if by_docket is not None and 'lower_court' in by_docket:
+            turns['lower_court'] = turns['docket'].map(by_docket['lower_court'])
+        else:
+            turns['lower_court'] = None
+
+        words = dialogue['words'].fillna('').astype(str)
+        turns['turns'] = 1
+        turns['words'] = words.str.count(r"\w+").to_numpy()
+        turns['questions'] = words.str.count(r"\?").to_numpy()
+
+        grouped = turns.groupby(DIMENSIONS, dropna=False, sort=True, observed=True)
+        codes = grouped.ngroup().to_numpy()
+        cells = grouped[MEASURES].sum().reset_index()
+
+        terms = pd.DataFrame({'cell': codes[counts.rows], 'term': counts.terms,
+                              'count': counts.counts, 'order': np.arange(len(counts.rows))})
+        terms = terms.groupby(['cell', 'term'], sort=False, as_index=False).agg(
+            count=('count', 'sum'), order=('order', 'min'))
+        return cls(cells, terms, counts.vocab)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def slice(self, **where):
+        """The cube restricted to some values of its dimensions, e.g.
+        slice(speaker='JUSTICE GINSBURG:', term=[2018, 2019])."""
+        keep = np.ones(len(self.cells), dtype=bool)
+        for dimension, value in where.items():
+            if dimension not in DIMENSIONS:
+                raise KeyError(dimension)
+            values = [value] if np.isscalar(value) or value is None else list(value)
+            keep &= self.cells[dimension].isin(values).to_numpy()
+        renumber = np.full(len(self.cells), -1, dtype=np.int64)
+        renumber[keep] = np.arange(keep.sum())
+        cell = renumber[self.terms['cell'].to_numpy()]
+        terms = self.terms[cell >= 0].assign(cell=cell[cell >= 0]).reset_index(drop=True)
+        return ProfileCube(self.cells[keep].reset_index(drop=True), terms, self.vocab)
+
+    def _groups(self, by):
+        by = [by] if isinstance(by, str) else list(by)
+        grouped = self.cells.groupby(by, dropna=False, sort=True, observed=True)
+        return by, grouped, grouped.ngroup().to_numpy()
+
+    def rollup(self, by='speaker'):
+        """Turns, words and questions summed over the other dimensions."""
+        by, grouped, _ = self._groups(by)
+        return grouped[MEASURES].sum().reset_index()
+
+    def top_terms(self, by='speaker', k=5, min_length=None):
+        """The k most used words per group, as by columns plus rank, word
+        and count; ties go to the word the group used first."""
+        by, grouped, codes = self._groups(by)
+        keys = self.cells[by].assign(group=codes).drop_duplicates('group').set_index('group')
+        terms = self.terms
+        if min_length is not None:
+            terms = terms[self.lengths[terms['term'].to_numpy()] >= min_length]
+        top = pd.DataFrame({'group': codes[terms['cell'].to_numpy()],
+                            'term': terms['term'].to_numpy(),
+                            'count': terms['count'].to_numpy(),
+                            'order': terms['order'].to_numpy()})
+        top = top.groupby(['group', 'term'], sort=False, as_index=False).agg(
+            count=('count', 'sum'), order=('order', 'min'))
+        top = top.sort_values(['group', 'count', 'order'], ascending=[True, False, True])
+        top['rank'] = top.groupby('group').cumcount() + 1
+        if k is not None:
+            top = top[top['rank'] <= k]
+        out = keys.loc[top['group']].reset_index(drop=True)
+        out['rank'] = top['rank'].to_numpy()
+        out['word'] = self.vocab[top['term'].to_numpy()]
+        out['count'] = top['count'].to_numpy()
+        return out
+
+    def most_common(self, by='speaker', k=None, min_length=None):
+        """top_terms as one list of (word, count) tuples per group."""
+        top = self.top_terms(by, k=k, min_length=min_length)
+        by = [by] if isinstance(by, str) else list(by)
+        pairs = pd.Series(list(zip(top['word'], top['count'])), index=top.index)
+        return pairs.groupby([top[column] for column in by], sort=True).agg(list)
+
+    def justice_table(self, speaker, cases, k=5, min_length=None):
+        """One speaker's table in the shape of ginsburg.csv: their top k
+        words and number of turns per docket, outer-joined to `cases`
+        (docket, name, date, pdf, lower_court)."""
+        profile = self.slice(speaker=speaker)
+        words = profile.most_common('docket', k=k, min_length=min_length)
+        words = words.rename('words').reset_index()
+        counts = profile.rollup('docket')[['docket', 'turns']]
+        counts.columns = ['docket', 'speech_count']
+        table = words.merge(counts, how='outer', on='docket')
+        case_columns = ['docket', 'name', 'date', 'pdf', 'lower_court']
+        table = table.merge(cases[case_columns], how='outer', on='docket')
+        table.columns = JUSTICE_TABLE_COLUMNS
+        return table
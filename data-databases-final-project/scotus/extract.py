@@ -0,0 +1,110 @@
+"""Pulling case rows and lower courts out of supremecourt.gov pages.
+
+Building a whole BeautifulSoup tree with html.parser just to read one table
+was the biggest CPU cost after the network. With lxml installed the
+argument list is parsed in C, and docket pages are fed through a pull
+parser that stops as soon as the table holding the lower court has closed.
+Without lxml, BeautifulSoup only builds the tags that are needed
+(SoupStrainer).
+"""
+from collections import namedtuple
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # pragma: no cover - lxml is optional
+    etree = lxml_html = None
+
+CaseRow = namedtuple('CaseRow', ['docket', 'name', 'date', 'pdf'])
+DocketRecord = namedtuple('DocketRecord', ['docket', 'lower_court'])
+
+# On a docket page the lower court is the tenth <span> of the third <table>
+DOCKET_TABLE = 2
+LOWER_COURT_SPAN = 9
+
+# Docket pages are fed to the pull parser this many bytes at a time
+CHUNK_SIZE = 16 * 1024
+
+
+def _text(element):
+    return ''.join(element.itertext())
+
+
+def _case_row(elements, text, links, spans):
+    """Builds a CaseRow from a table row, or returns None if it isn't one."""
+    if len(elements) < 2:
+        return None
+    elementA = links(elements[0])
+    found = spans(elements[0])
+    if elementA is None or len(found) < 2 or elementA.get('href') is None:
+        return None
+    return CaseRow(text(elementA), text(found[1]), text(elements[1]), elementA.get('href'))
+
+
+def parse_case_rows(raw_html):
+    """Returns a CaseRow for each case on an argument-transcript list page.
+
+    Same fields as the dicts built in step 1: the docket and PDF link come
+    from the first link of the row, the name from its second <span>, the
+    date from the second cell. The two header rows and anything that
+    doesn't look like a case are skipped.
+    """
+    if lxml_html is not None:
+        doc = lxml_html.fromstring(raw_html)
+        rows = list(doc.iter('tr'))[2:]
+        found = (_case_row(list(tr.iter('td')), _text,
+                           lambda td: next(td.iter('a'), None),
+                           lambda td: list(td.iter('span')))
+                 for tr in rows)
+    else:
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        doc = BeautifulSoup(raw_html, "html.parser", parse_only=SoupStrainer('tr'))
+        rows = doc.find_all('tr')[2:]
+        found = (_case_row(tr.find_all('td'), lambda el: el.text,
+                           lambda td: td.find('a'),
+                           lambda td: td.find_all('span'))
+                 for tr in rows)
+    return [row for row in found if row is not None]
+
+
+def _lower_court_lxml(raw_html):
+    parser = etree.HTMLPullParser(events=('start', 'end'), tag='table')
+    tables = 0
+    target = None
+    for start in range(0, len(raw_html), CHUNK_SIZE):
+        parser.feed(raw_html[start:start + CHUNK_SIZE])
+        for event, element in parser.read_events():
+            if event == 'start':
+                if tables == DOCKET_TABLE:
+                    target = element
+                tables += 1
+            elif element is target:
+                spans = list(element.iter('span'))
+                return _text(spans[LOWER_COURT_SPAN]).strip()
+    parser.close()
+    for event, element in parser.read_events():
+        if event == 'end' and element is target:
+            spans = list(element.iter('span'))
+            return _text(spans[LOWER_COURT_SPAN]).strip()
+    raise IndexError('docket page has no table %d' % (DOCKET_TABLE + 1))
+
+
+def parse_lower_court(raw_html):
+    """Returns the lower court named on a docket page.
+
+    Raises IndexError when the page doesn't have the expected table, like
+    the original items[2].find_all('span')[9] lookup did.
+    """
+    if isinstance(raw_html, str):
+        raw_html = raw_html.encode('utf-8')
+    if etree is not None:
+        return _lower_court_lxml(raw_html)
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    doc = BeautifulSoup(raw_html, "html.parser", parse_only=SoupStrainer('table'))
+    items = doc.find_all('table')
+    return items[DOCKET_TABLE].find_all('span')[LOWER_COURT_SPAN].text.strip()
+
+
+def parse_docket(docket, raw_html):
+    return DocketRecord(docket, parse_lower_court(raw_html))
@@ -0,0 +1,181 @@
+"""Fetching pages from supremecourt.gov.
+
+The lower-court loop used to call requests.get once per docket, one after
+another. Fetcher shares one pooled session between a few worker threads,
+spaces requests out per host and retries pages that fail, while handing the
+results back in the same order as the dockets went in. Given a
+ResponseCache (scotus.cache) it only goes to the network for pages that are
+missing or stale, and asks the server whether those changed first.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import OfflineMiss
+from .extract import parse_lower_court
+from .quarantine import FileFailure
+
+DOCKET_URL = 'https://www.supremecourt.gov/search.aspx?filename=/docket/docketfiles/html/public/{}.html'
+
+# Worth trying again: the court's site throttles with 429 and
+# occasionally falls over with a 5xx
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HostRateLimiter:
+    """Hands out request slots at most `per_second` times a second per host."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher:
+    """Downloads pages over one shared session with bounded concurrency.
+
+    workers   -- number of requests in flight at once
+    per_host  -- requests per second allowed against any one host
+    retries   -- extra attempts for connection errors and RETRY_STATUS
+    backoff   -- first retry delay in seconds, doubled on every attempt
+    cache     -- optional ResponseCache consulted before the network
+    """
+
+    def __init__(self, workers=8, per_host=4.0, retries=3, backoff=0.5,
+                 timeout=30, session=None, cache=None):
+        self.workers = workers
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = HostRateLimiter(per_host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def _delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt)
+
+    def get(self, url):
+        """Returns the body of `url` as bytes, raising once retries run out."""
+        entry = None
+        if self.cache is not None:
+            entry = self.cache.lookup(url)
+            if entry is not None and (self.cache.offline or self.cache.is_fresh(entry)):
+                body = self.cache.get(url)
+                if body is not None:
+                    return body
+                entry = None
+            if self.cache.offline:
+                raise OfflineMiss(url)
+        headers = self.cache.conditional_headers(entry) if entry is not None else None
+
+        attempt = 0
+        while True:
+            self.limiter.wait(url)
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self._delay(attempt))
+            else:
+                if response.status_code == 304:
+                    if entry is None:
+                        # Nothing was asked to be revalidated: there is no
+                        # page to return, and b'' mustn't be cached as one
+                        raise requests.HTTPError('304 Not Modified without a cached copy of %s'
+                                                 % url, response=response)
+                    body = self.cache.get(url)
+                    if body is not None:
+                        self.cache.revalidated(entry)
+                        return body
+                    # the blob went missing, so ask again without validators
+                    entry = headers = None
+                elif response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    response.raise_for_status()
+                    if self.cache is not None:
+                        self.cache.store_response(url, response)
+                    return response.content
+                else:
+                    time.sleep(self._delay(attempt, response))
+            attempt += 1
+
+    def _get_or_error(self, url):
+        try:
+            return self.get(url)
+        except Exception as exc:
+            return exc
+
+    def get_many(self, urls):
+        """Fetches every url, returning bodies (or the exception raised) in order."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return list(pool.map(self._get_or_error, urls))
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def fetch_lower_courts(docks, fetcher=None, url=DOCKET_URL, failures=None):
+    """Looks up the lower court of every docket.
+
+    Returns one dict per docket, in the same order, shaped like the rows of
+    `other_source`: {'docket': ..., 'lower_court': ...}. Pages that could not
+    be fetched or parsed come back as an empty dict, as they always have;
+    given a `failures` list, a FileFailure(docket, url, error) is added to it
+    for each of them.
+    """
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = Fetcher()
+    try:
+        pages = fetcher.get_many([url.format(dock) for dock in docks])
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+    other_source = []
+    for dock, raw_html in zip(docks, pages):
+        more_courts = {}
+        try:
+            if isinstance(raw_html, Exception):
+                raise raw_html
+            lower_court = parse_lower_court(raw_html)
+            more_courts['docket'] = dock
+            more_courts['lower_court'] = lower_court
+        except Exception as exc:
+            if failures is not None:
+                failures.append(FileFailure(dock, url.format(dock),
+                                            '%s: %s' % (type(exc).__name__, exc)))
+        other_source.append(more_courts)
+    return other_source
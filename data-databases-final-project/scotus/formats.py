@@ -0,0 +1,208 @@
+"""Transcript layouts of the different court reporters.
+
+TranscriptParser only knows the Heritage Reporting layout of recent terms,
+and only an argument opened by Chief Justice Roberts. Earlier terms were
+transcribed by Alderson Reporting Company, whose pages carry "Alderson
+Reporting Company" and "Official - Subject to Final Review" instead. A
+TranscriptFormat names one layout: a signature that identifies its files,
+the footer (and header) pattern to drop, and the opening, closing and
+speaker patterns. FormatRegistry compiles the signatures of every format it
+holds into one alternation and tells a file's format from its first
+SNIFF_CHARS characters (the first page footer is well within them).
+FormatParser parses each file with its own format's patterns, so a corpus
+spanning many terms takes one pass and every file meets only the patterns
+of its own layout:
+
+    parser = FormatParser()                 # heritage and alderson
+    parse_corpus(cases, transcripts_dir, parser=parser)
+    parser.formats.detect(text)             # <TranscriptFormat alderson>
+
+More layouts can be added with FormatRegistry.register().
+"""
+import os
+import re
+
+from .transcripts import (END, PAGE_NUMBER, SPEAKER, START, MmapTranscriptParser,
+                          TranscriptParser)
+
+# How much of a file is read to recognise its format
+SNIFF_CHARS = 16 * 1024
+
+
+class TranscriptFormat:
+    """One reporter's layout, with its patterns compiled once.
+
+    signature -- a pattern found near the top of every file in the layout
+    footer    -- what is dropped from every page (page headers included)
+    start, end, speaker -- as for TranscriptParser
+    page      -- finds the page number in a footer, in its first group if
+                 it has one
+    flags     -- re flags for the signature and footer
+    """
+
+    def __init__(self, name, signature, footer, start=START.pattern, end=END.pattern,
+                 speaker=SPEAKER.pattern, page=PAGE_NUMBER.pattern, flags=0):
+        self.name = name
+        self.signature = re.compile(signature, flags)
+        self.footer = re.compile(footer, flags)
+        self.start = re.compile(start)
+        self.end = re.compile(end)
+        self.speaker = re.compile(speaker)
+        self.page = re.compile(page)
+        self.parser = TranscriptParser(self.footer, self.start, self.end, self.speaker,
+                                       self.page)
+        self._mmap_parser = None
+
+    @property
+    def mmap_parser(self):
+        """An MmapTranscriptParser with the format's patterns, built when
+        first asked for."""
+        if self._mmap_parser is None:
+            self._mmap_parser = MmapTranscriptParser(self.footer, self.start, self.end,
+                                                     self.speaker, self.page)
+        return self._mmap_parser
+
+    def __repr__(self):
+        return '<TranscriptFormat %s>' % self.name
+
+    def describe(self):
+        """The format's patterns, for fingerprinting a parser that uses it."""
+        return '%s(%s)' % (self.name, ', '.join(
+            '%r/%d' % (pattern.pattern, pattern.flags)
+            for pattern in (self.signature, self.footer, self.start, self.end, self.speaker,
+                            self.page)))
+
+
+HERITAGE = TranscriptFormat(
+    'heritage', r"Heritage Reporting Corporation",
+    r"Heritage Reporting Corporation[\s\n\d-]+Official")
+
+ALDERSON = TranscriptFormat(
+    'alderson', r"Alderson Reporting Company|ALDERSON REPORTING COMPANY",
+    # The company line (with its address on some pages) and the "Official"
+    # header, each with the page and line numbers that follow it. Only
+    # whitespace followed by a number is taken, so the newline in front of
+    # the next speaker label stays. (The spellings are listed rather than
+    # matched with re.IGNORECASE, which makes the scan several times slower.)
+    r"(?:Alderson Reporting Company|ALDERSON REPORTING COMPANY)(?:,? Inc\.|, INC\.)?"
+    r"(?:\s+1111 (?:14th|Fourteenth|14TH|FOURTEENTH) Street,? N\.?W\.?,?(?: Suite 400)?"
+    r"(?:\s+1-800-FOR-DEPO)?\s+Washington,? D\.?C\.? 20005)?(?:\s+[\d-]+)*"
+    r"|Official - Subject to Final Review(?:\s+[\d-]+)*",
+    # The page number follows the company's name or its address; the
+    # "Official" header only carries line numbers
+    page=r"(?:Company|COMPANY|Inc\.|INC\.|20005)\s+(\d+)"
+         r"(?![\d-]|\s+(?:14th|Fourteenth|14TH|FOURTEENTH))")
+
+
+class FormatRegistry:
+    """Transcript formats, recognised by their signatures.
+
+    default -- the format of files whose signature isn't found at all
+    """
+
+    def __init__(self, formats=(HERITAGE, ALDERSON), default='heritage',
+                 sniff_chars=SNIFF_CHARS):
+        self.formats = {}
+        self.default = default
+        self.sniff_chars = sniff_chars
+        self._signatures = None
+        for transcript_format in formats:
+            self.register(transcript_format)
+
+    def register(self, transcript_format):
+        """Adds a format (replacing one of the same name) and recompiles the
+        combined signature pattern."""
+        self.formats[transcript_format.name] = transcript_format
+        groups = []
+        for number, each in enumerate(self.formats.values()):
+            pattern = each.signature.pattern
+            if each.signature.flags & re.IGNORECASE:
+                pattern = '(?i:%s)' % pattern
+            groups.append('(?P<f%d>%s)' % (number, pattern))
+        self._signatures = re.compile('|'.join(groups))
+        self._names = list(self.formats)
+        return transcript_format
+
+    def __getitem__(self, name):
+        return self.formats[name]
+
+    def __iter__(self):
+        return iter(self.formats.values())
+
+    def __len__(self):
+        return len(self.formats)
+
+    def __repr__(self):
+        return 'FormatRegistry(%s; default=%s)' % (
+            ', '.join(each.describe() for each in self), self.default)
+
+    def detect(self, text):
+        """The format of a transcript's text: whichever signature occurs
+        first in its opening SNIFF_CHARS characters, else anywhere, else the
+        default."""
+        found = self._signatures.search(text, 0, self.sniff_chars)
+        if found is None and len(text) > self.sniff_chars:
+            found = self._signatures.search(text, max(self.sniff_chars - 256, 0))
+        if found is None:
+            return self.formats[self.default]
+        return self.formats[self._names[int(found.lastgroup[1:])]]
+
+    def sniff(self, path):
+        """The format of a transcript file, from its first characters only
+        when the signature is among them."""
+        with open(path, 'r', encoding='utf-8') as f:
+            prefix = f.read(self.sniff_chars)
+            if self._signatures.search(prefix) is None and len(prefix) == self.sniff_chars:
+                prefix += f.read()
+        return self.detect(prefix)
+
+
+class FormatParser(TranscriptParser):
+    """A TranscriptParser that parses each file with the patterns of the
+    format it is in.
+
+    A file's format is sniffed from its first SNIFF_CHARS characters by
+    format_of(), which turns(), read() and locate() all go through, so a
+    file's turns and their positions always come from the same patterns;
+    an open file is recognised from the same characters of its text.
+    bounds() and iter_text() on text already cleaned use the alternation of
+    every format's patterns. With mmap=True, turns() parses files with the
+    format's MmapTranscriptParser.
+    """
+
+    def __init__(self, formats=None, mmap=False):
+        self.formats = formats or FormatRegistry()
+        self.mmap = mmap
+
+        def combined(name):
+            patterns = dict.fromkeys(getattr(each, name).pattern for each in self.formats)
+            return re.compile('|'.join('(?:%s)' % pattern for pattern in patterns))
+
+        super().__init__(footer=None, start=combined('start'), end=combined('end'),
+                         speaker=combined('speaker'))
+
+    def format_of(self, path):
+        """The TranscriptFormat of a transcript file."""
+        return self.formats.sniff(path)
+
+    def _read(self, source):
+        """The format and text of an open file."""
+        raw = source.read()
+        return self.formats.detect(raw), raw
+
+    def read(self, source):
+        if isinstance(source, (str, bytes, os.PathLike)):
+            return self.format_of(source).parser.read(source)
+        transcript_format, raw = self._read(source)
+        return transcript_format.footer.sub("", raw)
+
+    def turns(self, source, docket):
+        if isinstance(source, (str, bytes, os.PathLike)):
+            transcript_format = self.format_of(source)
+            parser = transcript_format.mmap_parser if self.mmap else transcript_format.parser
+            return parser.turns(source, docket)
+        transcript_format, raw = self._read(source)
+        return transcript_format.parser.iter_text(transcript_format.footer.sub("", raw), docket)
+
+    def locate(self, path):
+        return self.format_of(path).parser.locate(path)
@@ -0,0 +1,169 @@
+"""Writing map features from a DataFrame, one feature at a time.
+
+The map data was built by serializing the final frame to JSON, parsing it
+back into dicts, nesting those into a FeatureCollection and dumping the
+whole collection, with the coordinates attached by row position. Here each
+row of the frame becomes a feature as it is written, its geometry looked up
+by the row's lower court, so memory stays flat however many features there
+are:
+
+    write_geojson(output3, 'geo-data12-11.js', court_points)
+
+map_frame() builds that frame (output3) from a justice table such as
+ProfileCube.justice_table(): one row per lower court, its cases written up
+as an HTML article.
+
+Columns named 'properties.x' become the feature's properties (all other
+columns but the key, if there are none). Three formats, picked from the
+file name or given as format=:
+
+    js       var infoData = {"type": "FeatureCollection", ...}   (.js)
+    geojson  {"type": "FeatureCollection", "features": [...]}    (.geojson, .json)
+    ndjson   one feature per line                                (.ndjson, .geojsonl)
+"""
+import json
+import math
+import os
+
+import numpy as np
+
+FORMATS = ('js', 'geojson', 'ndjson')
+
+EXTENSIONS = {'.js': 'js', '.geojson': 'geojson', '.json': 'geojson',
+              '.ndjson': 'ndjson', '.geojsonl': 'ndjson', '.jsonl': 'ndjson'}
+
+
+# The map's marker colour
+DEFAULT_COLOR = '#251FE0'
+
+
+def output_format(path):
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'geojson')
+
+
+def _plain(value):
+    """numpy scalars as Python ones, and NaN as null as to_json wrote it."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def point(coordinates):
+    """A GeoJSON Point geometry from (longitude, latitude) or a geometry dict."""
+    if coordinates is None or isinstance(coordinates, dict):
+        return coordinates
+    return {'type': 'Point', 'coordinates': [float(c) for c in coordinates]}
+
+
+def features(frame, coordinates, key='lower_court', properties=None, missing='null'):
+    """Yields one GeoJSON feature per row of `frame`.
+
+    coordinates -- mapping from the key column's values to (longitude,
+                   latitude) pairs or geometry dicts
+    properties  -- columns to use as properties; by default the
+                   'properties.' columns, under the name after the dot
+    missing     -- rows whose key has no coordinates: 'null' writes them
+                   with a null geometry, 'skip' leaves them out, 'raise'
+                   raises KeyError
+    """
+    if missing not in ('null', 'skip', 'raise'):
+        raise ValueError('missing must be null, skip or raise, not %r' % (missing,))
+    if properties is None:
+        properties = [c for c in frame.columns if str(c).startswith('properties.')]
+        if not properties:
+            properties = [c for c in frame.columns
+                          if c != key and not str(c).startswith('geometry.')]
+    names = [str(c).split('.', 1)[1] if str(c).startswith('properties.') else str(c)
+             for c in properties]
+    geometries = {}
+    for row in frame[[key] + list(properties)].itertuples(index=False, name=None):
+        place = _plain(row[0])
+        if place not in geometries:
+            found = coordinates.get(place) if place is not None else None
+            if found is None and missing == 'raise':
+                raise KeyError('no coordinates for %r' % (place,))
+            geometries[place] = point(found)
+        geometry = geometries[place]
+        if geometry is None and missing == 'skip':
+            continue
+        yield {'type': 'Feature',
+               'properties': {name: _plain(value) for name, value in zip(names, row[1:])},
+               'geometry': geometry}
+
+
+def write_features(stream, out, format='geojson', variable='infoData'):
+    """Writes features from an iterable to an open text file; returns how
+    many were written."""
+    if format not in FORMATS:
+        raise ValueError('format must be one of %s, not %r' % (', '.join(FORMATS), format))
+    count = 0
+    if format == 'ndjson':
+        for feature in stream:
+            out.write(json.dumps(feature))
+            out.write('\n')
+            count += 1
+        return count
+    if format == 'js':
+        out.write('var %s = ' % variable)
+    out.write('{"type": "FeatureCollection", "features": [')
+    for feature in stream:
+        if count:
+            out.write(', ')
+        out.write(json.dumps(feature))
+        count += 1
+    out.write(']}')
+    return count
+
+
+def words_readable(words):
+    """'The top 5 words are: ...' from [(word, count), ...]."""
+    text = 'The top %d words are: ' % len(words)
+    for word, count in words:
+        text += '%s: %d occurances. ' % (word, count)
+    return text
+
+
+def map_frame(table, color=DEFAULT_COLOR):
+    """The map rows for a justice table (ginsburg.csv's columns): one row
+    per lower court with the properties article (every case heard from it,
+    when, how often the justice spoke and their top words), headline (the
+    number of cases) and color, most cases first. A case without a date
+    is shown without one."""
+    table = table.dropna(subset=['lower_court', 'case_name', 'speech_count'])
+    table = table[table['lower_court'].astype(str).str.strip() != '']
+    words = table['most_used_words'].apply(
+        lambda x: words_readable(x) if isinstance(x, (list, tuple)) else '')
+    cells = ('<b>Case:</b> ' + table['case_name'].astype(str) + ' , '
+             + table['date'].fillna('').astype(str) + '<br><br>Spoke '
+             + table['speech_count'].astype(int).astype(str) + ' times<br>' + words)
+    grouped = cells.groupby(table['lower_court'], sort=True)
+    output = grouped.apply(
+        lambda x: "<div id='article'><P>%s</P></div>" % '</p><p> '.join(x)
+    ).reset_index(name='properties.article')
+    output['properties.headline'] = output['lower_court'].map(
+        table.groupby('lower_court')['case_name'].nunique())
+    output['properties.color'] = color
+    return output.sort_values('properties.headline', ascending=False,
+                              kind='stable').reset_index(drop=True)
+
+
+def write_geojson(frame, path, coordinates, key='lower_court', format=None,
+                  variable='infoData', properties=None, missing='null'):
+    """Streams the rows of `frame` as features to `path` (see features()).
+
+    The file is written under a temporary name and moved into place when
+    complete. Returns the number of features written.
+    """
+    format = format or output_format(path)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(tmp, 'w', encoding='utf-8') as out:
+            count = write_features(features(frame, coordinates, key, properties, missing),
+                                   out, format, variable)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
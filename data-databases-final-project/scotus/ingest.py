@@ -0,0 +1,126 @@
+"""Parsing a whole corpus of transcripts, optionally across processes.
+
+The step 3 loop parsed one file at a time on one core and hid every
+failure behind a bare except. parse_corpus spreads the files over a
+ProcessPoolExecutor, keeps the turns in the same order as the cases came
+in, and reports each file that could not be parsed. With workers=1 the same
+code runs in-process, which gives identical output and is easier to debug.
+Given a ParseCache, only files that are new or changed since the last run
+are parsed at all.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .quarantine import FileFailure
+from .transcripts import MmapTranscriptParser, TranscriptParser, transcript_name
+
+ParsedCorpus = namedtuple('ParsedCorpus', ['turns', 'failures'])
+
+_parser = None
+
+
+def _init_worker(parser):
+    global _parser
+    _parser = parser
+
+
+def _parse_job(job):
+    docket, path = job
+    start = time.perf_counter()
+    try:
+        return list(_parser.turns(path, docket)), None, time.perf_counter() - start
+    except Exception as exc:
+        return None, '%s: %s' % (type(exc).__name__, exc), time.perf_counter() - start
+
+
+def corpus_jobs(cases, directory):
+    """Pairs each case with its transcript path.
+
+    Returns (jobs, failures): cases without a docket or PDF link can't be
+    looked up at all and are reported straight away.
+    """
+    jobs = []
+    failures = []
+    for case in cases:
+        if not isinstance(case, dict):
+            case = case._asdict()
+        if not case.get('docket') or not case.get('pdf'):
+            failures.append(FileFailure(case.get('docket'), None, 'KeyError: no docket or pdf'))
+            continue
+        jobs.append((case['docket'], os.path.join(directory, transcript_name(case['pdf']))))
+    return jobs, failures
+
+
+def _run(jobs, workers, chunksize, parser):
+    if workers == 1 or len(jobs) <= 1:
+        _init_worker(parser)
+        return list(map(_parse_job, jobs))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(parser,)) as pool:
+        return list(pool.map(_parse_job, jobs, chunksize=chunksize))
+
+
+def parse_jobs(jobs, workers=None, chunksize=4, parser=None, cache=None, mmap=False):
+    """Parses (docket, path) jobs; returns a ParsedCorpus in job order.
+
+    With a ParseCache, files whose turns are cached are not parsed again,
+    and newly parsed files are added to the cache.
+    """
+    parser = parser or (MmapTranscriptParser() if mmap else TranscriptParser())
+    workers = workers or os.cpu_count() or 1
+    results = [None] * len(jobs)
+    keys = [None] * len(jobs)
+    todo = []
+    for position, (docket, path) in enumerate(jobs):
+        if cache is not None:
+            try:
+                keys[position] = cache.key(path)
+            except OSError:
+                pass
+            else:
+                cached = cache.get(keys[position], docket)
+                if cached is not None:
+                    results[position] = (cached, None, 0.0)
+                    continue
+        todo.append(position)
+
+    parsed = _run([jobs[position] for position in todo], workers, chunksize, parser)
+    for position, result in zip(todo, parsed):
+        results[position] = result
+        found, error, seconds = result
+        if cache is not None and error is None and keys[position] is not None:
+            cache.put(keys[position], found, seconds)
+    return _collect(jobs, results)
+
+
+def _collect(jobs, results):
+    turns = []
+    failures = []
+    for (docket, path), (found, error, _) in zip(jobs, results):
+        if error is None:
+            turns += found
+        else:
+            failures.append(FileFailure(docket, path, error))
+    return ParsedCorpus(turns, failures)
+
+
+def parse_corpus(cases, directory, workers=None, chunksize=4, parser=None, cache=None,
+                 mmap=False):
+    """Parses every case's transcript in `directory`.
+
+    workers   -- processes to use; 1 parses in this process
+    chunksize -- files handed to a worker at a time
+    cache     -- optional ParseCache; its stats show what was reused
+    mmap      -- without a parser, parse with MmapTranscriptParser, which
+                 maps each file instead of reading it (same turns)
+
+    Returns ParsedCorpus(turns, failures): turns are (docket, speaker,
+    words) tuples in the order of `cases`; failures are FileFailure
+    records for cases whose transcript was missing or couldn't be parsed.
+    """
+    jobs, failures = corpus_jobs(cases, directory)
+    parsed = parse_jobs(jobs, workers=workers, chunksize=chunksize, parser=parser,
+                        cache=cache, mmap=mmap)
+    return ParsedCorpus(parsed.turns, failures + parsed.failures)
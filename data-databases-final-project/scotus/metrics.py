@@ -0,0 +1,194 @@
+"""Timing, memory and item counts for each stage of a run.
+
+When a run was slow there was no telling whether it was the scrape, the
+transcript cleaning or the pandas work. Wrapping each stage in
+Instrumentation.stage() records its wall and CPU time, peak traced memory,
+how many items it handled and how many failed, and rewrites a JSON metrics
+file after every stage (so a run that dies still leaves what it measured).
+Each stage can also be profiled with cProfile or, if installed,
+pyinstrument:
+
+    metrics = Instrumentation('metrics.json', profile='cprofile', profile_dir='profiles')
+    with metrics.stage('parse transcripts') as stage:
+        corpus = parse_corpus(...)
+        stage.count(items=len(corpus.turns), failures=len(corpus.failures))
+
+Instrumentation() without a path is switched off: stage() hands back one
+shared do-nothing object, with no clocks, tracing or files involved.
+Instrumentation.from_env() switches it on from SCOTUS_METRICS (the metrics
+file) and SCOTUS_PROFILE (cprofile or pyinstrument).
+"""
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+# The stages of a full run, in order
+STAGES = ('scrape list', 'enrich dockets', 'parse transcripts', 'build dialogue', 'analytics',
+          'export')
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def _slug(name):
+    return re.sub(r"[^a-z0-9]+", '-', name.lower()).strip('-')
+
+
+class _NullStage:
+    """What stage() returns when instrumentation is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, items=0, failures=0):
+        pass
+
+
+NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """One measured stage; use count() inside the with block."""
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.items = 0
+        self.failures = 0
+        self._profiler = None
+        self._tracing = False
+
+    def count(self, items=0, failures=0):
+        self.items += items
+        self.failures += failures
+
+    def __enter__(self):
+        self._tracing = self.owner.trace_memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+        elif tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self._profiler = self.owner._start_profiler()
+        self.started = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        profile = self.owner._stop_profiler(self._profiler, self.name)
+        peak = None
+        if tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._tracing:
+                tracemalloc.stop()
+        record = {'stage': self.name, 'started': self.started, 'wall_seconds': wall,
+                  'cpu_seconds': cpu, 'peak_memory_bytes': peak, 'items': self.items,
+                  'failures': self.failures, 'error': None, 'profile': profile}
+        if exc_type is not None:
+            record['error'] = '%s: %s' % (exc_type.__name__, exc)
+        self.owner._record(record)
+        return False
+
+
+class Instrumentation:
+    """Collects stage records and writes them to `path` as JSON.
+
+    path        -- the metrics file; None switches everything off
+    profile     -- None, 'cprofile' or 'pyinstrument'
+    profile_dir -- where per-stage profiles go (default: next to path)
+    trace_memory -- measure peak memory with tracemalloc (slows the
+                    stage down while it runs)
+    """
+
+    def __init__(self, path=None, profile=None, profile_dir=None, trace_memory=True):
+        if profile is not None and profile not in PROFILERS:
+            raise ValueError('profile must be one of %s, not %r' % (', '.join(PROFILERS), profile))
+        if profile == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImportError("profile='pyinstrument' needs pyinstrument "
+                                  "(pip install pyinstrument)") from None
+        self.path = path
+        self.enabled = path is not None
+        self.profile = profile if self.enabled else None
+        self.profile_dir = profile_dir or (
+            os.path.join(os.path.dirname(os.path.abspath(path)), 'profiles') if path else None)
+        self.trace_memory = trace_memory
+        self.records = []
+        self._lock = threading.Lock()
+        self.run = {'started': time.time(), 'python': platform.python_version(),
+                    'platform': platform.platform(), 'argv': list(sys.argv)}
+
+    @classmethod
+    def from_env(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        return cls(environ.get('SCOTUS_METRICS') or None,
+                   profile=environ.get('SCOTUS_PROFILE') or None)
+
+    def stage(self, name):
+        """A context manager measuring the stage `name`."""
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name)
+
+    def _start_profiler(self):
+        if self.profile == 'cprofile':
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profile == 'pyinstrument':
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler, name):
+        """Stops the profiler and writes its dump; returns the dump's path."""
+        if profiler is None:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, _slug(name))
+        if self.profile == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(base + '.prof')
+            return base + '.prof'
+        profiler.stop()
+        with open(base + '.html', 'w', encoding='utf-8') as f:
+            f.write(profiler.output_html())
+        return base + '.html'
+
+    def _record(self, record):
+        # Stages may finish on several threads at once (scotus.pipeline)
+        with self._lock:
+            self.records.append(record)
+            self.save()
+
+    def save(self):
+        if not self.enabled:
+            return
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump({'run': self.run, 'stages': self.records}, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        """The records as a DataFrame, one row per stage run."""
+        import pandas as pd
+
+        return pd.DataFrame(self.records)
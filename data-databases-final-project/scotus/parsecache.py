@@ -0,0 +1,97 @@
+"""Cache of parsed transcripts, keyed by file content and parser.
+
+Correcting one transcript or adding a new argument used to mean parsing
+every file again. ParseCache stores the turns of each file under the hash
+of its bytes together with a fingerprint of the parser (its class,
+PARSER_VERSION and patterns), so a re-run only parses files that are new or
+changed, or everything if the parser itself changed.
+"""
+import hashlib
+import os
+import pickle
+import re
+import time
+
+from .transcripts import PARSER_VERSION
+
+
+def parser_fingerprint(parser):
+    """A hash of what decides a parser's turns: its class, PARSER_VERSION,
+    its patterns as sorted (name, pattern, flags) and, for a FormatParser,
+    the description of every format. Nothing else the parser holds (byte
+    patterns derived from these, options that give the same turns) counts,
+    so the key is the same in every process."""
+    patterns = sorted((name, value.pattern, value.flags) for name, value in vars(parser).items()
+                      if isinstance(value, re.Pattern))
+    parts = [type(parser).__module__, type(parser).__qualname__, str(PARSER_VERSION), patterns]
+    formats = getattr(parser, 'formats', None)
+    if formats is not None:
+        parts.append(repr(formats))
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CacheStats:
+    """What a ParseCache saved: hits and misses, the seconds spent parsing
+    the misses and the seconds the hits originally took to parse."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.seconds_parsing = 0.0
+        self.seconds_saved = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __repr__(self):
+        return ('CacheStats(hits=%d, misses=%d, seconds_parsing=%.2f, seconds_saved=%.2f)'
+                % (self.hits, self.misses, self.seconds_parsing, self.seconds_saved))
+
+
+class ParseCache:
+    """Parsed turns on disk under `root`, one pickle per transcript."""
+
+    def __init__(self, root, parser):
+        self.root = root
+        self.fingerprint = parser_fingerprint(parser)
+        self.stats = CacheStats()
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, path):
+        """The cache key for a transcript file (raises OSError if unreadable)."""
+        return '%s-%s' % (file_digest(path), self.fingerprint)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + '.pickle')
+
+    def get(self, key, docket):
+        """Cached turns as (docket, speaker, words) tuples, or None."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.seconds_saved += entry['seconds']
+        return [(docket, speaker, words) for speaker, words in entry['turns']]
+
+    def put(self, key, turns, seconds):
+        """Stores turns parsed in `seconds`; the docket isn't part of the entry."""
+        self.stats.seconds_parsing += seconds
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump({'seconds': seconds, 'created': time.time(),
+                         'turns': [(speaker, words) for _, speaker, words in turns]},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
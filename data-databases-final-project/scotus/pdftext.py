@@ -0,0 +1,197 @@
+"""Transcript text straight from the PDFs.
+
+The parser reads .txt files that were converted from the transcript PDFs
+by hand, outside the code (name_pdf.split('.')[0] + ".txt"), so a new term
+waited on someone converting it. convert_pdfs() downloads the PDFs linked
+from the argument list, extracts their text with pypdf (pure Python, and
+optional: pip install pypdf) page by page straight to the .txt file, over
+a pool of processes, and names each file as transcript_name() expects:
+
+    fetcher = Fetcher()
+    done = convert_pdfs(all_2019, 'pdfs', transcripts_dir, fetcher=fetcher,
+                        cache=PdfTextCache('pdf_cache'))
+    done.failures       # FileFailure(docket, path, error) for each PDF that failed
+
+Extracted text is cached by the PDF's hash, so a PDF seen before (even under
+another name) is never extracted twice. Existing .txt files are left alone
+unless overwrite=True, so hand-converted transcripts keep working.
+"""
+import os
+import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .parsecache import file_digest
+from .quarantine import FileFailure
+from .transcripts import transcript_name
+
+# Bump when extraction changes, so cached text is extracted again
+EXTRACTOR_VERSION = 1
+
+ConvertedPdfs = namedtuple('ConvertedPdfs', ['written', 'skipped', 'failures'])
+
+
+def _pypdf():
+    try:
+        import pypdf
+    except ImportError:
+        raise ImportError('extracting text from PDFs needs pypdf (pip install pypdf)') from None
+    return pypdf
+
+
+def iter_pages(path):
+    """Yields the text of each page of a PDF in turn."""
+    reader = _pypdf().PdfReader(path)
+    for page in reader.pages:
+        yield page.extract_text() or ''
+
+
+def extract_text(pdf_path, txt_path):
+    """Writes the text of a PDF to txt_path one page at a time (under a
+    temporary name until complete); returns the number of pages. Pages are
+    separated by a newline only: each page's footer already ends it."""
+    tmp = '%s.%d.tmp' % (txt_path, os.getpid())
+    pages = 0
+    try:
+        with open(tmp, 'w', encoding='utf-8') as out:
+            for text in iter_pages(pdf_path):
+                out.write(text)
+                if not text.endswith('\n'):
+                    out.write('\n')
+                pages += 1
+        os.replace(tmp, txt_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return pages
+
+
+class PdfTextCache:
+    """Extracted text under `root`, one file per PDF hash."""
+
+    def __init__(self, root):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, pdf_path):
+        return '%s-%d' % (file_digest(pdf_path), EXTRACTOR_VERSION)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key + '.txt')
+
+    def get(self, key, txt_path):
+        """Copies the cached text to txt_path; False if there is none."""
+        cached = self.path(key)
+        if not os.path.exists(cached):
+            self.misses += 1
+            return False
+        tmp = '%s.%d.tmp' % (txt_path, os.getpid())
+        shutil.copyfile(cached, tmp)
+        os.replace(tmp, txt_path)
+        self.hits += 1
+        return True
+
+    def put(self, key, txt_path):
+        cached = self.path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = '%s.%d.tmp' % (cached, os.getpid())
+        shutil.copyfile(txt_path, tmp)
+        os.replace(tmp, cached)
+
+    def __repr__(self):
+        return 'PdfTextCache(%r, hits=%d, misses=%d)' % (self.root, self.hits, self.misses)
+
+
+def _extract_job(job):
+    docket, pdf_path, txt_path = job
+    start = time.perf_counter()
+    try:
+        return extract_text(pdf_path, txt_path), None, time.perf_counter() - start
+    except Exception as exc:
+        return None, '%s: %s' % (type(exc).__name__, exc), time.perf_counter() - start
+
+
+def _run(jobs, workers, chunksize):
+    if workers == 1 or len(jobs) <= 1:
+        return list(map(_extract_job, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_extract_job, jobs, chunksize=chunksize))
+
+
+def download_pdfs(pdfs, fetcher):
+    """Saves (docket, url, path) PDFs not already at their path; returns
+    FileFailure records for those that couldn't be fetched."""
+    missing = [pdf for pdf in pdfs if not os.path.exists(pdf[2])]
+    failures = []
+    bodies = fetcher.get_many([url for _, url, _ in missing]) if missing else []
+    for (docket, url, path), body in zip(missing, bodies):
+        if isinstance(body, Exception):
+            failures.append(FileFailure(docket, url, '%s: %s' % (type(body).__name__, body)))
+            continue
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return failures
+
+
+def convert_pdfs(cases, pdf_dir, transcripts_dir, fetcher=None, workers=None, chunksize=2,
+                 cache=None, overwrite=False):
+    """Writes transcripts_dir/<transcript_name(pdf)> for every case.
+
+    fetcher   -- a scotus.fetch.Fetcher to download PDFs missing from
+                 pdf_dir; without one only PDFs already there are used
+    workers   -- processes to extract with; 1 extracts in this process
+    cache     -- optional PdfTextCache
+    overwrite -- replace .txt files that already exist
+
+    Returns ConvertedPdfs(written, skipped, failures): the .txt paths
+    written, the .txt paths left alone because they existed, and
+    FileFailure records for PDFs that couldn't be fetched, found or read.
+    """
+    _pypdf()
+    os.makedirs(transcripts_dir, exist_ok=True)
+    wanted, skipped, failures = [], [], []
+    for case in cases:
+        if not isinstance(case, dict):
+            case = case._asdict()
+        if not case.get('pdf'):
+            failures.append(FileFailure(case.get('docket'), None, 'KeyError: no pdf'))
+            continue
+        txt_path = os.path.join(transcripts_dir, transcript_name(case['pdf']))
+        if os.path.exists(txt_path) and not overwrite:
+            skipped.append(txt_path)
+            continue
+        pdf_path = os.path.join(pdf_dir, case['pdf'].split('/')[-1])
+        wanted.append((case.get('docket'), case['pdf'], pdf_path, txt_path))
+
+    if fetcher is not None:
+        failures += download_pdfs([(docket, url, pdf) for docket, url, pdf, _ in wanted], fetcher)
+    jobs = []
+    for docket, url, pdf_path, txt_path in wanted:
+        if os.path.exists(pdf_path):
+            jobs.append((docket, pdf_path, txt_path))
+        elif fetcher is None:
+            failures.append(FileFailure(docket, pdf_path, 'FileNotFoundError: no PDF'))
+
+    written, todo, keys = [], [], {}
+    for job in jobs:
+        if cache is not None:
+            keys[job] = cache.key(job[1])
+            if cache.get(keys[job], job[2]):
+                written.append(job[2])
+                continue
+        todo.append(job)
+    results = _run(todo, workers or os.cpu_count() or 1, chunksize)
+    for job, (pages, error, _) in zip(todo, results):
+        if error is not None:
+            failures.append(FileFailure(job[0], job[1], error))
+            continue
+        if cache is not None:
+            cache.put(keys[job], job[2])
+        written.append(job[2])
+    return ConvertedPdfs(written, skipped, failures)
@@ -0,0 +1,273 @@
+"""Rebuilding only the artifacts that are out of date.
+
+merged.csv, the dialogue, the justice tables and the map were only ever
+refreshed by running the notebook from the top. A Pipeline is a list of
+Steps, each naming the files it reads and writes. A step's fingerprint is
+the content hash of its inputs, its parameters and the source of its code.
+run() rebuilds a step when its fingerprint changed or its outputs are
+missing or were changed by hand, and skips it otherwise. The order comes
+from which step writes which file, and steps that don't depend on each
+other run at the same time:
+
+    pipeline = Pipeline([
+        Step('enrich', enrich, inputs=['cases.csv'], outputs=['merged.csv']),
+        Step('parse', parse, inputs=['cases.csv', 'transcripts'], outputs=['dialogue.csv']),
+        Step('export', export, inputs=['merged.csv', 'dialogue.csv'],
+             outputs=['geo-data.js'], params={'color': '#251FE0'}),
+    ], state='pipeline.json')
+    pipeline.run()
+
+Changing only the colour changes only export's fingerprint. A step whose
+upstream rebuilt but wrote the same bytes as before is not rebuilt either.
+Fingerprints are kept in the state file, with the digest of every file
+hashed (reused while its size and mtime stay the same).
+"""
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .parsecache import file_digest
+
+StepResult = namedtuple('StepResult', ['step', 'status', 'reason', 'seconds', 'error'])
+
+# StepResult.status values
+BUILT = 'built'
+FRESH = 'up to date'
+STALE = 'stale'            # what run(dry_run=True) reports instead of building
+FAILED = 'failed'
+BLOCKED = 'blocked'        # an upstream step failed
+
+
+def code_digest(code):
+    """A digest of the source of functions, classes and modules (given as
+    objects or module names). Modules are hashed from their file, without
+    importing them."""
+    digest = hashlib.sha256()
+    for item in code:
+        if isinstance(item, str):
+            spec = importlib.util.find_spec(item)
+            if spec is None or not spec.origin or not os.path.exists(spec.origin):
+                raise ImportError('no source for module %r' % item)
+            with open(spec.origin, 'rb') as f:
+                source = f.read()
+        else:
+            source = inspect.getsource(item).encode('utf-8')
+        digest.update(hashlib.sha256(source).digest())
+    return digest.hexdigest()
+
+
+class Step:
+    """One stage of the pipeline.
+
+    action  -- called with no arguments to build the outputs
+    inputs  -- files or directories read; those another step writes make
+               this step depend on it
+    outputs -- files or directories written
+    params  -- JSON-able settings that change what is built (e.g. the map
+               colour)
+    code    -- functions, classes or module names whose source is part of
+               the fingerprint, so editing them rebuilds the step
+    """
+
+    def __init__(self, name, action, inputs=(), outputs=(), params=None, code=()):
+        self.name = name
+        self.action = action
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.params = dict(params or {})
+        self.code = list(code) or [action]
+
+    def __repr__(self):
+        return 'Step(%r, inputs=%r, outputs=%r)' % (self.name, self.inputs, self.outputs)
+
+
+class Pipeline:
+    """Steps wired together by their files, with fingerprints in `state`."""
+
+    def __init__(self, steps, state):
+        self.steps = {}
+        self.state_path = state
+        producers = {}
+        for step in steps:
+            if step.name in self.steps:
+                raise ValueError('two steps named %r' % step.name)
+            self.steps[step.name] = step
+            for path in step.outputs:
+                if path in producers:
+                    raise ValueError('%s is written by both %s and %s'
+                                     % (path, producers[path], step.name))
+                producers[path] = step.name
+        self.upstream = {step.name: sorted({producers[path] for path in step.inputs
+                                            if path in producers} - {step.name})
+                         for step in steps}
+        self.order()
+        self._lock = threading.Lock()
+        self.state = {'steps': {}, 'files': {}}
+        if os.path.exists(state):
+            with open(state) as f:
+                self.state = json.load(f)
+
+    def order(self):
+        """The step names in an order where every step follows its upstream;
+        raises ValueError for a cycle."""
+        done, order, visiting = set(), [], set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError('steps depend on each other in a cycle through %r' % name)
+            visiting.add(name)
+            for parent in self.upstream[name]:
+                visit(parent)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.steps:
+            visit(name)
+        return order
+
+    def _with_upstream(self, targets):
+        wanted = set()
+        todo = list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in self.steps:
+                raise KeyError('no step named %r' % name)
+            if name not in wanted:
+                wanted.add(name)
+                todo += self.upstream[name]
+        return [name for name in self.order() if name in wanted]
+
+    def _save(self):
+        tmp = '%s.%d.tmp' % (self.state_path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.state_path)
+
+    def _file_digest(self, path):
+        stat = os.stat(path)
+        with self._lock:
+            known = self.state['files'].get(path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = file_digest(path)
+        with self._lock:
+            self.state['files'][path] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path):
+        """The content hash of a file, or of every file under a directory
+        with its relative name; None if the path doesn't exist."""
+        if os.path.isfile(path):
+            return self._file_digest(path)
+        if not os.path.isdir(path):
+            return None
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                digest.update(os.path.relpath(full, path).encode('utf-8') + b'\0')
+                digest.update(self._file_digest(full).encode('ascii'))
+        return digest.hexdigest()
+
+    def fingerprint(self, step):
+        parts = {'code': code_digest(step.code), 'params': step.params,
+                 'inputs': {path: self.digest(path) for path in step.inputs}}
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def why_stale(self, step, fingerprint):
+        """Why `step` needs building, or None if it is up to date."""
+        with self._lock:
+            built = self.state['steps'].get(step.name)
+        if built is None:
+            return 'never built'
+        if built['fingerprint'] != fingerprint:
+            return 'inputs, parameters or code changed'
+        for path in step.outputs:
+            digest = self.digest(path)
+            if digest is None:
+                return '%s is missing' % path
+            if digest != built['outputs'].get(path):
+                return '%s was changed' % path
+        return None
+
+    def _build(self, step, force, dry_run):
+        start = time.perf_counter()
+        fingerprint = self.fingerprint(step)
+        reason = 'forced' if force else self.why_stale(step, fingerprint)
+        if reason is None:
+            return StepResult(step.name, FRESH, None, 0.0, None)
+        if dry_run:
+            return StepResult(step.name, STALE, reason, 0.0, None)
+        try:
+            step.action()
+        except Exception as error:  # noqa: BLE001 -- reported, and downstream is blocked
+            return StepResult(step.name, FAILED, reason, time.perf_counter() - start,
+                              '%s: %s' % (type(error).__name__, error))
+        outputs = {path: self.digest(path) for path in step.outputs}
+        with self._lock:
+            self.state['steps'][step.name] = {'fingerprint': fingerprint, 'outputs': outputs,
+                                              'built_at': time.time()}
+            self._save()
+        return StepResult(step.name, BUILT, reason, time.perf_counter() - start, None)
+
+    def run(self, targets=None, force=(), jobs=None, dry_run=False, report=None):
+        """Brings `targets` (default: every step) and what they depend on up
+        to date; returns a StepResult per step, in pipeline order.
+
+        force   -- step names to rebuild even if up to date
+        jobs    -- steps run at once (default: as many as are ready)
+        dry_run -- only report what is stale; steps downstream of a stale
+                   one are reported stale too
+        report  -- called with each StepResult as it comes in
+        """
+        names = self._with_upstream(targets or list(self.steps))
+        force = set(force)
+        results = {}
+        waiting = list(names)
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs or len(names) or 1) as pool:
+            while waiting or running:
+                for name in list(waiting):
+                    parents = [results.get(parent) for parent in self.upstream[name]
+                               if parent in names]
+                    if any(parent is None for parent in parents):
+                        continue
+                    waiting.remove(name)
+                    broken = [p.step for p in parents if p.status in (FAILED, BLOCKED)]
+                    pending = [p.step for p in parents if p.status == STALE]
+                    if broken:
+                        results[name] = StepResult(name, BLOCKED, '%s failed' % broken[0],
+                                                   0.0, None)
+                    elif pending:
+                        results[name] = StepResult(name, STALE, '%s is stale' % pending[0],
+                                                   0.0, None)
+                    else:
+                        future = pool.submit(self._build, self.steps[name], name in force,
+                                             dry_run)
+                        running[future] = name
+                        continue
+                    if report is not None:
+                        report(results[name])
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    results[running.pop(future)] = result
+                    if report is not None:
+                        report(result)
+        with self._lock:
+            # Digests of files hashed for steps that were up to date
+            if not dry_run:
+                self._save()
+        return [results[name] for name in names]
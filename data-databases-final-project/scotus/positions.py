@@ -0,0 +1,167 @@
+"""Where every parsed turn sits in the official transcript.
+
+Once the footers are gone a turn is just text: citing it meant searching
+the raw file for it again to find its page. TranscriptParser.locate()
+records each turn's page, line and byte offsets while cleaning, and a
+PositionIndex keeps them for a whole corpus, numbered like the turns of
+parse_corpus() (and the rows of the dialogue frame):
+
+    write_positions('positions', corpus_jobs(all_2019, transcripts_dir)[0])
+    positions = PositionIndex('positions')
+    positions.cite(1234)        # '17-834, page 23, line 4'
+    positions.raw(1234)         # the turn as printed, footers and all
+    positions.context(1234)     # with 500 bytes either side
+
+turns.bin holds one fixed-size record per turn (file, page, line, start,
+end), so finding a turn is one read at a known offset and showing it is one
+seek into the transcript; files.json lists the transcripts with the hash
+they had when indexed, which verify() checks. Rewriting the index reuses
+the records of files whose hash (and parser) hasn't changed.
+"""
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+from .parsecache import file_digest, parser_fingerprint
+from .transcripts import TranscriptParser
+
+FORMAT_VERSION = 1
+
+# file number, page, line, first byte, one past the last byte
+RECORD = struct.Struct('<iiiqq')
+
+TurnPosition = namedtuple('TurnPosition', ['docket', 'path', 'page', 'line', 'start', 'end'])
+
+
+def write_positions(root, jobs, parser=None, failures=()):
+    """Locates the turns of (docket, path) jobs and writes the index under
+    `root`; returns the number of turns.
+
+    failures -- FileFailure records (or (docket, path) pairs) of files
+                parse_corpus() couldn't parse; they are left out, as
+                parse_corpus() leaves out their turns
+    """
+    parser = parser or TranscriptParser()
+    fingerprint = parser_fingerprint(parser)
+    skip = {(failure[0], failure[1]) for failure in failures}
+    os.makedirs(root, exist_ok=True)
+    previous, old = {}, None
+    if os.path.exists(os.path.join(root, 'files.json')):
+        old = PositionIndex(root)
+        if old.parser == fingerprint:
+            first = 0
+            for source in old.files:
+                previous[source['path'], source['digest']] = (first, source['turns'])
+                first += source['turns']
+    files = []
+    count = 0
+    records = os.path.join(root, 'turns.bin.%d.tmp' % os.getpid())
+    listing = os.path.join(root, 'files.json.%d.tmp' % os.getpid())
+    try:
+        with open(records, 'wb') as out:
+            for docket, path in jobs:
+                if (docket, path) in skip:
+                    continue
+                path = os.path.abspath(path)
+                digest = file_digest(path)
+                number = len(files)
+                if (path, digest) in previous:
+                    first, turns = previous[path, digest]
+                    spans = [RECORD.unpack_from(old._records, (first + n) * RECORD.size)[1:]
+                             for n in range(turns)]
+                else:
+                    spans = parser.locate(path)
+                files.append({'docket': docket, 'path': path, 'digest': digest,
+                              'turns': len(spans)})
+                out.write(b''.join(RECORD.pack(number, *span) for span in spans))
+                count += len(spans)
+        with open(listing, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'parser': fingerprint, 'turns': count,
+                       'files': files}, f, indent=1)
+        if old is not None:
+            old.close()
+            old = None
+        os.replace(records, os.path.join(root, 'turns.bin'))
+        os.replace(listing, os.path.join(root, 'files.json'))
+    finally:
+        if old is not None:
+            old.close()
+        # Whatever failed, no half-written index is left behind
+        for tmp in (records, listing):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return count
+
+
+class PositionIndex:
+    """The turn positions written by write_positions(), read in place."""
+
+    def __init__(self, root):
+        with open(os.path.join(root, 'files.json')) as f:
+            meta = json.load(f)
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError('%s was written in format %s, this reads %s'
+                             % (root, meta['version'], FORMAT_VERSION))
+        self.files = meta['files']
+        self.parser = meta.get('parser')
+        self._count = meta['turns']
+        self._file = open(os.path.join(root, 'turns.bin'), 'rb')
+        self._records = (mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                         if self._count else b'')
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, turn):
+        if turn < 0:
+            turn += self._count
+        if not 0 <= turn < self._count:
+            raise IndexError('turn %d out of range' % turn)
+        number, page, line, start, end = RECORD.unpack_from(self._records, turn * RECORD.size)
+        source = self.files[number]
+        return TurnPosition(source['docket'], source['path'], page, line, start, end)
+
+    def cite(self, turn):
+        position = self[turn]
+        return '%s, page %d, line %d' % (position.docket, position.page, position.line)
+
+    def _read(self, path, start, end):
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def raw(self, turn):
+        """The turn's text as it is in the transcript file."""
+        position = self[turn]
+        return self._read(position.path, position.start, position.end).decode('utf-8')
+
+    def context(self, turn, around=500):
+        """The turn with `around` bytes of the transcript either side."""
+        position = self[turn]
+        start = max(position.start - around, 0)
+        data = self._read(position.path, start, position.end + around)
+        return data.decode('utf-8', errors='replace')
+
+    def verify(self):
+        """The files that changed (or went missing) since they were indexed."""
+        changed = []
+        for source in self.files:
+            try:
+                if file_digest(source['path']) != source['digest']:
+                    changed.append(source['path'])
+            except OSError:
+                changed.append(source['path'])
+        return changed
@@ -0,0 +1,142 @@
+"""Items a stage couldn't process, kept until they are processed.
+
+The notebook's loops wrap their bodies in a bare except: a docket whose page
+failed comes back as an empty dict and disappears at merged.dropna(), and
+getting it back meant scraping everything again. A Quarantine keeps the
+failures of one stage, one JSON file per stage under `root`: for each item
+the key it was processed under (a docket, or a term), the path or URL it was
+read from, the error and a fingerprint of its input (the argument-list row
+of a docket, the hash of a file), with how often and when it failed:
+
+    quarantine = Quarantine('quarantine', 'enrich')
+    failures = []
+    other_source = fetch_lower_courts(docks, fetcher, failures=failures)
+    quarantine.update(failures, done=docks)
+    quarantine.keys()       # ['19-1', ...], ready to be looked up again
+
+update() adds the failures and releases the items that went through, so
+replaying only quarantine.keys() and merging the results into what was
+written before costs one request (or one parse) per failed item:
+python -m scotus replay does that for scrape, enrich, convert and parse.
+"""
+import json
+import os
+import time
+from collections import namedtuple
+
+from .parsecache import file_digest
+
+FORMAT_VERSION = 1
+
+# What a stage reports for an item it couldn't process: the key (a docket,
+# or a term), the path or URL it read and the error
+FileFailure = namedtuple('FileFailure', ['docket', 'path', 'error'])
+
+QuarantinedItem = namedtuple('QuarantinedItem', ['stage', 'key', 'path', 'error', 'fingerprint',
+                                                 'attempts', 'first_failed', 'last_failed'])
+
+
+def file_fingerprint(path):
+    """The hash of an input file, or None if there is no such file."""
+    try:
+        return file_digest(path)
+    except OSError:
+        return None
+
+
+def stages(root):
+    """The stages with a quarantine file under `root`."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[:-len('.json')] for name in os.listdir(root) if name.endswith('.json'))
+
+
+class Quarantine:
+    """The failed items of one stage, saved as `root`/<stage>.json."""
+
+    def __init__(self, root, stage):
+        self.root = root
+        self.stage = stage
+        self.path = os.path.join(root, stage + '.json')
+        self.items = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                meta = json.load(f)
+            if meta['version'] != FORMAT_VERSION:
+                raise ValueError('%s was written in format %s, this reads %s'
+                                 % (self.path, meta['version'], FORMAT_VERSION))
+            self.items = meta['items']
+
+    def __contains__(self, key):
+        return str(key) in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        for key in self.keys():
+            yield self.get(key)
+
+    def __repr__(self):
+        return 'Quarantine(%r, %r, items=%d)' % (self.root, self.stage, len(self))
+
+    def keys(self):
+        """The quarantined keys, in the order they first failed."""
+        return sorted(self.items, key=lambda key: (self.items[key]['first_failed'], key))
+
+    def get(self, key):
+        item = self.items.get(str(key))
+        if item is None:
+            return None
+        return QuarantinedItem(self.stage, str(key), item['path'], item['error'],
+                               item['fingerprint'], item['attempts'], item['first_failed'],
+                               item['last_failed'])
+
+    def add(self, key, error, path=None, fingerprint=None):
+        now = time.time()
+        seen = self.items.get(str(key), {})
+        self.items[str(key)] = {
+            'path': path,
+            'error': error,
+            'fingerprint': fingerprint,
+            'attempts': seen.get('attempts', 0) + 1,
+            'first_failed': seen.get('first_failed', now),
+            'last_failed': now,
+        }
+
+    def release(self, key):
+        """Drops an item that has gone through; False if it wasn't held."""
+        return self.items.pop(str(key), None) is not None
+
+    def update(self, failures, done=(), fingerprints=None):
+        """Releases the keys in `done`, then quarantines each FileFailure
+        (docket, path, error) in `failures` and saves.
+
+        fingerprints -- {key: fingerprint of its input}; without one, the
+                        hash of the failure's file if it has one
+        """
+        failed = {str(failure.docket) for failure in failures}
+        for key in done:
+            if str(key) not in failed:
+                self.release(key)
+        for failure in failures:
+            if failure.docket is None:
+                # A case without a docket can't be looked up again
+                continue
+            if fingerprints is not None and failure.docket in fingerprints:
+                fingerprint = fingerprints[failure.docket]
+            elif failure.path and not failure.path.startswith(('http://', 'https://')):
+                fingerprint = file_fingerprint(failure.path)
+            else:
+                fingerprint = None
+            self.add(failure.docket, failure.error, failure.path, fingerprint)
+        self.save()
+        return self
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'stage': self.stage, 'items': self.items}, f,
+                      indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,187 @@
+"""Full-text search over oral-argument dialogue.
+
+A SQLite database with cases, speakers and turns tables linked by docket,
+plus an FTS5 index on what was said. Searching the index is a lookup in
+the inverted index instead of a scan of every turn:
+
+    index = DialogueIndex('search.sqlite')
+    for hit in index.search('equal protection', speaker='GINSBURG', term=2019):
+        print(hit.docket, hit.speaker, hit.snippet)
+"""
+import sqlite3
+from collections import namedtuple
+
+from .speakers import canonical_name
+
+SearchHit = namedtuple('SearchHit', ['turn_id', 'docket', 'case_name', 'term', 'lower_court',
+                                     'speaker', 'snippet', 'rank'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cases (
+    docket TEXT PRIMARY KEY,
+    name TEXT,
+    date TEXT,
+    pdf TEXT,
+    lower_court TEXT,
+    term INTEGER
+);
+CREATE TABLE IF NOT EXISTS speakers (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    docket TEXT NOT NULL REFERENCES cases (docket),
+    seq INTEGER NOT NULL,
+    speaker_id INTEGER NOT NULL REFERENCES speakers (id),
+    words TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_docket ON turns (docket, seq);
+CREATE INDEX IF NOT EXISTS turns_speaker ON turns (speaker_id);
+CREATE INDEX IF NOT EXISTS cases_term ON cases (term);
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5 (
+    words, content='turns', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+CASE_FIELDS = ('docket', 'name', 'date', 'pdf', 'lower_court', 'term')
+
+
+def phrase(text):
+    """Quotes text as one FTS5 phrase."""
+    return '"%s"' % text.replace('"', '""')
+
+
+class DialogueIndex:
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self._speakers = dict(self.db.execute("SELECT name, id FROM speakers"))
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add_cases(self, cases):
+        """Inserts or updates cases: dicts (or records) with CASE_FIELDS."""
+        rows = []
+        for case in cases:
+            if not isinstance(case, dict):
+                case = case._asdict()
+            if not case.get('docket'):
+                continue
+            rows.append(tuple(case.get(field) for field in CASE_FIELDS))
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO cases VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (docket) DO UPDATE SET name = excluded.name, date = excluded.date,"
+                " pdf = excluded.pdf, lower_court = excluded.lower_court, term = excluded.term",
+                rows)
+
+    def _speaker_id(self, speaker):
+        name = canonical_name(speaker)
+        speaker_id = self._speakers.get(name)
+        if speaker_id is None:
+            speaker_id = self.db.execute("INSERT INTO speakers (name) VALUES (?)", (name,)).lastrowid
+            self._speakers[name] = speaker_id
+        return speaker_id
+
+    def remove_dockets(self, dockets):
+        """Drops the turns of `dockets`, e.g. before indexing them again."""
+        with self.db:
+            for docket in dockets:
+                self.db.execute(
+                    "INSERT INTO turns_fts (turns_fts, rowid, words)"
+                    " SELECT 'delete', id, words FROM turns WHERE docket = ?", (docket,))
+                self.db.execute("DELETE FROM turns WHERE docket = ?", (docket,))
+
+    def add_turns(self, turns):
+        """Indexes (docket, speaker, words) turns, replacing any turns
+        already stored for the same dockets."""
+        turns = list(turns)
+        self.remove_dockets({docket for docket, _, _ in turns})
+        seq = {}
+        with self.db:
+            first = self.db.execute("SELECT COALESCE(MAX(id), 0) FROM turns").fetchone()[0]
+            rows = []
+            for docket, speaker, words in turns:
+                seq[docket] = seq.get(docket, -1) + 1
+                rows.append((docket, seq[docket], self._speaker_id(speaker), words))
+            self.db.executemany(
+                "INSERT INTO turns (docket, seq, speaker_id, words) VALUES (?, ?, ?, ?)", rows)
+            self.db.execute(
+                "INSERT INTO turns_fts (rowid, words) SELECT id, words FROM turns WHERE id > ?",
+                (first,))
+
+    def optimize(self):
+        with self.db:
+            self.db.execute("INSERT INTO turns_fts (turns_fts) VALUES ('optimize')")
+            self.db.execute("ANALYZE")
+
+    def search(self, query, speaker=None, term=None, lower_court=None, docket=None,
+               exact=False, limit=20, context=12):
+        """Returns the best matching turns as SearchHits, best first.
+
+        query       -- FTS5 query ('equal protection', 'abortion OR choice',
+                       'NEAR(state federal, 5)'); with exact=True it is
+                       searched as one phrase
+        speaker     -- part of the speaker's name, e.g. 'GINSBURG'
+        term        -- a term (2019) or list of terms
+        lower_court -- part of the lower court's name, e.g. 'Ninth Circuit'
+        context     -- words of context in each snippet
+        """
+        if exact:
+            query = phrase(query)
+        sql = [
+            "SELECT turns.id, turns.docket, cases.name, cases.term, cases.lower_court,",
+            " speakers.name, snippet(turns_fts, 0, '[', ']', '...', ?), turns_fts.rank",
+            " FROM turns_fts",
+            " JOIN turns ON turns.id = turns_fts.rowid",
+            " JOIN speakers ON speakers.id = turns.speaker_id",
+            " LEFT JOIN cases ON cases.docket = turns.docket",
+            " WHERE turns_fts MATCH ?",
+        ]
+        params = [context, query]
+        if speaker is not None:
+            sql.append(" AND speakers.name LIKE ?")
+            params.append('%' + canonical_name(speaker) + '%')
+        if term is not None:
+            terms = [term] if isinstance(term, int) else list(term)
+            sql.append(" AND cases.term IN (%s)" % ', '.join('?' * len(terms)))
+            params += terms
+        if lower_court is not None:
+            sql.append(" AND cases.lower_court LIKE ?")
+            params.append('%' + lower_court + '%')
+        if docket is not None:
+            sql.append(" AND turns.docket = ?")
+            params.append(docket)
+        sql.append(" ORDER BY turns_fts.rank LIMIT ?")
+        params.append(limit)
+        return [SearchHit(*row) for row in self.db.execute(''.join(sql), params)]
+
+    def turn(self, turn_id):
+        """(docket, speaker, words) of one turn, e.g. to show a hit in full."""
+        return self.db.execute(
+            "SELECT turns.docket, speakers.name, turns.words FROM turns"
+            " JOIN speakers ON speakers.id = turns.speaker_id WHERE turns.id = ?",
+            (turn_id,)).fetchone()
+
+
+def index_dialogue(path, merged, dialogue, term=None):
+    """Builds (or refreshes) a search database from the notebook's tables."""
+    cases = merged.to_dict('records')
+    if term is not None:
+        for case in cases:
+            case['term'] = term
+    index = DialogueIndex(path)
+    index.add_cases(cases)
+    index.add_turns(dialogue[['docket', 'speaker', 'words']].itertuples(index=False, name=None))
+    index.optimize()
+    return index
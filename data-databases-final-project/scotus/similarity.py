@@ -0,0 +1,374 @@
+"""Turns that say nearly the same thing, across cases and terms.
+
+Finding where a line of questioning recurs (a justice reusing a
+hypothetical, counsel reading the same passage in two arguments) meant
+comparing every turn of the dialogue with every other: n * n comparisons,
+out of reach for a corpus of many terms. Each turn is cut instead into
+shingles, runs of `shingle` consecutive words, and reduced to a MinHash
+signature of `num_perm` numbers: two signatures agree in about the share of
+places that the two turns' shingle sets overlap (their Jaccard similarity).
+Locality-sensitive hashing cuts every signature into bands and buckets the
+turns by each band, so only turns sharing a bucket in some band are ever
+compared; the time goes with the number of turns and candidate pairs, not
+their square:
+
+    index = SignatureIndex.build(all_cases, 'minhash')
+    for pair in index.pairs(threshold=0.6):
+        print(pair.jaccard, index.cite(pair.first), index.cite(pair.second))
+
+Signatures are computed for all of a batch's turns at once with numpy, and
+kept on disk, so adding a term only hashes its own turns:
+
+    index = SignatureIndex('minhash')
+    added = index.update(new_term_turns)    # dockets not yet in the index
+    index.save()
+    index.pairs(threshold=0.6, since=len(index) - added)   # pairs with a new turn
+
+On disk an index is a directory:
+
+    signatures.npy  one row of num_perm uint32 per turn
+    turns.npz       per turn: docket id, speaker id, its number within its
+                    docket, and how many shingles it had
+    meta.json       the hashing parameters, docket and speaker names
+"""
+import json
+import os
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from .concordance import tokenize
+from .speakers import canonical_name
+
+FORMAT_VERSION = 2
+
+NUM_PERM = 128
+SHINGLE = 5
+SEED = 1
+
+# Shingle hashes put through MinHash at a time: times NUM_PERM * 8 bytes,
+# 4 MB, which stays in cache and is faster than larger blocks
+CHUNK = 1 << 12
+
+# The empty signature, of a turn without words
+EMPTY = np.uint32(0xFFFFFFFF)
+
+NearDuplicate = namedtuple('NearDuplicate', ['first', 'second', 'jaccard'])
+
+# Odd, so every power of it is too: shingle hashes keep their low bits
+_ROLL = np.uint64(0x9E3779B97F4A7C15)
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """The number of bands (dividing num_perm) whose chance of making two
+    turns candidates best separates those above `threshold` from those
+    below: the fewest false positives and false negatives together."""
+    similarity = np.linspace(0, 1, 1001)
+    below = similarity < threshold
+    best, best_error = 1, None
+    for bands in range(1, num_perm + 1):
+        if num_perm % bands:
+            continue
+        candidate = 1 - (1 - similarity ** (num_perm // bands)) ** bands
+        error = candidate[below].sum() + (1 - candidate[~below]).sum()
+        if best_error is None or error < best_error:
+            best, best_error = bands, error
+    return best
+
+
+class MinHasher:
+    """Shingles texts and computes their MinHash signatures.
+
+    Shingle hashes are 64-bit polynomial hashes of word hashes (crc32,
+    which unlike hash() is the same in every process); the num_perm hash
+    functions are multiply-shift hashes (a * x + b) >> 32 with random odd
+    a, seeded, so signatures made at different times can be compared.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle=SHINGLE, seed=SEED):
+        self.num_perm = num_perm
+        self.shingle = shingle
+        self.seed = seed
+        state = np.random.default_rng(seed)
+        odd = state.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._a = odd * np.uint64(2) + np.uint64(1)
+        self._b = state.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+        self._powers = np.array([pow(int(_ROLL), n, 1 << 64) for n in range(shingle)],
+                                dtype=np.uint64)
+        self._words = {}
+
+    def _word_hashes(self, text):
+        words = self._words
+        hashes = []
+        for word in tokenize(text):
+            found = words.get(word)
+            if found is None:
+                found = words[word] = zlib.crc32(word.encode('utf-8')) + 1
+            hashes.append(found)
+        return hashes
+
+    def shingles(self, texts):
+        """The shingle hashes of every text, back to back, and how many
+        each text has. A text shorter than `shingle` words is one shingle
+        of all its words; one without words has none."""
+        hashes, lengths = [], []
+        for text in texts:
+            found = self._word_hashes(text)
+            hashes += found
+            lengths.append(len(found))
+        words = np.array(hashes, dtype=np.uint64)
+        lengths = np.array(lengths, dtype=np.int64)
+        sizes = np.minimum(lengths, self.shingle)
+        counts = np.where(lengths > 0, lengths - sizes + 1, 0)
+        # Where each shingle starts in `words`, and how many words it spans
+        firsts = np.cumsum(lengths) - lengths
+        text_of = np.repeat(np.arange(len(lengths)), counts)
+        starts = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+        starts += firsts[text_of]
+        spans = sizes[text_of]
+        shingles = np.zeros(len(starts), dtype=np.uint64)
+        for offset in range(self.shingle):
+            inside = offset < spans
+            at = np.minimum(starts + offset, max(len(words) - 1, 0))
+            power = self._powers[np.maximum(spans - 1 - offset, 0)]
+            shingles += np.where(inside, words[at] * power, np.uint64(0))
+        return shingles, counts
+
+    def signatures(self, texts):
+        """(signatures, shingle counts): a (len(texts), num_perm) uint32
+        array, EMPTY throughout for texts without words."""
+        shingles, counts = self.shingles(texts)
+        signatures = np.full((len(counts), self.num_perm), EMPTY, dtype=np.uint32)
+        ends = np.cumsum(counts)
+        first = 0
+        while first < len(counts):
+            # As many whole texts as fit in CHUNK shingles (at least one)
+            start = ends[first] - counts[first]
+            last = max(int(np.searchsorted(ends, start + CHUNK, side='right')), first + 1)
+            block = shingles[start:ends[last - 1]]
+            if len(block):
+                hashed = np.multiply.outer(block, self._a)
+                hashed += self._b
+                hashed >>= np.uint64(32)
+                keep = counts[first:last] > 0
+                offsets = (ends[first:last] - counts[first:last] - start)[keep]
+                rows = np.arange(first, last)[keep]
+                signatures[rows] = np.minimum.reduceat(hashed.astype(np.uint32), offsets, axis=0)
+            first = last
+        return signatures, counts
+
+    def describe(self):
+        return {'num_perm': self.num_perm, 'shingle': self.shingle, 'seed': self.seed}
+
+
+def _band_keys(signatures, bands):
+    """One uint64 per turn and band: the band's rows hashed together."""
+    rows = signatures.shape[1] // bands
+    keys = np.zeros((len(signatures), bands), dtype=np.uint64)
+    for row in range(rows):
+        keys = keys * _ROLL + signatures[:, row::rows][:, :bands].astype(np.uint64)
+    return keys
+
+
+def _bucket_pairs(keys, max_bucket):
+    """(first, second) index arrays of every two entries with equal keys,
+    leaving out buckets of more than max_bucket entries."""
+    order = np.argsort(keys, kind='stable')
+    ordered = keys[order]
+    edges = np.flatnonzero(np.diff(ordered)) + 1
+    bounds = np.concatenate(([0], edges, [len(ordered)]))
+    sizes = np.diff(bounds)
+    allowed = np.repeat(sizes <= max_bucket, sizes)
+    firsts, seconds = [], []
+    distance = 1
+    # Equal keys are neighbours once sorted: pairs `distance` apart, until
+    # no bucket is that large
+    while distance < min(max_bucket, len(ordered)):
+        same = (ordered[:-distance] == ordered[distance:]) & allowed[:-distance]
+        if not same.any():
+            break
+        firsts.append(order[:-distance][same])
+        seconds.append(order[distance:][same])
+        distance += 1
+    if not firsts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+class SignatureIndex:
+    """The MinHash signatures of a corpus's turns, kept in `directory`.
+
+    The hashing parameters are those it was saved with; for a new index,
+    those given (or the defaults).
+    """
+
+    def __init__(self, directory, num_perm=None, shingle=None, seed=None):
+        self.directory = directory
+        self.dockets, self.speakers = [], []
+        self.signatures = np.empty((0, num_perm or NUM_PERM), dtype=np.uint32)
+        self.turn_docket = np.empty(0, dtype=np.int32)
+        self.turn_speaker = np.empty(0, dtype=np.int32)
+        self.turn_number = np.empty(0, dtype=np.int32)
+        self.turn_shingles = np.empty(0, dtype=np.int32)
+        params = {'num_perm': num_perm or NUM_PERM, 'shingle': shingle or SHINGLE,
+                  'seed': SEED if seed is None else seed}
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['version'] != FORMAT_VERSION:
+                raise ValueError('index format %s, expected %s'
+                                 % (meta['version'], FORMAT_VERSION))
+            given = {'num_perm': num_perm, 'shingle': shingle, 'seed': seed}
+            for name, value in given.items():
+                if value is not None and value != meta['hasher'][name]:
+                    raise ValueError('%s was built with %s=%s, not %s'
+                                     % (directory, name, meta['hasher'][name], value))
+            params = meta['hasher']
+            self.dockets, self.speakers = meta['dockets'], meta['speakers']
+            self.signatures = np.load(os.path.join(directory, 'signatures.npy'), mmap_mode='r')
+            with np.load(os.path.join(directory, 'turns.npz')) as turns:
+                self.turn_docket = turns['docket']
+                self.turn_speaker = turns['speaker']
+                self.turn_number = turns['number']
+                self.turn_shingles = turns['shingles']
+        self.hasher = MinHasher(**params)
+        self._docket_ids = {docket: n for n, docket in enumerate(self.dockets)}
+        self._speaker_ids = {speaker: n for n, speaker in enumerate(self.speakers)}
+
+    @classmethod
+    def build(cls, turns, directory, **params):
+        """A new index of `turns`, replacing any in `directory`."""
+        if os.path.exists(os.path.join(directory, 'meta.json')):
+            os.remove(os.path.join(directory, 'meta.json'))
+        index = cls(directory, **params)
+        index.add_turns(turns)
+        index.save()
+        return index
+
+    def __len__(self):
+        return len(self.turn_docket)
+
+    def __repr__(self):
+        return 'SignatureIndex(%r, turns=%d, dockets=%d)' % (self.directory, len(self),
+                                                             len(self.dockets))
+
+    def _id(self, names, ids, name):
+        if name not in ids:
+            ids[name] = len(names)
+            names.append(name)
+        return ids[name]
+
+    def add_turns(self, turns):
+        """Adds (docket, speaker, words) turns after those already in the
+        index; returns how many there were."""
+        dockets, speakers, numbers, texts = [], [], [], []
+        counts = np.bincount(self.turn_docket, minlength=len(self.dockets)).tolist()
+        for docket, speaker, words in turns:
+            docket_id = self._id(self.dockets, self._docket_ids, docket)
+            if docket_id == len(counts):
+                counts.append(0)
+            dockets.append(docket_id)
+            speakers.append(self._id(self.speakers, self._speaker_ids, canonical_name(speaker)))
+            numbers.append(counts[docket_id])
+            counts[docket_id] += 1
+            texts.append(words)
+        signatures, shingles = self.hasher.signatures(texts)
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.turn_docket = np.concatenate([self.turn_docket, np.array(dockets, dtype=np.int32)])
+        self.turn_speaker = np.concatenate([self.turn_speaker,
+                                            np.array(speakers, dtype=np.int32)])
+        self.turn_number = np.concatenate([self.turn_number, np.array(numbers, dtype=np.int32)])
+        self.turn_shingles = np.concatenate([self.turn_shingles, shingles.astype(np.int32)])
+        return len(texts)
+
+    def update(self, turns):
+        """Adds the turns of dockets that aren't in the index yet, so the
+        dialogue of every term so far can be passed each time; returns how
+        many turns were added."""
+        known = set(self._docket_ids)
+        return self.add_turns(turn for turn in turns if turn[0] not in known)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, 'signatures.npy')
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.signatures))
+        os.replace(tmp, path)
+        self.signatures = np.load(path, mmap_mode='r')
+        np.savez(os.path.join(self.directory, 'turns.npz'), docket=self.turn_docket,
+                 speaker=self.turn_speaker, number=self.turn_number, shingles=self.turn_shingles)
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as f:
+            json.dump({'version': FORMAT_VERSION, 'hasher': self.hasher.describe(),
+                       'dockets': self.dockets, 'speakers': self.speakers}, f)
+
+    def docket(self, turn):
+        return self.dockets[self.turn_docket[turn]]
+
+    def speaker(self, turn):
+        return self.speakers[self.turn_speaker[turn]]
+
+    def cite(self, turn):
+        """'17-834 #12 JUSTICE KAGAN': the turn's docket, its number there
+        and its speaker."""
+        return '%s #%d %s' % (self.docket(turn), self.turn_number[turn], self.speaker(turn))
+
+    def jaccard(self, first, second):
+        """Estimated Jaccard similarity of each pair of turns (arrays)."""
+        first, second = np.asarray(first), np.asarray(second)
+        scores = np.empty(len(first))
+        for start in range(0, len(first), CHUNK):
+            part = slice(start, start + CHUNK)
+            scores[part] = (self.signatures[first[part]]
+                            == self.signatures[second[part]]).mean(axis=1)
+        return scores
+
+    def pairs(self, threshold=0.5, bands=None, since=None, same_docket=False, min_shingles=8,
+              max_bucket=200):
+        """Pairs of turns whose estimated Jaccard similarity is at least
+        `threshold`, most similar first.
+
+        bands        -- LSH bands (default: lsh_bands(threshold))
+        since        -- only pairs with a turn numbered `since` or later
+        same_docket  -- include pairs within one argument
+        min_shingles -- leave out turns shorter than this ("Thank you.")
+        max_bucket   -- leave out buckets larger than this: a band shared
+                        by that many turns is boilerplate
+        """
+        bands = bands or lsh_bands(threshold, self.hasher.num_perm)
+        usable = np.flatnonzero(self.turn_shingles >= min_shingles)
+        keys = _band_keys(np.asarray(self.signatures[usable]), bands)
+        found = []
+        for band in range(bands):
+            firsts, seconds = _bucket_pairs(keys[:, band], max_bucket)
+            low, high = np.minimum(firsts, seconds), np.maximum(firsts, seconds)
+            found.append(usable[low].astype(np.uint64) * np.uint64(len(self))
+                         + usable[high].astype(np.uint64))
+        encoded = np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.uint64)
+        first = (encoded // np.uint64(max(len(self), 1))).astype(np.int64)
+        second = (encoded % np.uint64(max(len(self), 1))).astype(np.int64)
+        keep = np.ones(len(first), dtype=bool)
+        if since is not None:
+            keep &= second >= since
+        if not same_docket:
+            keep &= self.turn_docket[first] != self.turn_docket[second]
+        first, second = first[keep], second[keep]
+        scores = self.jaccard(first, second)
+        close = scores >= threshold
+        first, second, scores = first[close], second[close], scores[close]
+        order = np.lexsort((second, first, -scores))
+        return [NearDuplicate(int(first[n]), int(second[n]), float(scores[n])) for n in order]
+
+    def query(self, text, threshold=0.5, bands=None):
+        """The turns whose estimated Jaccard similarity to `text` is at least
+        `threshold`, as (turn, jaccard) pairs, most similar first."""
+        bands = bands or lsh_bands(threshold, self.hasher.num_perm)
+        signature, _ = self.hasher.signatures([text])
+        mine = _band_keys(signature, bands)[0]
+        keys = _band_keys(np.asarray(self.signatures), bands)
+        turns = np.flatnonzero((keys == mine).any(axis=1))
+        scores = (self.signatures[turns] == signature[0]).mean(axis=1)
+        order = np.argsort(-scores, kind='stable')
+        return [(int(turns[n]), float(scores[n])) for n in order if scores[n] >= threshold]
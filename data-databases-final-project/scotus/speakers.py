@@ -0,0 +1,188 @@
+"""Canonical speakers and a compact table of turns.
+
+Speaker labels come out of the transcripts as '\\nJUSTICE\\nGINSBURG:', with
+the line breaks of the page and the colon still attached, and every turn
+carried its own copy of the speaker and docket strings. SpeakerRegistry
+normalizes a label once to an integer id with a role, so line-wrapped
+variants of a name are one speaker; TurnTable keeps turns as parallel
+integer arrays into the registry, a docket list and one shared UTF-8 text
+buffer (a bytearray, so one accented name doesn't widen every turn's text,
+and appending a turn never copies the ones before it):
+
+    table = TurnTable.from_turns(corpus.turns)
+    table[0]          -> Turn(docket='18-1086', speaker='CHIEF JUSTICE ROBERTS', words=...)
+    table.to_frame()  -> docket / speaker / role / words, as categoricals
+"""
+import re
+import sys
+from array import array
+from collections import namedtuple
+
+JUSTICE = 'justice'
+COUNSEL = 'counsel'
+OTHER = 'other'
+ROLES = (JUSTICE, COUNSEL, OTHER)
+
+# How counsel are announced: MR./MS. X, or the Solicitor General's office
+COUNSEL_PREFIXES = ('MR', 'MS', 'MRS', 'GENERAL')
+
+# The words of a label that start the name proper; anything before them was
+# picked up from the line above (e.g. 'REBUTTAL ARGUMENT ... JUSTICE KAGAN')
+NAME_START = re.compile(r"\b(?:CHIEF JUSTICE|JUSTICE)\b")
+
+Turn = namedtuple('Turn', ['docket', 'speaker', 'words'])
+
+
+def canonical_name(label):
+    """'\\nJUSTICE\\nGINSBURG:' -> 'JUSTICE GINSBURG'"""
+    name = ' '.join(label.split()).rstrip(':').strip().upper()
+    starts = [match.start() for match in NAME_START.finditer(name)]
+    return name[starts[-1]:] if starts else name
+
+
+def speaker_role(name):
+    words = name.replace('.', ' ').split()
+    if 'JUSTICE' in words:
+        return JUSTICE
+    if words and words[0] in COUNSEL_PREFIXES:
+        return COUNSEL
+    return OTHER
+
+
+class SpeakerRegistry:
+    """Canonical speaker names, their integer ids and roles.
+
+    aliases -- optional canonical name -> name to use instead, for
+               spellings normalization can't merge on its own
+    """
+
+    def __init__(self, aliases=None):
+        self.names = []
+        self.roles = []
+        self.aliases = dict(aliases or {})
+        self._ids = {}
+        self._labels = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def id(self, label):
+        """The id of a raw label, registering the speaker if new."""
+        speaker_id = self._labels.get(label)
+        if speaker_id is None:
+            name = canonical_name(label)
+            name = self.aliases.get(name, name)
+            speaker_id = self._ids.get(name)
+            if speaker_id is None:
+                speaker_id = self._ids[name] = len(self.names)
+                self.names.append(name)
+                self.roles.append(speaker_role(name))
+            self._labels[label] = speaker_id
+        return speaker_id
+
+    def lookup(self, name):
+        """The id of a name or raw label, or None if it was never seen."""
+        name = canonical_name(name)
+        return self._ids.get(self.aliases.get(name, name))
+
+    def name(self, speaker_id):
+        return self.names[speaker_id]
+
+    def role(self, speaker_id):
+        return self.roles[speaker_id]
+
+    def variants(self):
+        """Raw label -> canonical name, for every label seen."""
+        return {label: self.names[speaker_id] for label, speaker_id in self._labels.items()}
+
+    def frame(self):
+        """One row per speaker: id, name and role."""
+        import pandas as pd
+
+        return pd.DataFrame({'id': range(len(self.names)), 'name': self.names,
+                             'role': self.roles})
+
+
+class TurnTable:
+    """Turns as parallel arrays: speaker id, docket id, and the byte offset
+    and length of the words in one UTF-8 buffer shared by every turn."""
+
+    __slots__ = ('speakers', 'dockets', '_docket_ids', 'speaker_ids', 'docket_ids',
+                 'offsets', 'lengths', 'text')
+
+    def __init__(self, speakers=None):
+        self.speakers = speakers if speakers is not None else SpeakerRegistry()
+        self.dockets = []
+        self._docket_ids = {}
+        self.speaker_ids = array('i')
+        self.docket_ids = array('i')
+        self.offsets = array('q')
+        self.lengths = array('i')
+        self.text = bytearray()
+
+    @classmethod
+    def from_turns(cls, turns, speakers=None):
+        """From (docket, speaker, words) tuples, as parse_corpus returns."""
+        table = cls(speakers)
+        table.extend(turns)
+        return table
+
+    def append(self, docket, speaker, words):
+        docket_id = self._docket_ids.get(docket)
+        if docket_id is None:
+            docket_id = self._docket_ids[docket] = len(self.dockets)
+            self.dockets.append(docket)
+        self.speaker_ids.append(self.speakers.id(speaker))
+        self.docket_ids.append(docket_id)
+        data = words.encode('utf-8')
+        self.offsets.append(len(self.text))
+        self.lengths.append(len(data))
+        self.text.extend(data)
+
+    def extend(self, turns):
+        for docket, speaker, words in turns:
+            self.append(docket, speaker, words)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def words(self, index):
+        start = self.offsets[index]
+        return self.text[start:start + self.lengths[index]].decode('utf-8')
+
+    def __getitem__(self, index):
+        return Turn(self.dockets[self.docket_ids[index]],
+                    self.speakers.name(self.speaker_ids[index]), self.words(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def nbytes(self):
+        """Bytes held by the arrays, the text buffer and the docket and
+        speaker names (not counting the registry's label lookup)."""
+        text = self.text
+        arrays = sum(a.itemsize * len(a) for a in (self.speaker_ids, self.docket_ids,
+                                                    self.offsets, self.lengths))
+        names = sum(sys.getsizeof(name) for name in self.dockets + self.speakers.names)
+        return arrays + sys.getsizeof(text) + names
+
+    def to_frame(self, words=True):
+        """docket, speaker and role as categoricals built from the ids, plus
+        the words unless words=False."""
+        import numpy as np
+        import pandas as pd
+
+        speaker_ids = np.frombuffer(self.speaker_ids, dtype=np.int32)
+        roles = np.array([ROLES.index(role) for role in self.speakers.roles], dtype=np.int8)
+        columns = {
+            'docket': pd.Categorical.from_codes(np.frombuffer(self.docket_ids, dtype=np.int32),
+                                                categories=self.dockets),
+            'speaker': pd.Categorical.from_codes(speaker_ids, categories=self.speakers.names),
+            'role': pd.Categorical.from_codes(roles[speaker_ids], categories=ROLES),
+        }
+        if words:
+            text = self.text
+            columns['words'] = [text[start:start + length].decode('utf-8')
+                                for start, length in zip(self.offsets, self.lengths)]
+        return pd.DataFrame(columns)
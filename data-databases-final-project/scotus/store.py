@@ -0,0 +1,130 @@
+"""Columnar storage for the cases table and the dialogue.
+
+merged.csv and the in-memory dialogue frame have to be re-read and
+re-parsed in full every time. Here both are written as Parquet datasets
+partitioned by term:
+
+    store/cases/term=2019/...parquet
+    store/turns/term=2019/...parquet
+
+Speaker and docket are dictionary encoded (categoricals in pandas), and
+the turns are sorted by speaker inside each term so row-group statistics
+let a filter on one justice skip most of a file. Loading only reads the
+columns asked for and the terms/speakers/dockets that pass the filters.
+Needs pyarrow.
+"""
+import os
+
+CASE_COLUMNS = ['docket', 'name', 'date', 'pdf', 'lower_court']
+
+# Turns per Parquet row group; smaller groups make speaker filters more
+# selective at the cost of a little compression
+ROW_GROUP_SIZE = 32 * 1024
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('the columnar store needs pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+def _write(table, path):
+    pa = _arrow()
+    pa.parquet.write_to_dataset(
+        table, path, partition_cols=['term'],
+        existing_data_behavior='delete_matching',
+        row_group_size=ROW_GROUP_SIZE,
+    )
+
+
+def save_cases(merged, root, term=None):
+    """Writes the cases table (merged) under root/cases, one partition per term.
+
+    `merged` needs a term column unless `term` is given for all of it.
+    Terms being written replace what was stored for them before.
+    """
+    pa = _arrow()
+    cases = merged.copy()
+    if term is not None:
+        cases['term'] = term
+    cases['term'] = cases['term'].astype('int64')
+    for column in CASE_COLUMNS:
+        if column not in cases.columns:
+            cases[column] = None
+    cases = cases[CASE_COLUMNS + ['term']]
+    cases['docket'] = cases['docket'].astype('category')
+    cases['lower_court'] = cases['lower_court'].astype('category')
+    table = pa.Table.from_pandas(cases, preserve_index=False)
+    _write(table, os.path.join(root, 'cases'))
+
+
+def save_turns(dialogue, root, terms):
+    """Writes dialogue turns under root/turns, one partition per term.
+
+    `terms` maps each docket to its term: a dict, a Series, or the cases
+    table itself (anything with docket and term columns). Turns whose
+    docket has no term are not stored. The original row order is kept in
+    a seq column so it can be restored on load.
+    """
+    pa = _arrow()
+    if hasattr(terms, 'columns'):
+        terms = dict(zip(terms['docket'], terms['term']))
+    turns = dialogue[['docket', 'speaker', 'words']].copy()
+    turns.insert(0, 'seq', range(len(turns)))
+    turns['term'] = turns['docket'].map(terms)
+    turns = turns.dropna(subset=['term'])
+    turns['term'] = turns['term'].astype('int64')
+    turns['docket'] = turns['docket'].astype('category')
+    turns['speaker'] = turns['speaker'].astype('category')
+    turns = turns.sort_values(['term', 'speaker', 'seq'], kind='stable')
+    table = pa.Table.from_pandas(turns, preserve_index=False)
+    _write(table, os.path.join(root, 'turns'))
+
+
+def _filter(pa, **values):
+    ds = pa.dataset
+    expression = None
+    for column, wanted in values.items():
+        if wanted is None:
+            continue
+        if isinstance(wanted, (str, int)):
+            wanted = [wanted]
+        condition = ds.field(column).isin(list(wanted))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _load(path, columns, expression):
+    pa = _arrow()
+    dataset = pa.dataset.dataset(path, format='parquet', partitioning='hive')
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def load_cases(root, columns=None, terms=None, dockets=None):
+    """Reads the cases table back, only the columns and terms asked for."""
+    pa = _arrow()
+    return _load(os.path.join(root, 'cases'), columns,
+                 _filter(pa, term=terms, docket=dockets))
+
+
+def load_turns(root, columns=None, terms=None, speakers=None, dockets=None):
+    """Reads dialogue turns back, in their original order within each term.
+
+    e.g. load_turns('store', ['docket', 'words'], terms=2019,
+                    speakers='JUSTICE GINSBURG:')
+    Only the partitions, row groups and columns needed are read.
+    """
+    pa = _arrow()
+    wanted = None
+    if columns is not None:
+        wanted = list(columns) + [column for column in ('term', 'seq') if column not in columns]
+    turns = _load(os.path.join(root, 'turns'), wanted,
+                  _filter(pa, term=terms, speaker=speakers, docket=dockets))
+    turns = turns.sort_values(['term', 'seq'], kind='stable').reset_index(drop=True)
+    if columns is not None:
+        turns = turns[list(columns)]
+    return turns
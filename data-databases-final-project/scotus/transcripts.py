@@ -0,0 +1,450 @@
+"""Parsing oral-argument transcripts into speaker turns.
+
+The loop in step 3 cleaned every transcript with re.sub, split it twice
+and glued the halves back together before splitting it again by speaker.
+TranscriptParser does the same cleaning with the patterns compiled once:
+after dropping the Heritage footers it finds where the argument starts
+(the Chief Justice's first words, whoever was Chief Justice) and ends,
+then walks the speaker labels between those offsets, yielding one
+(docket, speaker, words) turn at a time.
+
+MmapTranscriptParser gives the same turns without reading or decoding
+whole files: it maps each file into memory, runs byte versions of its own
+patterns over it and only decodes the speech it hands back. parse_corpus
+and python -m scotus parse use it with mmap=True and --mmap.
+
+Dropping the footers also drops the page numbers, so a turn can't be
+traced back to the official transcript from its text. locate() does the
+same cleaning while remembering where each piece of text came from, and
+gives every turn's page, line on the page and byte offsets in the raw file
+(scotus.positions keeps them for a whole corpus).
+"""
+import bisect
+import mmap
+import os
+import re
+from collections import namedtuple
+
+# Bump when the parsing changes in a way the patterns below don't show, so
+# turns cached by scotus.parsecache are parsed again
+PARSER_VERSION = 1
+
+FOOTER = re.compile(r"Heritage Reporting Corporation[\s\n\d-]+Official")
+START = re.compile(r"\nCHIEF JUSTICE [A-Z]+:")
+END = re.compile(r"The case is submitted.")
+SPEAKER = re.compile(r"\n[A-Z\s\n]+:")
+
+# The page number is the first number in a page's footer (or the first
+# group of the page pattern, if it has one); lines are counted from the
+# non-blank lines of text on the page
+PAGE_NUMBER = re.compile(r"\d+")
+TEXT_LINE = re.compile(r"^[^\S\n]*\S", re.M)
+
+# Where a turn is in the raw file: its page and line (both from 1) and the
+# byte offsets of its first and one past its last byte
+TurnSpan = namedtuple('TurnSpan', ['page', 'line', 'start', 'end'])
+
+# Byte patterns are built from the str ones by byte_pattern(). In a str
+# pattern "." and negated sets match one character, which in UTF-8 may be
+# several bytes; \s, \d and \w also match non-ASCII characters, of which
+# bytes patterns know nothing. UNICODE_SPACE spells out in UTF-8 the
+# whitespace str patterns' \s matches and bytes patterns' \s doesn't.
+ANY_CHAR = rb"(?:[^\n\x80-\xff]|[\xc0-\xff][\x80-\xbf]*)"
+ANY_CHAR_DOTALL = rb"(?:[^\x80-\xff]|[\xc0-\xff][\x80-\xbf]*)"
+MULTIBYTE_CHAR = rb"[\xc0-\xff][\x80-\xbf]*"
+UNICODE_SPACE = (rb"[\x1c-\x1f]|\xc2[\x85\xa0]|\xe1\x9a\x80"
+                 rb"|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f"
+                 rb"|\xe3\x80\x80")
+CONTROL_SPACES = (b'\x1c', b'\x1d', b'\x1e', b'\x1f')
+ASCII = bytes(range(128))
+# What \d and \w match in str patterns, to look for among a file's
+# non-ASCII characters (\s is str.isspace)
+CLASS_TESTS = {'d': str.isdecimal, 'w': str.isalnum}
+# Inline (?i) and (?x), which the flags of a compiled pattern don't show
+# when they only cover part of it
+INLINE_FLAGS = re.compile(r"\(\?[aLmsu-]*[ix]")
+
+
+def transcript_name(pdf):
+    """The text file converted from a transcript PDF link."""
+    name_pdf = pdf.split('/')[-1]
+    return name_pdf.split('.')[0] + ".txt"
+
+
+class TranscriptParser:
+    """Turns a transcript into (docket, speaker, words) tuples.
+
+    Speaker labels and words are exactly what the notebook's split gave:
+    labels keep their leading newline and trailing colon, and newlines in
+    the words are left for the dialogue DataFrame to strip. locate() takes
+    page numbers from the footers with `page`.
+    """
+
+    def __init__(self, footer=FOOTER, start=START, end=END, speaker=SPEAKER,
+                 page=PAGE_NUMBER):
+        self.footer = footer
+        self.start = start
+        self.end = end
+        self.speaker = speaker
+        self.page = page
+
+    def read(self, source):
+        """Reads a path or an open text file and drops the footers."""
+        if isinstance(source, (str, bytes, os.PathLike)):
+            with open(source, 'r', encoding='utf-8') as f:
+                return self.footer.sub("", f.read())
+        return self.footer.sub("", source.read())
+
+    def bounds(self, text):
+        """Offsets of the argument: from the Chief Justice's opening through
+        "The case is submitted." Raises ValueError if either is missing."""
+        opening = self.start.search(text)
+        if opening is None:
+            raise ValueError('no opening marker %r' % self.start.pattern)
+        closing = self.end.search(text, opening.start())
+        if closing is None:
+            raise ValueError('no closing marker %r' % self.end.pattern)
+        return opening.start(), closing.end()
+
+    def iter_text(self, text, docket):
+        begin, end = self.bounds(text)
+        return self._turns(text, begin, end, docket)
+
+    def _turns(self, text, begin, end, docket):
+        label = None
+        for match in self.speaker.finditer(text, begin, end):
+            if label is not None:
+                yield docket, label.group(), text[label.end():match.start()]
+            label = match
+        if label is not None:
+            yield docket, label.group(), text[label.end():end]
+
+    def locate(self, path):
+        """A TurnSpan for every turn turns(path, ...) gives, in the same
+        order. A turn starts at its speaker label and ends where the next
+        label starts, so a turn running over a page break includes the
+        footer between them."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        source = raw = data.decode('utf-8')
+        # read() opens the file in text mode, which turns '\r\n' into '\n';
+        # `dropped` remembers where, to translate offsets back
+        dropped = []
+        if '\r' in source:
+            for match in re.finditer(r"\r\n", source):
+                dropped.append(match.start() - len(dropped))
+            raw = source.replace('\r\n', '\n').replace('\r', '\n')
+
+        # The cleaned text, as read() makes it, from the pieces between footers
+        pieces, clean_starts, raw_starts, footers = [], [], [], []
+        size = last = 0
+        for match in self.footer.finditer(raw):
+            clean_starts.append(size)
+            raw_starts.append(last)
+            pieces.append(raw[last:match.start()])
+            size += match.start() - last
+            footers.append(match)
+            last = match.end()
+        clean_starts.append(size)
+        raw_starts.append(last)
+        pieces.append(raw[last:])
+        text = ''.join(pieces)
+        del pieces
+
+        def to_raw(offset, end=False):
+            # An end offset where a piece starts belongs to the piece before
+            # it, before the footer
+            find = bisect.bisect_left if end else bisect.bisect_right
+            piece = max(find(clean_starts, offset) - 1, 0)
+            return raw_starts[piece] + offset - clean_starts[piece]
+
+        pages = []
+        for match in footers:
+            found = self.page.search(match.group())
+            if found:
+                pages.append(int(found.group(found.lastindex or 0)))
+            else:
+                pages.append(pages[-1] + 1 if pages else 1)
+        footer_starts = [match.start() for match in footers]
+
+        state = {'page': -1, 'at': 0, 'lines': 0, 'char': 0, 'byte': 0}
+        ascii_only = len(data) == len(source)
+
+        def page_and_line(offset):
+            page = bisect.bisect_right(footer_starts, offset)
+            if page != state['page']:
+                state['page'] = page
+                state['at'] = footers[page - 1].end() if page else 0
+                state['lines'] = 0
+            state['lines'] += len(TEXT_LINE.findall(raw, state['at'], offset))
+            state['at'] = max(offset, state['at'])
+            if page < len(pages):
+                number = pages[page]
+            else:
+                number = pages[-1] + 1 if pages else 1
+            return number, state['lines'] + 1
+
+        def to_byte(offset):
+            offset += bisect.bisect_left(dropped, offset)
+            if ascii_only:
+                return offset
+            # Offsets come in increasing order, so each character is
+            # encoded once
+            state['byte'] += len(source[state['char']:offset].encode('utf-8'))
+            state['char'] = offset
+            return state['byte']
+
+        begin, end = self.bounds(text)
+        labels = list(self.speaker.finditer(text, begin, end))
+        spans = []
+        for number, label in enumerate(labels):
+            group = label.group()
+            start = label.start() + len(group) - len(group.lstrip())
+            stop = (labels[number + 1].start() if number + 1 < len(labels)
+                    else end)
+            raw_start, raw_stop = to_raw(start), to_raw(stop, end=True)
+            page, line = page_and_line(raw_start)
+            spans.append(TurnSpan(page, line, to_byte(raw_start),
+                                  to_byte(raw_stop)))
+        return spans
+
+    def turns(self, source, docket):
+        """Yields the turns of one transcript.
+
+        The file is read and its bounds found before anything is yielded,
+        so a transcript that can't be parsed fails on the first next()
+        instead of producing half its turns.
+        """
+        return self.iter_text(self.read(source), docket)
+
+
+def byte_pattern(pattern, unicode_spaces=False):
+    """A bytes version of a compiled str pattern, to run over UTF-8.
+
+    Returns the compiled pattern and the classes ('s', 'd', 'w') whose
+    non-ASCII members it can't match the way the str pattern does; a file
+    holding any of those has to be parsed as str. "." and negated sets
+    match a whole character. With unicode_spaces, \\s and sets containing it
+    also match UNICODE_SPACE, so whitespace is left out of the classes
+    unless it is in a negated set or \\S. Raises ValueError for what bytes
+    can't express: case-insensitive or verbose patterns, non-ASCII
+    characters in a set, and escapes such as \\u.
+    """
+    source = pattern.pattern
+    if (pattern.flags & (re.IGNORECASE | re.VERBOSE)
+            or INLINE_FLAGS.search(source)):
+        raise ValueError('%r is case-insensitive or verbose' % source)
+    dot = ANY_CHAR_DOTALL if pattern.flags & re.DOTALL else ANY_CHAR
+    out = []
+    classes = set()
+    position = 0
+    while position < len(source):
+        char = source[position]
+        if char == '[':
+            position = _byte_set(source, position, out, classes,
+                                 unicode_spaces)
+            continue
+        if char == '\\':
+            escape = source[position + 1:position + 2]
+            position += 2
+            if escape == 's':
+                if unicode_spaces:
+                    out.append(rb"(?:\s|" + UNICODE_SPACE + rb")")
+                    continue
+                classes.add('s')
+            elif escape in ('d', 'w'):
+                classes.add(escape)
+            elif escape in ('b', 'B'):
+                classes.add('w')
+            elif escape in ('S', 'D', 'W'):
+                classes.add(escape.lower())
+                out.append(rb"(?:[^\%s\x80-\xff]|%s)"
+                           % (escape.lower().encode(), MULTIBYTE_CHAR))
+                continue
+            elif escape in ('u', 'U', 'N', 'x') or not escape.isascii():
+                raise ValueError('%r: no byte version of \\%s'
+                                 % (source, escape))
+            out.append(b'\\' + escape.encode())
+            continue
+        if char == '.':
+            out.append(dot)
+        elif char.isascii():
+            out.append(char.encode())
+        else:
+            out.append(b'(?:' + char.encode('utf-8') + b')')
+        position += 1
+    try:
+        compiled = re.compile(b''.join(out),
+                              pattern.flags & (re.MULTILINE | re.DOTALL))
+    except re.error as exc:
+        raise ValueError('%r: no byte version (%s)' % (source, exc)) from None
+    return compiled, frozenset(classes)
+
+
+def _byte_set(source, position, out, classes, unicode_spaces):
+    """Appends the byte version of the set starting at source[position] to
+    `out`, returning the position after it."""
+    position += 1
+    negated = source[position:position + 1] == '^'
+    if negated:
+        position += 1
+    members = []
+    found = set()
+    first = True
+    while position < len(source) and (first or source[position] != ']'):
+        char = source[position]
+        if char == '\\':
+            char = source[position:position + 2]
+        if char[1:] in ('s', 'd', 'w'):
+            found.add(char[1:])
+        elif (char[1:] in ('S', 'D', 'W', 'u', 'U', 'N', 'x')
+              or not char.isascii()):
+            raise ValueError('%r: no byte version of the set member %r'
+                             % (source, char))
+        members.append(char.encode())
+        position += len(char)
+        first = False
+    if position >= len(source):
+        raise ValueError('%r: unterminated set' % source)
+    members = b''.join(members)
+    if negated:
+        classes.update(found)
+        out.append(rb"(?:[^%s\x80-\xff]|%s)" % (members, MULTIBYTE_CHAR))
+    elif 's' in found and unicode_spaces:
+        classes.update(found - {'s'})
+        out.append(rb"(?:[%s]|%s)" % (members, UNICODE_SPACE))
+    else:
+        classes.update(found)
+        out.append(b'[' + members + b']')
+    return position + 1
+
+
+class MmapTranscriptParser(TranscriptParser):
+    """TranscriptParser that works on memory-mapped bytes.
+
+    The footers are dropped straight from the mapped file, the markers and
+    speaker labels are found with byte versions of the parser's own
+    patterns (see byte_pattern), and only the labels and speech that are
+    handed back get decoded. The turns are the same as TranscriptParser's:
+    files where bytes could match differently (Windows line endings, or
+    non-ASCII characters a pattern's \\d or \\w would match), and every file
+    when a pattern has no byte version, go through the str parser instead.
+    Bytes that aren't valid UTF-8 outside the emitted speech are not
+    noticed.
+    """
+
+    def __init__(self, footer=FOOTER, start=START, end=END, speaker=SPEAKER,
+                 page=PAGE_NUMBER):
+        super().__init__(footer, start, end, speaker, page)
+        self.byte_patterns = None
+        try:
+            # One set for files without Unicode whitespace, which runs
+            # faster, and one that matches it the way \s does in str
+            self.byte_patterns = [
+                [byte_pattern(pattern, unicode_spaces)
+                 for pattern in (footer, start, end, speaker)]
+                for unicode_spaces in (False, True)]
+        except ValueError:
+            pass
+
+    def _patterns(self, buf):
+        """The byte patterns for a mapped file, or None if it has to be
+        parsed as str."""
+        if self.byte_patterns is None or buf.find(b'\r') != -1:
+            return None
+        chars = set(_non_ascii(buf).decode('utf-8', 'replace'))
+        spaces = (any(buf.find(space) != -1 for space in CONTROL_SPACES)
+                  or any(char.isspace() for char in chars))
+        patterns = self.byte_patterns[spaces]
+        classes = set().union(*(found for _, found in patterns))
+        if not spaces:
+            classes.discard('s')
+        elif 's' in classes:
+            return None
+        tests = [CLASS_TESTS[name] for name in classes]
+        if any(test(char) for test in tests for char in chars):
+            return None
+        return [compiled for compiled, _ in patterns]
+
+    def turns(self, source, docket):
+        if not isinstance(source, (str, bytes, os.PathLike)):
+            return super().turns(source, docket)
+        with open(source, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return super().turns(source, docket)
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            patterns = self._patterns(buf)
+            if patterns is None:
+                return super().turns(source, docket)
+            footer, start, end, speaker = patterns
+            text = _without_footers(buf, footer)
+        finally:
+            buf.close()
+
+        opening = start.search(text)
+        if opening is None:
+            raise ValueError('no opening marker %r' % self.start.pattern)
+        closing = end.search(text, opening.start())
+        if closing is None:
+            raise ValueError('no closing marker %r' % self.end.pattern)
+        return self._byte_turns(text, speaker, opening.start(), closing.end(),
+                                docket)
+
+    def _byte_turns(self, text, speaker, begin, end, docket):
+        label = None
+        for match in speaker.finditer(text, begin, end):
+            if label is not None:
+                yield (docket, label.group().decode('utf-8'),
+                       text[label.end():match.start()].decode('utf-8'))
+            label = match
+        if label is not None:
+            yield (docket, label.group().decode('utf-8'),
+                   text[label.end():end].decode('utf-8'))
+
+
+def _non_ascii(buf, chunk=1 << 20):
+    """The bytes of `buf` from 0x80 up, in order: each non-ASCII character
+    of a UTF-8 file, whole. Read a chunk at a time, so a mapped file is
+    never copied at once."""
+    return b''.join(buf[at:at + chunk].translate(None, ASCII)
+                    for at in range(0, len(buf), chunk))
+
+
+def _without_footers(buf, footer):
+    """Copies the mapped file into one buffer, leaving the footers out.
+
+    re.sub would collect every piece before joining them, briefly holding
+    the file twice; filling a preallocated bytearray doesn't.
+    """
+    text = bytearray(len(buf))
+    size = last = 0
+    with memoryview(buf) as view:
+        for match in footer.finditer(buf):
+            piece = match.start() - last
+            text[size:size + piece] = view[last:match.start()]
+            size += piece
+            last = match.end()
+        piece = len(buf) - last
+        text[size:size + piece] = view[last:]
+    del text[size + piece:]
+    return text
+
+
+def iter_corpus(cases, directory, parser=None):
+    """Yields the turns of every case with a readable transcript.
+
+    `cases` are dicts (or CaseRows) with a docket and pdf link, as scraped
+    in step 1; transcripts are looked up in `directory` by PDF name.
+    Transcripts that are missing or can't be parsed are skipped.
+    """
+    parser = parser or TranscriptParser()
+    for case in cases:
+        if not isinstance(case, dict):
+            case = case._asdict()
+        try:
+            path = os.path.join(directory, transcript_name(case['pdf']))
+            turns = parser.turns(path, case['docket'])
+        except (KeyError, OSError, ValueError):
+            continue
+        yield from turns
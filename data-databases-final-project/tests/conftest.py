@@ -0,0 +1,65 @@
+"""Shared fixtures: the package on the path and a local HTTP stub server."""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+class StubServer:
+    """Answers from `routes`: path -> a list of (status, headers, body)
+    answers given in turn (the last one repeats), or a function of the
+    request headers returning one. Every request is kept in `requests` as
+    (path, headers, time)."""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests.append((self.path, dict(self.headers), time.monotonic()))
+                    route = stub.routes.get(self.path)
+                    if route is None:
+                        answer = (404, {}, b'not found')
+                    elif callable(route):
+                        answer = route(self.headers)
+                    else:
+                        answer = route.pop(0) if len(route) > 1 else route[0]
+                status, headers, body = answer
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if status != 304:
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d%s' % (self.server.server_address[1], path)
+
+    def hits(self, path):
+        return [request for request in self.requests if request[0] == path]
+
+
+@pytest.fixture
+def stub_server():
+    stub = StubServer()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
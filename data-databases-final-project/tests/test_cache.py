@@ -0,0 +1,97 @@
+import os
+import time
+
+import pytest
+
+from scotus.cache import OfflineMiss, ResponseCache
+from scotus.crawl import ARGUMENT_LIST_URL
+from scotus.extract import parse_case_rows
+from scotus.fetch import DOCKET_URL, Fetcher, fetch_lower_courts
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def replayed(tmp_path):
+    """An offline cache holding the saved argument list and two dockets."""
+    cache = ResponseCache(str(tmp_path / 'http'))
+    cache.put(ARGUMENT_LIST_URL.format(term=2019), fixture('argument_list_2019.html'))
+    for docket in ('18-1', '19-2'):
+        cache.put(DOCKET_URL.format(docket), fixture('docket_%s.html' % docket))
+    cache.close()
+    return ResponseCache(str(tmp_path / 'http'), offline=True)
+
+
+def test_fixtures_replay_offline(replayed):
+    with Fetcher(cache=replayed, per_host=0) as fetcher:
+        rows = parse_case_rows(fetcher.get(ARGUMENT_LIST_URL.format(term=2019)))
+        assert [row.docket for row in rows] == ['18-1', '19-2', '19-3']
+        failures = []
+        found = fetch_lower_courts([row.docket for row in rows], fetcher, failures=failures)
+    assert found[0] == {'docket': '18-1',
+                        'lower_court': 'United States Court of Appeals for the Ninth Circuit'}
+    assert found[1]['lower_court'] == 'Court of Criminal Appeals of Oklahoma'
+    # 19-3 was never saved: no network, just a miss
+    assert found[2] == {}
+    assert [failure.docket for failure in failures] == ['19-3']
+    assert failures[0].error.startswith('OfflineMiss')
+
+
+def test_offline_miss_raises(replayed):
+    with Fetcher(cache=replayed, per_host=0) as fetcher:
+        with pytest.raises(OfflineMiss):
+            fetcher.get(DOCKET_URL.format('19-3'))
+        assert isinstance(fetcher.get_many([DOCKET_URL.format('19-3')])[0], OfflineMiss)
+
+
+def test_offline_serves_stale_pages(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=0, offline=True)
+    cache.put('http://example.invalid/page', b'old')
+    with Fetcher(cache=cache, per_host=0) as fetcher:
+        assert fetcher.get('http://example.invalid/page') == b'old'
+
+
+def test_fresh_pages_skip_the_network(stub_server, tmp_path):
+    stub_server.routes['/list'] = [(200, {}, b'list')]
+    with Fetcher(cache=ResponseCache(str(tmp_path)), per_host=0) as fetcher:
+        assert fetcher.get(stub_server.url('/list')) == b'list'
+        assert fetcher.get(stub_server.url('/list')) == b'list'
+    assert len(stub_server.hits('/list')) == 1
+
+
+def test_ttl_rules(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=None, ttl_rules=[(r'/2019$', 60)])
+    cache.put('http://x/2018', b'a')
+    cache.put('http://x/2019', b'b')
+    old = time.time() - 120
+    cache._db.execute('UPDATE entries SET fetched_at = ?', (old,))
+    assert cache.is_fresh(cache.lookup('http://x/2018'))
+    assert not cache.is_fresh(cache.lookup('http://x/2019'))
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put('http://x/a', b'same')
+    cache.put('http://x/b', b'same')
+    assert cache.total_bytes() == 4
+    blobs = [name for _, _, names in os.walk(tmp_path / 'blobs') for name in names]
+    assert len(blobs) == 1
+
+
+def test_least_recently_used_pages_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10)
+    cache.put('http://x/a', b'aaaa')
+    time.sleep(0.01)
+    cache.put('http://x/b', b'bbbb')
+    time.sleep(0.01)
+    assert cache.get('http://x/a') == b'aaaa'     # a is now the more recent
+    time.sleep(0.01)
+    cache.put('http://x/c', b'cccc')
+    assert cache.get('http://x/b') is None
+    assert cache.get('http://x/a') == b'aaaa'
+    assert cache.get('http://x/c') == b'cccc'
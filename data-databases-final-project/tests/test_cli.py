@@ -0,0 +1,70 @@
+import os
+
+from scotus.cache import ResponseCache
+from scotus.cli import CASE_COLUMNS, main, read_csv, write_csv
+from scotus.config import Config
+from scotus.crawl import ARGUMENT_LIST_URL, MERGED_COLUMNS
+from scotus.fetch import DOCKET_URL
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def offline_data_dir(tmp_path):
+    """A data directory whose HTTP cache holds the 2019 argument list."""
+    config = Config(str(tmp_path))
+    cache = ResponseCache(config.http_cache)
+    with open(os.path.join(FIXTURES, 'argument_list_2019.html'), 'rb') as f:
+        cache.put(ARGUMENT_LIST_URL.format(term=2019), f.read())
+    cache.close()
+    return config
+
+
+def old_case(docket, term):
+    return {'docket': docket, 'name': 'Old v. Case', 'date': '', 'pdf': '', 'term': term}
+
+
+def scrape(config, *terms):
+    argv = ['--data-dir', config.data_dir, '--offline', 'scrape']
+    for term in terms:
+        argv += ['--term', str(term)]
+    return main(argv)
+
+
+def test_scrape_replaces_only_the_terms_scraped(tmp_path):
+    config = offline_data_dir(tmp_path)
+    write_csv(config.cases_csv, CASE_COLUMNS,
+              [old_case('17-1', '2018'), old_case('19-9', '2019'), old_case('20-1', '2020')])
+    assert scrape(config, 2019) == 0
+    cases = read_csv(config.cases_csv)
+    assert [(case['term'], case['docket']) for case in cases] == [
+        ('2018', '17-1'), ('2019', '18-1'), ('2019', '19-2'), ('2019', '19-3'),
+        ('2020', '20-1')]
+
+
+def test_scrape_keeps_the_rows_of_a_term_that_failed(tmp_path):
+    config = offline_data_dir(tmp_path)
+    write_csv(config.cases_csv, CASE_COLUMNS, [old_case('17-1', '2018'), old_case('20-1', '2020')])
+    # 2020 isn't in the offline cache
+    assert scrape(config, 2019, 2020) == 0
+    assert [case['docket'] for case in read_csv(config.cases_csv)] == [
+        '17-1', '18-1', '19-2', '19-3', '20-1']
+
+
+def test_enrich_upserts_into_merged_csv(tmp_path):
+    config = offline_data_dir(tmp_path)
+    cache = ResponseCache(config.http_cache)
+    for docket in ('18-1', '19-2'):
+        with open(os.path.join(FIXTURES, 'docket_%s.html' % docket), 'rb') as f:
+            cache.put(DOCKET_URL.format(docket), f.read())
+    cache.close()
+    write_csv(config.merged_csv, MERGED_COLUMNS,
+              [dict(old_case('17-1', '2018'), lower_court='Supreme Court of Ohio')])
+    assert scrape(config, 2019) == 0
+    assert main(['--data-dir', config.data_dir, '--offline', 'enrich']) == 0
+    merged = {row['docket']: row for row in read_csv(config.merged_csv)}
+    # 17-1 isn't in cases.csv, so enrich leaves its row alone
+    assert merged['17-1']['lower_court'] == 'Supreme Court of Ohio'
+    assert merged['18-1']['lower_court'] == 'United States Court of Appeals for the Ninth Circuit'
+    assert merged['19-2']['term'] == '2019'
+    # 19-3's page was never saved
+    assert sorted(merged) == ['17-1', '18-1', '19-2']
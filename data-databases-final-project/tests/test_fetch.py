@@ -0,0 +1,91 @@
+import time
+
+import pytest
+import requests
+
+from scotus.cache import ResponseCache
+from scotus.fetch import Fetcher
+
+
+def fetcher(**kwargs):
+    kwargs.setdefault('per_host', 0)
+    kwargs.setdefault('backoff', 0.01)
+    return Fetcher(**kwargs)
+
+
+def test_get_many_keeps_order(stub_server):
+    for n in range(20):
+        stub_server.routes['/page/%d' % n] = [(200, {}, b'page %d' % n)]
+    with fetcher(workers=6) as f:
+        bodies = f.get_many([stub_server.url('/page/%d' % n) for n in range(20)])
+    assert bodies == [b'page %d' % n for n in range(20)]
+
+
+def test_retries_503_with_backoff(stub_server):
+    stub_server.routes['/flaky'] = [(503, {}, b''), (503, {}, b''), (200, {}, b'ok')]
+    with fetcher(backoff=0.05) as f:
+        assert f.get(stub_server.url('/flaky')) == b'ok'
+    times = [request[2] for request in stub_server.hits('/flaky')]
+    assert len(times) == 3
+    # 0.05 s, then 0.1 s
+    assert times[1] - times[0] >= 0.04
+    assert times[2] - times[1] >= 0.09
+
+
+def test_429_honours_retry_after(stub_server):
+    stub_server.routes['/throttled'] = [(429, {'Retry-After': '1'}, b''), (200, {}, b'ok')]
+    with fetcher() as f:
+        assert f.get(stub_server.url('/throttled')) == b'ok'
+    first, second = [request[2] for request in stub_server.hits('/throttled')]
+    assert second - first >= 0.9
+
+
+def test_gives_up_after_retries(stub_server):
+    stub_server.routes['/down'] = [(503, {}, b'')]
+    with fetcher(retries=2) as f:
+        with pytest.raises(requests.HTTPError):
+            f.get(stub_server.url('/down'))
+    assert len(stub_server.hits('/down')) == 3
+
+
+def test_404_comes_back_in_get_many(stub_server):
+    stub_server.routes['/a'] = [(200, {}, b'a')]
+    with fetcher() as f:
+        found = f.get_many([stub_server.url('/a'), stub_server.url('/missing')])
+    assert found[0] == b'a'
+    assert isinstance(found[1], requests.HTTPError)
+    assert found[1].response.status_code == 404
+    # not retried
+    assert len(stub_server.hits('/missing')) == 1
+
+
+def test_revalidates_with_etag_and_last_modified(stub_server, tmp_path):
+    validators = {'ETag': '"v1"', 'Last-Modified': 'Wed, 01 Jan 2020 00:00:00 GMT'}
+
+    def page(headers):
+        if (headers.get('If-None-Match') == '"v1"'
+                and headers.get('If-Modified-Since') == validators['Last-Modified']):
+            return 304, validators, b''
+        return 200, validators, b'<html>docket</html>'
+
+    stub_server.routes['/docket'] = page
+    url = stub_server.url('/docket')
+    cache = ResponseCache(str(tmp_path), ttl=0)
+    with fetcher(cache=cache) as f:
+        assert f.get(url) == b'<html>docket</html>'
+        fetched_at = cache.lookup(url).fetched_at
+        time.sleep(0.01)
+        assert f.get(url) == b'<html>docket</html>'
+        assert cache.lookup(url).fetched_at > fetched_at
+    first, second = stub_server.hits('/docket')
+    assert 'If-None-Match' not in first[1]
+    assert second[1]['If-None-Match'] == '"v1"'
+
+
+def test_304_without_a_cached_copy_is_an_error(stub_server, tmp_path):
+    stub_server.routes['/odd'] = [(304, {}, b'')]
+    cache = ResponseCache(str(tmp_path))
+    with fetcher(cache=cache) as f:
+        with pytest.raises(requests.HTTPError):
+            f.get(stub_server.url('/odd'))
+        assert cache.lookup(stub_server.url('/odd')) is None
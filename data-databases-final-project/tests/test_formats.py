@@ -0,0 +1,54 @@
+import os
+
+from scotus.formats import HERITAGE, FormatParser, FormatRegistry
+from scotus.transcripts import TranscriptParser
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures',
+                      'alderson_sample.txt')
+
+
+def test_alderson_turns_drop_headers_and_footers():
+    parser = FormatParser()
+    assert parser.format_of(SAMPLE) is parser.formats['alderson']
+    turns = list(parser.turns(SAMPLE, '02-1'))
+    assert [' '.join(speaker.split()) for _, speaker, _ in turns] == [
+        'CHIEF JUSTICE REHNQUIST:', 'GENERAL OLSON:', 'JUSTICE STEVENS:', 'GENERAL OLSON:',
+        'JUSTICE SCALIA:', 'GENERAL OLSON:', 'CHIEF JUSTICE REHNQUIST:']
+    words = ''.join(words for _, _, words in turns)
+    assert 'Alderson' not in words and 'Official' not in words and '20005' not in words
+    assert turns[-1][2] == ' Thank you, General Olson.\nThe case is submitted.'
+    # an open file is recognised the same way
+    with open(SAMPLE) as f:
+        assert list(parser.turns(f, '02-1')) == turns
+    assert list(FormatParser(mmap=True).turns(SAMPLE, '02-1')) == turns
+
+
+def test_alderson_locate_numbers_pages_from_the_footer():
+    spans = FormatParser().locate(SAMPLE)
+    assert [(span.page, span.line) for span in spans] == [
+        (1, 6), (1, 8), (1, 10), (2, 1), (2, 2), (2, 4), (3, 1)]
+    with open(SAMPLE, 'rb') as f:
+        data = f.read()
+    assert data[spans[3].start:spans[3].end].startswith(b'GENERAL OLSON: It is')
+
+
+def test_turns_and_locate_agree_on_the_format(tmp_path):
+    # The signature only turns up past the sniffed prefix
+    path = tmp_path / 'late.txt'
+    with open(SAMPLE) as f:
+        path.write_text('\n' * 300 + f.read().replace('Official - Subject to Final Review\n',
+                                                      '', 1))
+    parser = FormatParser(FormatRegistry(sniff_chars=256))
+    assert parser.format_of(str(path)).name == 'alderson'
+    assert len(list(parser.turns(str(path), '02-1'))) == len(parser.locate(str(path))) == 7
+
+
+def test_heritage_files_parse_as_before(tmp_path):
+    path = tmp_path / 'heritage.txt'
+    path.write_text('Heritage Reporting Corporation\n2\nOfficial\nPROCEEDINGS\n'
+                    'CHIEF JUSTICE ROBERTS: Case 18-1.\nGENERAL WALLACE: Thank you.\n'
+                    'CHIEF JUSTICE ROBERTS: The case is submitted.\n')
+    parser = FormatParser()
+    assert parser.format_of(str(path)) is HERITAGE
+    assert (list(parser.turns(str(path), '18-1'))
+            == list(TranscriptParser().turns(str(path), '18-1')))
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from scotus.geojson import map_frame
+
+
+def test_map_frame_shows_a_case_without_a_date():
+    table = pd.DataFrame({
+        'docket': ['18-1', '19-2'],
+        'most_used_words': [[('statute', 3)], None],
+        'speech_count': [4, 2],
+        'case_name': ['Smith v. Jones', 'Doe v. Roe'],
+        'date': ['10/01/19', None],
+        'lower_court': ['Supreme Court of Ohio', 'Supreme Court of Ohio'],
+    })
+    frame = map_frame(table)
+    assert list(frame['lower_court']) == ['Supreme Court of Ohio']
+    assert frame.loc[0, 'properties.headline'] == 2
+    article = frame.loc[0, 'properties.article']
+    assert '<b>Case:</b> Smith v. Jones , 10/01/19<br><br>Spoke 4 times<br>' in article
+    assert 'statute: 3 occurances' in article
+    assert '<b>Case:</b> Doe v. Roe , <br><br>Spoke 2 times<br>' in article
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+from scotus.formats import FormatParser
+from scotus.parsecache import ParseCache, parser_fingerprint
+from scotus.transcripts import MmapTranscriptParser, TranscriptParser
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FINGERPRINTS = """
+from scotus.formats import FormatParser
+from scotus.parsecache import parser_fingerprint
+from scotus.transcripts import MmapTranscriptParser
+print(parser_fingerprint(MmapTranscriptParser()), parser_fingerprint(FormatParser(mmap=True)))
+"""
+
+
+def fingerprints(seed):
+    env = dict(os.environ, PYTHONHASHSEED=str(seed))
+    return subprocess.run([sys.executable, '-c', FINGERPRINTS], cwd=ROOT, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def test_fingerprint_is_the_same_in_every_process():
+    assert fingerprints(1) == fingerprints(2) == fingerprints(3)
+
+
+def test_fingerprint_follows_the_patterns():
+    assert parser_fingerprint(TranscriptParser()) == parser_fingerprint(TranscriptParser())
+    assert parser_fingerprint(TranscriptParser()) != parser_fingerprint(MmapTranscriptParser())
+    assert parser_fingerprint(FormatParser()) == parser_fingerprint(FormatParser(mmap=True))
+    start = TranscriptParser(start=TranscriptParser().end)
+    assert parser_fingerprint(start) != parser_fingerprint(TranscriptParser())
+
+
+def test_cache_hits_across_parsers_with_the_same_fingerprint(tmp_path):
+    path = tmp_path / 'transcript.txt'
+    path.write_text('\nCHIEF JUSTICE ROBERTS: Case 18-1.\nGENERAL WALLACE: Thank you.\n'
+                    'CHIEF JUSTICE ROBERTS: The case is submitted.\n')
+    turns = list(TranscriptParser().turns(str(path), '18-1'))
+    written = ParseCache(str(tmp_path / 'cache'), FormatParser())
+    written.put(written.key(str(path)), turns, 0.1)
+    cache = ParseCache(str(tmp_path / 'cache'), FormatParser(mmap=True))
+    assert cache.get(cache.key(str(path)), '18-1') == turns
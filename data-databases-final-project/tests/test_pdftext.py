@@ -0,0 +1,153 @@
+import os
+
+import pytest
+
+from scotus.fetch import Fetcher
+from scotus.formats import FormatParser
+from scotus.pdftext import PdfTextCache, convert_pdfs, extract_text
+
+pytest.importorskip('pypdf')
+
+TRANSCRIPT = """Heritage Reporting Corporation
+Official
+PROCEEDINGS
+(10:02 a.m.)
+CHIEF JUSTICE ROBERTS: We will hear argument first this morning in Case 18-1.
+GENERAL WALLACE: Mr. Chief Justice, and may it please the Court:
+The statute is clear on its face.
+JUSTICE GINSBURG: What of the history?
+Heritage Reporting Corporation
+2
+Official
+GENERAL WALLACE: The history points the same way.
+CHIEF JUSTICE ROBERTS: Thank you, counsel. The case is submitted.
+(Whereupon, at 11:02 a.m., the case was submitted.)
+"""
+
+
+def make_pdf(pages):
+    """A PDF with one page per list of lines, in Helvetica."""
+    objects = [b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    contents = []
+    for lines in pages:
+        ops = [b'BT /F1 10 Tf 14 TL 40 780 Td']
+        for line in lines:
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            ops.append(b'(' + escaped.encode('latin-1') + b') Tj T*')
+        ops.append(b'ET')
+        stream = b'\n'.join(ops)
+        objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+        contents.append(len(objects))
+    parent = len(objects) + len(pages) + 1
+    kids = []
+    for content in contents:
+        objects.append(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 800] '
+                       b'/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>'
+                       % (parent, content))
+        kids.append(len(objects))
+    objects.append(b'<< /Type /Pages /Kids [%s] /Count %d >>'
+                   % (b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)))
+    objects.append(b'<< /Type /Catalog /Pages %d 0 R >>' % parent)
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += (b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (len(objects) + 1, len(objects), xref))
+    return bytes(out)
+
+
+def transcript_pdf(text=TRANSCRIPT):
+    """The transcript laid out with a page break after each footer."""
+    pages, page = [], []
+    for line in text.splitlines():
+        page.append(line)
+        if line == 'Official':
+            pages.append(page)
+            page = []
+    return make_pdf(pages + [page])
+
+
+def turns_of(text):
+    parser = FormatParser()
+    return [(speaker.strip(), ' '.join(words.split()))
+            for _, speaker, words in parser.iter_text(parser.read(_Text(text)), 'x')]
+
+
+class _Text:
+    def __init__(self, text):
+        self.text = text
+
+    def read(self):
+        return self.text
+
+
+def case(docket, name):
+    return {'docket': docket, 'pdf': 'https://example.invalid/transcripts/2019/%s.pdf' % name}
+
+
+def test_extract_text_page_by_page(tmp_path):
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(transcript_pdf())
+    assert extract_text(str(pdf), str(tmp_path / 'a.txt')) == 3
+    text = (tmp_path / 'a.txt').read_text()
+    assert '\f' not in text
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_converted_text_parses_like_the_source(tmp_path):
+    (tmp_path / 'pdfs').mkdir()
+    (tmp_path / 'pdfs' / '18-1_4248.pdf').write_bytes(transcript_pdf())
+    done = convert_pdfs([case('18-1', '18-1_4248')], str(tmp_path / 'pdfs'),
+                        str(tmp_path / 'txt'), workers=1)
+    assert done.failures == []
+    assert done.written == [str(tmp_path / 'txt' / '18-1_4248.txt')]
+    parsed = turns_of((tmp_path / 'txt' / '18-1_4248.txt').read_text())
+    assert parsed == turns_of(TRANSCRIPT)
+    assert [speaker for speaker, _ in parsed] == [
+        'CHIEF JUSTICE ROBERTS:', 'GENERAL WALLACE:', 'JUSTICE GINSBURG:', 'GENERAL WALLACE:',
+        'CHIEF JUSTICE ROBERTS:']
+
+
+def test_cache_and_existing_files(tmp_path):
+    pdfs = tmp_path / 'pdfs'
+    pdfs.mkdir()
+    pdf = transcript_pdf()
+    (pdfs / 'a.pdf').write_bytes(pdf)
+    (pdfs / 'b.pdf').write_bytes(pdf)       # the same PDF under another name
+    cache = PdfTextCache(str(tmp_path / 'cache'))
+    cases = [case('18-1', 'a'), case('18-2', 'b')]
+    done = convert_pdfs(cases, str(pdfs), str(tmp_path / 'txt'), workers=2, cache=cache)
+    assert len(done.written) == 2 and cache.misses == 2
+    again = convert_pdfs(cases, str(pdfs), str(tmp_path / 'txt'), cache=cache)
+    assert again.written == [] and len(again.skipped) == 2
+    again = convert_pdfs(cases, str(pdfs), str(tmp_path / 'txt'), cache=cache, overwrite=True)
+    assert len(again.written) == 2 and cache.hits == 2
+    assert (tmp_path / 'txt' / 'a.txt').read_text() == (tmp_path / 'txt' / 'b.txt').read_text()
+
+
+def test_failures_are_reported(tmp_path):
+    pdfs = tmp_path / 'pdfs'
+    pdfs.mkdir()
+    (pdfs / 'bad.pdf').write_bytes(b'not a pdf')
+    done = convert_pdfs([case('18-1', 'bad'), case('18-2', 'missing'), {'docket': '18-3'}],
+                        str(pdfs), str(tmp_path / 'txt'), workers=1)
+    assert done.written == []
+    assert sorted(failure.docket for failure in done.failures) == ['18-1', '18-2', '18-3']
+    assert not os.path.exists(tmp_path / 'txt' / 'bad.txt')
+
+
+def test_downloads_missing_pdfs(stub_server, tmp_path):
+    stub_server.routes['/t/18-1_4248.pdf'] = [(200, {}, transcript_pdf())]
+    cases = [{'docket': '18-1', 'pdf': stub_server.url('/t/18-1_4248.pdf')},
+             {'docket': '18-2', 'pdf': stub_server.url('/t/18-2_gone.pdf')}]
+    with Fetcher(per_host=0, backoff=0.01) as fetcher:
+        done = convert_pdfs(cases, str(tmp_path / 'pdfs'), str(tmp_path / 'txt'),
+                            fetcher=fetcher, workers=1)
+    assert done.written == [str(tmp_path / 'txt' / '18-1_4248.txt')]
+    assert [failure.docket for failure in done.failures] == ['18-2']
+    assert (tmp_path / 'pdfs' / '18-1_4248.pdf').exists()
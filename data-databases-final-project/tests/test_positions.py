@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from scotus.positions import PositionIndex, write_positions
+from scotus.transcripts import TranscriptParser
+
+TRANSCRIPT = """PROCEEDINGS
+CHIEF JUSTICE ROBERTS: We will hear argument first this morning in Case 18-1.
+GENERAL WALLACE: Mr. Chief Justice, and may it please the Court.
+CHIEF JUSTICE ROBERTS: Thank you. The case is submitted.
+Heritage Reporting Corporation
+1
+Official
+"""
+
+
+def test_failed_write_leaves_no_temporary_files(tmp_path):
+    good = tmp_path / 'good.txt'
+    good.write_text(TRANSCRIPT)
+    bad = tmp_path / 'bad.txt'
+    bad.write_text('no argument here\n')
+    root = str(tmp_path / 'positions')
+    assert write_positions(root, [('18-1', str(good))]) == 3
+
+    with pytest.raises(ValueError):
+        write_positions(root, [('18-1', str(good)), ('18-2', str(bad))], TranscriptParser())
+    assert sorted(os.listdir(root)) == ['files.json', 'turns.bin']
+    positions = PositionIndex(root)
+    assert positions.cite(2) == '18-1, page 1, line 4'
+    positions.close()
@@ -0,0 +1,64 @@
+from scotus.cli import _dialogue_rows, _speaker_label, _slug
+from scotus.speakers import Turn, TurnTable
+
+# The labels of one justice as the page breaks wrap them
+TURNS = [
+    ('18-1', '\nJUSTICE ALITO:', 'Counsel,\nwhat if'),
+    ('18-1', '\nJUSTICE\nALITO:', 'And then?'),
+    ('18-1', '\nCHIEF\nJUSTICE ROBERTS:', 'Thank you.'),
+    ('19-2', '\nREBUTTAL ARGUMENT OF\nJUSTICE ALITO:', 'One more.'),
+    ('19-2', '\nMR. FRANCIS:', 'Yes.'),
+]
+
+
+def test_dialogue_rows_use_one_label_per_speaker():
+    rows = _dialogue_rows(TURNS)
+    assert [row['speaker'] for row in rows] == [
+        'JUSTICE ALITO:', 'JUSTICE ALITO:', 'CHIEF JUSTICE ROBERTS:', 'JUSTICE ALITO:',
+        'MR. FRANCIS:']
+    assert rows[0] == {'speaker': 'JUSTICE ALITO:', 'words': 'Counsel,what if',
+                       'docket': '18-1'}
+    # one table per justice, named as before
+    assert {_slug(row['speaker']) for row in rows if 'JUSTICE' in row['speaker']} == {
+        'justice_alito', 'chief_justice_roberts'}
+
+
+def test_speaker_arguments_match_with_or_without_colon():
+    assert _speaker_label('JUSTICE GINSBURG:') == 'JUSTICE GINSBURG:'
+    assert _speaker_label('justice  ginsburg') == 'JUSTICE GINSBURG:'
+
+
+def test_turn_table_reads_between_appends():
+    table = TurnTable()
+    for docket, speaker, words in TURNS:
+        table.append(docket, speaker, words + ' café')
+        # reading the last turn back mustn't lose or reorder the buffer
+        assert table[len(table) - 1].words == words + ' café'
+    assert [turn.words for turn in table] == [words + ' café' for _, _, words in TURNS]
+    assert table[1] == Turn('18-1', 'JUSTICE ALITO', 'And then? café')
+    assert len(table.speakers) == 3
+    assert list(table.to_frame().speaker) == ['JUSTICE ALITO', 'JUSTICE ALITO',
+                                              'CHIEF JUSTICE ROBERTS', 'JUSTICE ALITO',
+                                              'MR. FRANCIS']
+
+
+def test_similarity_index_uses_canonical_speakers(tmp_path):
+    from scotus.similarity import SignatureIndex
+
+    index = SignatureIndex.build(TURNS, str(tmp_path))
+    assert index.speakers == ['JUSTICE ALITO', 'CHIEF JUSTICE ROBERTS', 'MR. FRANCIS']
+    assert index.speaker(3) == 'JUSTICE ALITO'
+
+
+def test_indexes_share_the_speaker_names(tmp_path):
+    from scotus.concordance import ConcordanceIndex
+    from scotus.search import DialogueIndex
+
+    concordance = ConcordanceIndex.build(TURNS, str(tmp_path / 'concordance'))
+    assert concordance.speakers == ['JUSTICE ALITO', 'CHIEF JUSTICE ROBERTS', 'MR. FRANCIS']
+    assert [hit.turn for hit in concordance.search('more', speakers='alito')] == [3]
+    concordance.close()
+    with DialogueIndex(str(tmp_path / 'search.sqlite')) as index:
+        index.add_turns(TURNS)
+        assert [name for name, in index.db.execute("SELECT name FROM speakers ORDER BY id")] == [
+            'JUSTICE ALITO', 'CHIEF JUSTICE ROBERTS', 'MR. FRANCIS']
@@ -0,0 +1,87 @@
+import re
+
+import pytest
+
+from scotus.formats import ALDERSON
+from scotus.transcripts import MmapTranscriptParser, TranscriptParser, byte_pattern
+
+TRANSCRIPT = """Heritage Reporting Corporation
+Official
+PROCEEDINGS
+CHIEF JUSTICE ROBERTS: We will hear argument first this morning in Case 18-1.
+GENERAL WALLACE: Mr. Chief Justice, and may it please the Court:
+The statute is clear on its face.
+JUSTICE
+GINSBURG: What of the history?
+Heritage Reporting Corporation
+2 - 3
+Official
+GENERAL WALLACE: The history points the same way.
+CHIEF JUSTICE ROBERTS: Thank you, counsel. The case is submitted.
+(Whereupon, at 11:02 a.m., the case was submitted.)
+"""
+
+ALDERSON_TRANSCRIPT = (TRANSCRIPT.replace('ROBERTS', 'REHNQUIST')
+                       .replace('Heritage Reporting Corporation',
+                                'Alderson Reporting Company\n1111 14th Street, NW Suite 400'
+                                '\n1-800-FOR-DEPO Washington, DC 20005')
+                       .replace('Official', 'Official - Subject to Final Review\n1\n2'))
+
+VARIANTS = {
+    'plain': TRANSCRIPT,
+    'accents': TRANSCRIPT.replace('face', 'façade – “as written”'),
+    # \s in a str pattern takes the no-break space into the label
+    'unicode space': TRANSCRIPT.replace('JUSTICE\nGINSBURG', 'JUSTICE GINSBURG'),
+    # "." after "submitted" is one character, whatever its length in UTF-8
+    'wide character': TRANSCRIPT.replace('submitted.', 'submitted…'),
+    # \d in the footer takes an Arabic-Indic page number with it
+    'unicode digit': TRANSCRIPT.replace('2 - 3', '٢ - 3'),
+    'windows': TRANSCRIPT.replace('\n', '\r\n'),
+}
+
+
+def both(tmp_path, text, **patterns):
+    path = tmp_path / 'transcript.txt'
+    path.write_bytes(text.encode('utf-8'))
+    return (list(TranscriptParser(**patterns).turns(str(path), '18-1')),
+            list(MmapTranscriptParser(**patterns).turns(str(path), '18-1')))
+
+
+@pytest.mark.parametrize('name', sorted(VARIANTS))
+def test_mmap_turns_match_str_turns(tmp_path, name):
+    want, got = both(tmp_path, VARIANTS[name])
+    assert len(want) == 5
+    assert got == want
+
+
+def test_mmap_uses_the_instance_patterns(tmp_path):
+    # Labels with a period, which the default SPEAKER leaves out
+    speaker = re.compile(r"\n[A-Z][A-Z.\s]+:")
+    text = VARIANTS['unicode space'].replace('GENERAL WALLACE', 'MR. FRANCIS')
+    want, got = both(tmp_path, text, speaker=speaker)
+    assert [turn[1] for turn in got][:2] == ['\nCHIEF JUSTICE ROBERTS:', '\nMR. FRANCIS:']
+    assert got == want
+    want, got = both(tmp_path, ALDERSON_TRANSCRIPT, footer=ALDERSON.footer,
+                     start=ALDERSON.start, end=ALDERSON.end, speaker=ALDERSON.speaker)
+    assert len(want) == 5 and 'Alderson' not in ''.join(turn[2] for turn in want)
+    assert got == want
+
+
+def test_patterns_without_a_byte_version_parse_as_str(tmp_path):
+    start = re.compile(r"\nchief justice [a-z]+:", re.IGNORECASE)
+    assert MmapTranscriptParser(start=start).byte_patterns is None
+    want, got = both(tmp_path, TRANSCRIPT, start=start)
+    assert got == want and len(got) == 5
+
+
+def test_byte_pattern():
+    assert byte_pattern(re.compile(r"\n[A-Z\s]+:"))[1] == {'s'}
+    spaced, classes = byte_pattern(re.compile(r"\n[A-Z\s]+:"), unicode_spaces=True)
+    assert not classes
+    assert spaced.search('\nJUSTICE KAGAN:'.encode('utf-8'))
+    anything, classes = byte_pattern(re.compile(r"a[^b]c.\S"))
+    assert classes == {'s'}
+    assert anything.fullmatch('aécé—'.encode('utf-8'))
+    assert not anything.fullmatch('aéc\xe9'.encode('utf-8')[:-1])
+    with pytest.raises(ValueError):
+        byte_pattern(re.compile(r"[é]"))